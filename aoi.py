@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+
+"""
+/***************************************************************************
+ CurveNumberGenerator
+                                 A QGIS plugin
+ This plugin generates a Curve Number layer for the given Area of Interest within the contiguous United States. It can also download Soil and Land Cover datasets for the same area.
+ Generated by Plugin Builder: http://g-sherman.github.io/Qgis-Plugin-Builder/
+                              -------------------
+        begin                : 2020-06-06
+        copyright            : (C) 2020 by Abdul Raheem Siddiqui
+        email                : mailto:ars.work.ce@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+import math
+
+from qgis.core import QgsGeometry, QgsRectangle, QgsWkbTypes
+
+__author__ = "Abdul Raheem Siddiqui"
+__date__ = "2020-12-25"
+__copyright__ = "(C) 2020 by Abdul Raheem Siddiqui"
+
+# This will get replaced with a git SHA1 when you do a git archive
+
+__revision__ = "$Format:%H$"
+
+
+def dissolve_layer(layer) -> QgsGeometry:
+    """Dissolve all polygons of layer into a single geometry"""
+    return QgsGeometry.unaryUnion(
+        [feat.geometry() for feat in layer.getFeatures() if feat.hasGeometry()]
+    )
+
+
+def degrees_for_meters(meters: float, latitude: float) -> float:
+    """Approximate WGS84 degrees covering meters in both directions at latitude"""
+    return meters / (111320 * max(math.cos(math.radians(latitude)), 0.01))
+
+
+def query_geometry(
+    geometry: QgsGeometry, buffer_distance: float, max_vertices: int
+) -> QgsGeometry:
+    """Simplify geometry to at most max_vertices and grow it so it still covers geometry
+    buffered by buffer_distance"""
+    extent = geometry.boundingBox()
+    tolerance = 0
+    result = geometry.buffer(buffer_distance, 1)
+    while result.constGet().nCoordinates() > max_vertices:
+        tolerance = tolerance * 2 if tolerance else buffer_distance
+        if tolerance > max(extent.width(), extent.height()):
+            return QgsGeometry.fromRect(extent.buffered(buffer_distance))
+        simplified = geometry.simplify(tolerance)
+        if simplified.isEmpty():
+            simplified = QgsGeometry.fromRect(extent)
+        # simplified edges move by up to tolerance, grow by it as well
+        result = simplified.buffer(buffer_distance + tolerance, 1)
+    return result
+
+
+def geometry_clipper(geometry: QgsGeometry):
+    """Get function returning WKT of geometry inside (xmin, ymin, xmax, ymax) bbox,
+    None if they do not intersect"""
+    engine = QgsGeometry.createGeometryEngine(geometry.constGet())
+    engine.prepareGeometry()
+
+    def clip(bbox: tuple):
+        tile = QgsGeometry.fromRect(QgsRectangle(*bbox))
+        if not engine.intersects(tile.constGet()):
+            return None
+        if engine.contains(tile.constGet()):
+            return tile.asWkt()
+        part = geometry.intersection(tile)
+        part_type = QgsWkbTypes.geometryType(part.wkbType())
+        if part_type in (QgsWkbTypes.PointGeometry, QgsWkbTypes.LineGeometry):
+            # only touching the bbox
+            return None
+        if part_type != QgsWkbTypes.PolygonGeometry:
+            # mixed collections, query the whole bbox
+            return tile.asWkt()
+        return part.asWkt(8)
+
+    return clip
+
+
+def geometry_intersects(geometry: QgsGeometry):
+    """Get function telling whether a WKT geometry with (xmin, ymin, xmax, ymax) bounds
+    intersects geometry, bounds are tested before the prepared geometry"""
+    engine = QgsGeometry.createGeometryEngine(geometry.constGet())
+    engine.prepareGeometry()
+    extent = geometry.boundingBox()
+
+    def intersects(bounds: tuple, wkt: str) -> bool:
+        if not extent.intersects(QgsRectangle(*bounds)):
+            return False
+        return engine.intersects(QgsGeometry.fromWkt(wkt).constGet())
+
+    return intersects
@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+
+"""
+/***************************************************************************
+ CurveNumberGenerator
+                                 A QGIS plugin
+ This plugin generates a Curve Number layer for the given Area of Interest within the contiguous United States. It can also download Soil and Land Cover datasets for the same area.
+ Generated by Plugin Builder: http://g-sherman.github.io/Qgis-Plugin-Builder/
+                              -------------------
+        begin                : 2020-06-06
+        copyright            : (C) 2020 by Abdul Raheem Siddiqui
+        email                : mailto:ars.work.ce@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+import multiprocessing
+import os
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+from osgeo import gdal, ogr, osr
+
+from cn_lookup import compile_cn_lut
+from cust_functions import hsg_index
+from nlcd import NLCD_CRS, NLCDTileCache, fetch_nlcd, nlcd_tiles, reclassify_nlcd
+from raster_cn import compute_cn_grid, write_cn_raster
+from ssurgo import SoilCache, bbox_wkt, iter_soil, soil_attributes
+
+__author__ = "Abdul Raheem Siddiqui"
+__date__ = "2020-12-25"
+__copyright__ = "(C) 2020 by Abdul Raheem Siddiqui"
+
+# This will get replaced with a git SHA1 when you do a git archive
+
+__revision__ = "$Format:%H$"
+
+
+def spatial_reference(authid: str) -> osr.SpatialReference:
+    srs = osr.SpatialReference()
+    srs.SetFromUserInput(authid)
+    # keep x, y axis order of WKT coordinates
+    srs.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+    return srs
+
+
+def envelopes_overlap(envelope: tuple, other: tuple) -> bool:
+    """Check if OGR (xmin, xmax, ymin, ymax) envelopes overlap"""
+    return (
+        envelope[0] <= other[1]
+        and envelope[1] >= other[0]
+        and envelope[2] <= other[3]
+        and envelope[3] >= other[2]
+    )
+
+
+def ogr_clipper(wkt: str):
+    """Get function returning WKT of geometry inside bbox, None if they do not intersect"""
+    geometry = ogr.CreateGeometryFromWkt(wkt)
+    envelope = geometry.GetEnvelope()
+
+    def clip(bbox: tuple):
+        xmin, ymin, xmax, ymax = bbox
+        if not envelopes_overlap(envelope, (xmin, xmax, ymin, ymax)):
+            return None
+        tile = ogr.CreateGeometryFromWkt(bbox_wkt(bbox))
+        if not geometry.Intersects(tile):
+            return None
+        if geometry.Contains(tile):
+            return tile.ExportToWkt()
+        part = geometry.Intersection(tile)
+        if part is None or part.IsEmpty() or part.GetDimension() < 2:
+            return None
+        return part.ExportToWkt()
+
+    return clip
+
+
+def ogr_intersects(wkt: str):
+    """Get function telling whether a WKT geometry with (xmin, ymin, xmax, ymax) bounds
+    intersects geometry, bounds are tested first"""
+    geometry = ogr.CreateGeometryFromWkt(wkt)
+    envelope = geometry.GetEnvelope()
+
+    def intersects(bounds: tuple, row_wkt: str) -> bool:
+        xmin, ymin, xmax, ymax = bounds
+        if not envelopes_overlap(envelope, (xmin, xmax, ymin, ymax)):
+            return False
+        return geometry.Intersects(ogr.CreateGeometryFromWkt(row_wkt))
+
+    return intersects
+
+
+def soil_hsg_features(rows, drained: bool, aoi=None):
+    """Get (HSG index, WKB geometry) of lean soil rows, clipped to aoi geometry in the
+    same crs if given like the soil layer is clipped to the area boundary, only soil
+    crossing the aoi boundary is intersected with it"""
+    names = [attr["name"] for attr in soil_attributes(True)]
+    musym = names.index("musym")
+    muname = names.index("muname")
+    hydgrpdcd = names.index("hydgrpdcd")
+    aoi_envelope = None if aoi is None else aoi.GetEnvelope()
+    for row in rows:
+        geometry = ogr.CreateGeometryFromWkt(row[-1])
+        if aoi is not None:
+            if not envelopes_overlap(aoi_envelope, geometry.GetEnvelope()):
+                continue
+            if not geometry.Intersects(aoi):
+                continue
+            if not aoi.Contains(geometry):
+                geometry = geometry.Intersection(aoi)
+                if geometry is None or geometry.IsEmpty():
+                    continue
+        yield (
+            hsg_index(row[hydgrpdcd], row[musym], row[muname], drained),
+            geometry.ExportToWkb(),
+        )
+
+
+def cn_polygons(job: dict, folder: str) -> list:
+    """Generate CN raster of job area of interest and polygonize it, returns list of
+    (CN, WKB geometry in NLCD crs)"""
+    aoi = ogr.CreateGeometryFromWkt(job["aoi_wkt"])
+    xmin, xmax, ymin, ymax = aoi.GetEnvelope()
+
+    # land cover on the native NLCD grid, the parent process evicts the tile cache as
+    # other workers may be using any tile
+    nlcd_cache = None
+    if job["nlcd_cache_bytes"] > 0:
+        nlcd_cache = NLCDTileCache(
+            job["cache_folder"], job["nlcd_cache_bytes"], evict_on_put=False
+        )
+    nlcd_path = reclassify_nlcd(
+        fetch_nlcd(
+            nlcd_tiles(xmin, ymin, xmax, ymax),
+            NLCD_CRS,
+            (xmin, ymin, xmax, ymax),
+            folder,
+            job["max_workers"],
+            cache=nlcd_cache,
+        ),
+        os.path.join(folder, "NLCD_Raster.tif"),
+    )
+
+    # soil clipped to the area of interest burned on the same grid
+    wgs84 = spatial_reference("EPSG:4326")
+    aoi_wgs84 = aoi.Clone()
+    aoi_wgs84.Transform(
+        osr.CoordinateTransformation(spatial_reference(NLCD_CRS), wgs84)
+    )
+    sda_geometry = ogr.CreateGeometryFromWkt(job["sda_wkt"])
+    soil_xmin, soil_xmax, soil_ymin, soil_ymax = sda_geometry.GetEnvelope()
+    soil_cache = None
+    if job["use_soil_cache"]:
+        soil_cache = SoilCache(os.path.join(job["cache_folder"], "ssurgo.sqlite"))
+    try:
+        cn = compute_cn_grid(
+            nlcd_path,
+            soil_hsg_features(
+                iter_soil(
+                    (soil_xmin, soil_ymin, soil_xmax, soil_ymax),
+                    job["max_workers"],
+                    cache=soil_cache,
+                    lean=True,
+                    clip=ogr_clipper(job["sda_wkt"]),
+                    intersects=ogr_intersects(job["sda_wkt"]),
+                ),
+                job["drained"],
+                aoi_wgs84,
+            ),
+            compile_cn_lut(job["lookup_rows"])[1],
+            wgs84,
+        )[3]
+    finally:
+        if soil_cache is not None:
+            soil_cache.close()
+
+    cn_ds = gdal.Open(
+        write_cn_raster(gdal.Open(nlcd_path), cn, os.path.join(folder, "CN_Raster.tif"))
+    )
+    cn_band = cn_ds.GetRasterBand(1)
+    polygons_ds = ogr.GetDriverByName("Memory").CreateDataSource("cn")
+    polygons_layer = polygons_ds.CreateLayer(
+        "cn", spatial_reference(NLCD_CRS), ogr.wkbPolygon
+    )
+    polygons_layer.CreateField(ogr.FieldDefn("CN", ogr.OFTInteger))
+    gdal.Polygonize(cn_band, cn_band.GetMaskBand(), polygons_layer, 0)
+    return [
+        (feat.GetField(0), feat.GetGeometryRef().ExportToWkb())
+        for feat in polygons_layer
+    ]
+
+
+def run_cn_job(job: dict) -> dict:
+    """Run a single batch job, errors are reported in the result instead of raised
+
+    Runs in a worker process, so job and result only contain picklable values.
+    """
+    result = {"source_id": job["source_id"], "polygons": [], "error": None}
+    try:
+        with tempfile.TemporaryDirectory() as folder:
+            result["polygons"] = cn_polygons(job, folder)
+    except Exception as e:
+        result["error"] = "{}: {}".format(type(e).__name__, e)
+    return result
+
+
+def python_executable() -> str:
+    """Get Python interpreter for worker processes, QGIS embeds Python in its own
+    executable"""
+    if os.path.basename(sys.executable).lower().startswith("python"):
+        return sys.executable
+    for folder in (sys.exec_prefix, os.path.join(sys.exec_prefix, "bin")):
+        for name in ("python.exe", "python3.exe", "python3", "python"):
+            path = os.path.join(folder, name)
+            if os.path.isfile(path):
+                return path
+    return sys.executable
+
+
+def worker_pool(processes: int) -> ProcessPoolExecutor:
+    """Get pool of freshly spawned worker processes"""
+    context = multiprocessing.get_context("spawn")
+    context.set_executable(python_executable())
+    return ProcessPoolExecutor(max_workers=processes, mp_context=context)
@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+
+"""
+/***************************************************************************
+ CurveNumberGenerator
+                                 A QGIS plugin
+ This plugin generates a Curve Number layer for the given Area of Interest within the contiguous United States. It can also download Soil and Land Cover datasets for the same area.
+ Generated by Plugin Builder: http://g-sherman.github.io/Qgis-Plugin-Builder/
+                              -------------------
+        begin                : 2020-06-06
+        copyright            : (C) 2020 by Abdul Raheem Siddiqui
+        email                : mailto:ars.work.ce@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+import argparse
+import datetime
+import json
+import math
+import os
+import platform
+import sys
+import tempfile
+import time
+
+from osgeo import gdal, ogr, osr
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cli import OUTPUTS, run_curve_number, start_qgis
+from servers import StandInServer, restore
+
+__author__ = "Abdul Raheem Siddiqui"
+__date__ = "2020-12-25"
+__copyright__ = "(C) 2020 by Abdul Raheem Siddiqui"
+
+# This will get replaced with a git SHA1 when you do a git archive
+
+__revision__ = "$Format:%H$"
+
+ACRES_LADDER = (1000, 5000, 25000, 100000, 500000)
+SQUARE_METERS_PER_ACRE = 4046.8564224
+# center of the benchmark areas of interest in EPSG:5070, central Kansas
+AOI_CENTER = (-150000, 1750000)
+RESULTS_FORMAT = 1
+
+
+def square_aoi(acres: float, path: str) -> str:
+    """Write a square area of interest of acres in EPSG:5070 to GeoPackage path"""
+    half = math.sqrt(acres * SQUARE_METERS_PER_ACRE) / 2
+    x, y = AOI_CENTER
+    ring = ogr.Geometry(ogr.wkbLinearRing)
+    for px, py in (
+        (x - half, y - half),
+        (x + half, y - half),
+        (x + half, y + half),
+        (x - half, y + half),
+        (x - half, y - half),
+    ):
+        ring.AddPoint_2D(px, py)
+    polygon = ogr.Geometry(ogr.wkbPolygon)
+    polygon.AddGeometry(ring)
+
+    srs = osr.SpatialReference()
+    srs.ImportFromEPSG(5070)
+    dataset = ogr.GetDriverByName("GPKG").CreateDataSource(path)
+    layer = dataset.CreateLayer("aoi", srs, ogr.wkbPolygon)
+    feature = ogr.Feature(layer.GetLayerDefn())
+    feature.SetGeometry(polygon)
+    layer.CreateFeature(feature)
+    dataset = None
+    return path
+
+
+def plugin_version() -> str:
+    metadata = os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "metadata.txt"
+    )
+    with open(metadata) as metadata_file:
+        for line in metadata_file:
+            if line.startswith("version="):
+                return line.split("=", 1)[1].strip()
+    return ""
+
+
+def environment() -> dict:
+    from qgis.core import Qgis
+
+    return {
+        "plugin_version": plugin_version(),
+        "qgis": Qgis.QGIS_VERSION,
+        "gdal": gdal.__version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def run_benchmark(
+    acres: float, outputs: list, folder: str, server: StandInServer, repeat: int
+) -> list:
+    """Run the algorithm on a square area of acres repeat times, returns run records"""
+    aoi_path = square_aoi(acres, os.path.join(folder, "aoi_{}.gpkg".format(acres)))
+    runs = []
+    for attempt in range(repeat):
+        output_folder = os.path.join(folder, "{}_{}".format(acres, attempt))
+        requests_before = dict(server.requests)
+        start = time.perf_counter()
+        results = run_curve_number(
+            aoi_path,
+            output_folder,
+            outputs,
+            nlcd_cache_mb=0,
+            use_soil_cache=False,
+            reuse_stage_results=False,
+        )
+        wall_seconds = time.perf_counter() - start
+        with open(results["Profile"]) as profile_file:
+            profile = json.load(profile_file)
+        runs.append(
+            {
+                "acres": acres,
+                "attempt": attempt,
+                "wall_seconds": wall_seconds,
+                "peak_rss_mb": profile["peak_rss_mb"],
+                "requests": {
+                    endpoint: count - requests_before.get(endpoint, 0)
+                    for endpoint, count in server.requests.items()
+                },
+                "stages": profile["stages"],
+            }
+        )
+        print(
+            "{} acres, run {}: {:.1f} s".format(acres, attempt + 1, wall_seconds),
+            file=sys.stderr,
+        )
+    return runs
+
+
+def median(values: list) -> float:
+    values = sorted(values)
+    middle = len(values) // 2
+    return (
+        values[middle] if len(values) % 2 else (values[middle - 1] + values[middle]) / 2
+    )
+
+
+def timings(results: dict) -> dict:
+    """Median wall time of the whole run and every stage, {(acres, stage): seconds}"""
+    samples = {}
+    for run in results["runs"]:
+        samples.setdefault((run["acres"], "total"), []).append(run["wall_seconds"])
+        for stage, record in run["stages"].items():
+            samples.setdefault((run["acres"], stage), []).append(record["wall_seconds"])
+    return {key: median(values) for key, values in samples.items()}
+
+
+def compare(results: dict, baseline: dict) -> list:
+    """Lines comparing median timings of results with baseline"""
+    current = timings(results)
+    previous = timings(baseline)
+    lines = []
+    for key in sorted(current, key=lambda key: (key[0], key[1] != "total", key[1])):
+        if key not in previous:
+            continue
+        acres, stage = key
+        lines.append(
+            "{:>8} acres {:<18} {:8.2f} s {:8.2f} s {:+7.1%}".format(
+                acres,
+                stage,
+                previous[key],
+                current[key],
+                current[key] / previous[key] - 1 if previous[key] else 0,
+            )
+        )
+    return lines
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Time Curve Number Generator and its stages over a ladder of "
+        "area of interest sizes against local stand-ins of the MRLC and SDA services."
+    )
+    parser.add_argument(
+        "-o", "--results", default="benchmark_results.json", help="results JSON file"
+    )
+    parser.add_argument(
+        "--acres", nargs="+", type=float, default=ACRES_LADDER, help="AOI sizes"
+    )
+    parser.add_argument(
+        "--outputs",
+        nargs="+",
+        choices=sorted(OUTPUTS),
+        default=["cn-layer", "cn-raster"],
+    )
+    parser.add_argument("--repeat", type=int, default=1, help="runs per AOI size")
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="seconds added to every request"
+    )
+    parser.add_argument(
+        "--nlcd-tile", help="recorded NLCD GetMap GeoTIFF to repeat as land cover"
+    )
+    parser.add_argument(
+        "--wfs", action="store_true", help="fail post.rest so soil comes from WFS"
+    )
+    parser.add_argument("--baseline", help="earlier results JSON to compare with")
+    args = parser.parse_args(argv)
+
+    start_qgis()
+    server = StandInServer(
+        args.latency, args.nlcd_tile, 500 if args.wfs else 200
+    ).start()
+    replaced = server.redirect()
+    results = {
+        "format": RESULTS_FORMAT,
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "environment": environment(),
+        "settings": {
+            "outputs": args.outputs,
+            "latency": args.latency,
+            "nlcd_tile": args.nlcd_tile,
+            "wfs": args.wfs,
+        },
+        "runs": [],
+    }
+    try:
+        with tempfile.TemporaryDirectory() as folder:
+            for acres in args.acres:
+                results["runs"].extend(
+                    run_benchmark(acres, args.outputs, folder, server, args.repeat)
+                )
+    finally:
+        restore(replaced)
+        server.stop()
+
+    with open(args.results, "w") as results_file:
+        json.dump(results, results_file, indent=2)
+    print("Results written to " + args.results, file=sys.stderr)
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        print(
+            "{:>8} acres {:<18} {:>10} {:>10} {:>7}".format(
+                "", "stage", "baseline", "current", "change"
+            )
+        )
+        for line in compare(results, baseline):
+            print(line)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
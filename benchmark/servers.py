@@ -0,0 +1,303 @@
+# -*- coding: utf-8 -*-
+
+"""
+/***************************************************************************
+ CurveNumberGenerator
+                                 A QGIS plugin
+ This plugin generates a Curve Number layer for the given Area of Interest within the contiguous United States. It can also download Soil and Land Cover datasets for the same area.
+ Generated by Plugin Builder: http://g-sherman.github.io/Qgis-Plugin-Builder/
+                              -------------------
+        begin                : 2020-06-06
+        copyright            : (C) 2020 by Abdul Raheem Siddiqui
+        email                : mailto:ars.work.ce@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+import json
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+from osgeo import gdal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import nlcd
+import ssurgo
+
+__author__ = "Abdul Raheem Siddiqui"
+__date__ = "2020-12-25"
+__copyright__ = "(C) 2020 by Abdul Raheem Siddiqui"
+
+# This will get replaced with a git SHA1 when you do a git archive
+
+__revision__ = "$Format:%H$"
+
+# side of synthetic land cover patches in meters
+LAND_COVER_PATCH = 300
+# side of synthetic soil polygons in degrees
+SOIL_CELL = 0.01
+# distinct synthetic map units
+MAP_UNITS = 50
+HSG_VALUES = ("A", "B", "C", "D", "A/D", "B/D", "C/D", None)
+
+
+def read_pattern(path: str) -> np.ndarray:
+    """Palette indices of a recorded NLCD GetMap GeoTIFF"""
+    dataset = gdal.Open(path)
+    return dataset.GetRasterBand(1).ReadAsArray()
+
+
+def land_cover_tile(
+    bbox: tuple, width: int, height: int, crs: str, pattern: np.ndarray = None
+) -> bytes:
+    """GeoTIFF of palette indices that line up across tiles, synthetic patches or the
+    recorded pattern repeated over the grid"""
+    xmin, ymin, xmax, ymax = bbox
+    xs = xmin + (np.arange(width) + 0.5) * (xmax - xmin) / width
+    ys = ymax - (np.arange(height) + 0.5) * (ymax - ymin) / height
+    if pattern is not None:
+        cols = np.floor(xs / nlcd.NLCD_PIXEL_SIZE).astype(np.int64)
+        rows = np.floor(-ys / nlcd.NLCD_PIXEL_SIZE).astype(np.int64)
+        palette = pattern[
+            (rows % pattern.shape[0])[:, None], (cols % pattern.shape[1])[None, :]
+        ].astype(np.uint8)
+    else:
+        cols = np.floor(xs / LAND_COVER_PATCH).astype(np.int64)
+        rows = np.floor(ys / LAND_COVER_PATCH).astype(np.int64)
+        patches = (rows[:, None] * 73856093) ^ (cols[None, :] * 19349663)
+        palette = (patches % (len(nlcd.NLCD_PALETTE_CODES) - 1) + 1).astype(np.uint8)
+
+    path = "/vsimem/" + uuid.uuid4().hex + ".tif"
+    dataset = gdal.GetDriverByName("GTiff").Create(
+        path, width, height, 1, gdal.GDT_Byte
+    )
+    dataset.SetGeoTransform(
+        (xmin, (xmax - xmin) / width, 0, ymax, 0, -(ymax - ymin) / height)
+    )
+    dataset.SetProjection(crs)
+    dataset.GetRasterBand(1).WriteArray(palette)
+    dataset = None
+    handle = gdal.VSIFOpenL(path, "rb")
+    gdal.VSIFSeekL(handle, 0, 2)
+    size = gdal.VSIFTellL(handle)
+    gdal.VSIFSeekL(handle, 0, 0)
+    content = gdal.VSIFReadL(1, size, handle)
+    gdal.VSIFCloseL(handle)
+    gdal.Unlink(path)
+    return content
+
+
+def soil_cells(bbox: tuple) -> list:
+    """Synthetic soil polygons of the global cell grid intersecting WGS84 bbox, returns
+    (mukey, mupolygonkey, areasymbol, polygon coordinates)"""
+    xmin, ymin, xmax, ymax = bbox
+    cells = []
+    for row in range(int(np.floor(ymin / SOIL_CELL)), int(np.ceil(ymax / SOIL_CELL))):
+        for col in range(
+            int(np.floor(xmin / SOIL_CELL)), int(np.ceil(xmax / SOIL_CELL))
+        ):
+            x0, y0 = col * SOIL_CELL, row * SOIL_CELL
+            x1, y1 = x0 + SOIL_CELL, y0 + SOIL_CELL
+            cells.append(
+                (
+                    str(1000 + (col * 31 + row * 17) % MAP_UNITS),
+                    "{}_{}".format(col, row),
+                    "XX{:03d}".format(int(np.floor(x0)) % 1000),
+                    [(x0, y0), (x1, y0), (x1, y1), (x0, y1), (x0, y0)],
+                )
+            )
+    return cells
+
+
+def map_unit_value(mukey: str, column: str):
+    """Synthetic muaggatt value of map unit"""
+    index = int(mukey) % MAP_UNITS
+    if column == "mukey":
+        return mukey
+    if column == "musym":
+        return "W" if index == 0 else "S" + mukey
+    if column == "muname":
+        return "Water" if index == 0 else "Synthetic soil " + mukey
+    if column == "hydgrpdcd":
+        return None if index == 0 else HSG_VALUES[index % len(HSG_VALUES)]
+    return str(index)
+
+
+def select_columns(query: str) -> list:
+    """Column names of the select clause of query"""
+    columns = re.match(r"\s*select\s+(.*?)\s+from\s", query, re.I | re.S).group(1)
+    return [column.strip().split(".")[-1].lower() for column in columns.split(",")]
+
+
+def sda_rows(query: str) -> list:
+    """Answer the SDA queries of the plugin with synthetic rows"""
+    columns = select_columns(query)
+    if "from mupolygon" in query:
+        rows = []
+        for mukey, mupolygonkey, areasymbol, ring in soil_cells(
+            ssurgo.wkt_bounds(re.search(r"WktWgs84\('(.*?)'\)", query, re.I).group(1))
+        ):
+            values = {
+                "mukey": mukey,
+                "mupolygonkey": mupolygonkey,
+                "areasymbol": areasymbol,
+                "nationalmusym": "n" + mukey,
+                "mupolygongeo": "POLYGON (("
+                + ", ".join("{} {}".format(x, y) for x, y in ring)
+                + "))",
+            }
+            rows.append([values[column] for column in columns])
+        return rows
+    keys = re.findall(r"'([^']*)'", query[query.lower().index(" in (") :])
+    if "from sacatalog" in query:
+        return [[areasymbol, "2020-01-01"] for areasymbol in keys]
+    return [[map_unit_value(mukey, column) for column in columns] for mukey in keys]
+
+
+def wfs_collection(bbox: tuple) -> bytes:
+    """GML feature collection of synthetic soil polygons with y, x coordinates"""
+    members = []
+    for mukey, mupolygonkey, areasymbol, ring in soil_cells(bbox):
+        fields = "".join(
+            "<ms:{0}>{1}</ms:{0}>".format(column, map_unit_value(mukey, column) or "")
+            for column in ("mukey", "musym", "muname", "hydgrpdcd")
+        )
+        members.append(
+            "<gml:featureMember><ms:mapunitpolyextended>"
+            + fields
+            + "<ms:mupolygonkey>{}</ms:mupolygonkey>".format(mupolygonkey)
+            + "<ms:areasymbol>{}</ms:areasymbol>".format(areasymbol)
+            + '<ms:multiPolygon><gml:Polygon srsName="EPSG:4326"><gml:exterior>'
+            + "<gml:LinearRing><gml:posList>"
+            + " ".join("{} {}".format(y, x) for x, y in ring)
+            + "</gml:posList></gml:LinearRing></gml:exterior></gml:Polygon>"
+            + "</ms:multiPolygon></ms:mapunitpolyextended></gml:featureMember>"
+        )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        '<wfs:FeatureCollection xmlns:wfs="http://www.opengis.net/wfs" '
+        'xmlns:gml="http://www.opengis.net/gml" '
+        'xmlns:ms="http://mapserver.gis.umn.edu/mapserver">'
+        + "".join(members)
+        + "</wfs:FeatureCollection>"
+    ).encode("utf-8")
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Serve GetMap, post.rest and WFS GetFeature requests of the plugin"""
+
+    def log_message(self, format, *args):
+        pass
+
+    def reply(self, content: bytes, content_type: str, status: int = 200):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def count(self, endpoint: str):
+        with self.server.lock:
+            self.server.requests[endpoint] = self.server.requests.get(endpoint, 0) + 1
+        time.sleep(self.server.latency)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {key.lower(): value[0] for key, value in parse_qs(url.query).items()}
+        if url.path.endswith("/ows"):
+            self.count("wms")
+            bbox = tuple(float(coord) for coord in query["bbox"].split(","))
+            width, height = int(query["width"]), int(query["height"])
+            self.reply(
+                land_cover_tile(bbox, width, height, query["crs"], self.server.pattern),
+                "image/geotiff",
+            )
+        elif url.path.endswith(".wfs"):
+            self.count("wfs")
+            bbox = tuple(float(coord) for coord in query["bbox"].split(","))
+            self.reply(wfs_collection(bbox), "text/xml; subtype=gml/3.1.1")
+        else:
+            self.reply(b"Not found", "text/plain", 404)
+
+    def do_POST(self):
+        self.count("sda")
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if self.server.sda_status != 200:
+            self.reply(b"Stand-in failure", "text/plain", self.server.sda_status)
+            return
+        self.reply(
+            json.dumps({"Table": sda_rows(body["query"])}).encode("utf-8"),
+            "application/json",
+        )
+
+
+class StandInServer(ThreadingHTTPServer):
+    """Local stand-in for the MRLC WMS and the SDA post.rest and WFS endpoints
+
+    latency is added to every request in seconds. The land cover of nlcd_tile, a
+    recorded GetMap GeoTIFF, is repeated instead of synthetic land cover. Any
+    sda_status other than 200 makes post.rest fail so WFS is used instead.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        latency: float = 0,
+        nlcd_tile: str = None,
+        sda_status: int = 200,
+        port: int = 0,
+    ):
+        super().__init__(("127.0.0.1", port), StandInHandler)
+        self.latency = latency
+        self.pattern = None if nlcd_tile is None else read_pattern(nlcd_tile)
+        self.sda_status = sda_status
+        self.requests = {}
+        self.lock = threading.Lock()
+        self.thread = None
+
+    @property
+    def url(self) -> str:
+        return "http://127.0.0.1:{}".format(self.server_address[1])
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def redirect(self) -> dict:
+        """Point the plugin modules at this server, returns the replaced URLs"""
+        replaced = {
+            (nlcd, "NLCD_WMS_URL"): nlcd.NLCD_WMS_URL,
+            (ssurgo, "SDA_URL"): ssurgo.SDA_URL,
+            (ssurgo, "SDA_WFS_URL"): ssurgo.SDA_WFS_URL,
+        }
+        nlcd.NLCD_WMS_URL = self.url + "/geoserver/ows"
+        ssurgo.SDA_URL = self.url + "/TABULAR/post.rest"
+        ssurgo.SDA_WFS_URL = self.url + "/Spatial/SDMWGS84GEOGRAPHIC.wfs"
+        return replaced
+
+
+def restore(replaced: dict):
+    """Undo StandInServer.redirect"""
+    for (module, name), url in replaced.items():
+        setattr(module, name, url)
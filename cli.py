@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+
+"""
+/***************************************************************************
+ CurveNumberGenerator
+                                 A QGIS plugin
+ This plugin generates a Curve Number layer for the given Area of Interest within the contiguous United States. It can also download Soil and Land Cover datasets for the same area.
+ Generated by Plugin Builder: http://g-sherman.github.io/Qgis-Plugin-Builder/
+                              -------------------
+        begin                : 2020-06-06
+        copyright            : (C) 2020 by Abdul Raheem Siddiqui
+        email                : mailto:ars.work.ce@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+import argparse
+import glob
+import importlib
+import os
+import sys
+
+__author__ = "Abdul Raheem Siddiqui"
+__date__ = "2020-12-25"
+__copyright__ = "(C) 2020 by Abdul Raheem Siddiqui"
+
+# This will get replaced with a git SHA1 when you do a git archive
+
+__revision__ = "$Format:%H$"
+
+ALGORITHM_ID = "ARS Toolbox:Curve Number Generator"
+# command line output name to algorithm parameter
+OUTPUTS = {
+    "nlcd-raster": "OutputNLCDLandCoverRaster",
+    "nlcd-vector": "OutputNLCDLandCoverVector",
+    "soil": "OutputSoilLayer",
+    "cn-layer": "OutputCurveNumberLayer",
+    "cn-raster": "OutputCurveNumberRaster",
+    "composite": "OutputCompositeCurveNumber",
+}
+AOI_PATTERNS = ("*.shp", "*.gpkg", "*.geojson", "*.json", "*.kml")
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+EXIT_NO_QGIS = 3
+
+_app = None
+
+
+def console_feedback(quiet: bool = False):
+    """Processing feedback writing messages to stderr"""
+    from qgis.core import QgsProcessingFeedback
+
+    class ConsoleFeedback(QgsProcessingFeedback):
+        def reportError(self, error, fatalError=False):
+            print("ERROR: " + error, file=sys.stderr)
+
+        def pushInfo(self, info):
+            if not quiet:
+                print(info, file=sys.stderr)
+
+        def pushConsoleInfo(self, info):
+            self.pushInfo(info)
+
+    return ConsoleFeedback()
+
+
+def start_qgis():
+    """Start a minimal QgsApplication and register Processing and this provider once,
+    QGIS is imported here so the command line can report when it is missing"""
+    global _app
+    if _app is not None:
+        return _app
+    from qgis.core import QgsApplication
+
+    QgsApplication.setPrefixPath(os.environ.get("QGIS_PREFIX_PATH", sys.prefix), True)
+    _app = QgsApplication([], False)
+    _app.initQgis()
+    sys.path.append(os.path.join(QgsApplication.pkgDataPath(), "python", "plugins"))
+    from processing.core.Processing import Processing
+    from qgis.analysis import QgsNativeAlgorithms
+
+    Processing.initialize()
+    if QgsApplication.processingRegistry().providerById("native") is None:
+        QgsApplication.processingRegistry().addProvider(QgsNativeAlgorithms())
+
+    # the plugin folder is a package with relative imports
+    plugin_folder = os.path.dirname(os.path.abspath(__file__))
+    sys.path.append(os.path.dirname(plugin_folder))
+    provider_module = importlib.import_module(
+        os.path.basename(plugin_folder) + ".curve_number_generator_provider"
+    )
+    QgsApplication.processingRegistry().addProvider(
+        provider_module.CurveNumberGeneratorProvider()
+    )
+    return _app
+
+
+def find_aoi_files(paths: list) -> list:
+    """Expand directories in paths to the vector files they contain"""
+    aoi_files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for pattern in AOI_PATTERNS:
+                aoi_files.extend(sorted(glob.glob(os.path.join(path, pattern))))
+        else:
+            aoi_files.append(path)
+    return aoi_files
+
+
+def run_curve_number(
+    aoi_path: str,
+    output_folder: str,
+    outputs=("cn-raster",),
+    lookup: str = None,
+    drained: bool = False,
+    vectorize: bool = False,
+    max_downloads: int = 4,
+    nlcd_cache_mb: int = 1024,
+    use_soil_cache: bool = True,
+    min_mapping_unit: int = 0,
+    reuse_stage_results: bool = True,
+    feedback=None,
+) -> dict:
+    """Run Curve Number Generator for one area of interest file
+
+    Requested outputs are written to output_folder, returns {output name: path}.
+    """
+    # processing is only importable once start_qgis added the QGIS plugins folder
+    start_qgis()
+    import processing
+
+    parameters = {
+        "areaboundary": aoi_path,
+        "cnlookup": lookup,
+        "drainedsoilsleaveuncheckedifnotsure": drained,
+        "VectorizeCurveNumberRaster": vectorize,
+        "maxconcurrentdownloads": max_downloads,
+        "nlcdcachesizemb": nlcd_cache_mb,
+        "usesoilcache": use_soil_cache,
+        "minimummappingunitpixels": min_mapping_unit,
+        "reusestageresults": reuse_stage_results,
+        "OutputFolder": output_folder,
+    }
+    for output, parameter in OUTPUTS.items():
+        parameters[parameter] = output in outputs
+    return processing.run(ALGORITHM_ID, parameters, feedback=feedback)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Generate Curve Number outputs for area of interest files "
+        "without the QGIS desktop application."
+    )
+    parser.add_argument(
+        "inputs", nargs="+", help="area of interest vector files or directories"
+    )
+    parser.add_argument(
+        "-o",
+        "--output-folder",
+        required=True,
+        help="outputs of each input go to a subfolder named after the input file",
+    )
+    parser.add_argument(
+        "--outputs",
+        nargs="+",
+        choices=sorted(OUTPUTS),
+        default=["cn-raster"],
+        help="outputs to generate (default: cn-raster)",
+    )
+    parser.add_argument("--lookup", help="CN lookup table, default CN_Lookup.csv")
+    parser.add_argument("--drained", action="store_true", help="drained soils")
+    parser.add_argument(
+        "--vectorize", action="store_true", help="also vectorize the CN raster"
+    )
+    parser.add_argument("--max-downloads", type=int, default=4)
+    parser.add_argument("--nlcd-cache-mb", type=int, default=1024)
+    parser.add_argument("--no-soil-cache", action="store_true")
+    parser.add_argument(
+        "--min-mapping-unit",
+        type=int,
+        default=0,
+        help="merge NLCD regions smaller than this many pixels before vectorizing",
+    )
+    parser.add_argument(
+        "--no-stage-reuse",
+        action="store_true",
+        help="do not reuse step results of earlier inputs with the same parameters",
+    )
+    parser.add_argument("-q", "--quiet", action="store_true")
+    args = parser.parse_args(argv)
+
+    aoi_files = find_aoi_files(args.inputs)
+    if not aoi_files:
+        print("No area of interest files found", file=sys.stderr)
+        return EXIT_USAGE
+    try:
+        start_qgis()
+    except ImportError as e:
+        print("QGIS Python bindings not found: " + str(e), file=sys.stderr)
+        return EXIT_NO_QGIS
+    except Exception as e:
+        print("Could not start QGIS: " + str(e), file=sys.stderr)
+        return EXIT_NO_QGIS
+
+    failed = 0
+    for aoi_path in aoi_files:
+        name = os.path.splitext(os.path.basename(aoi_path))[0]
+        try:
+            results = run_curve_number(
+                aoi_path,
+                os.path.join(args.output_folder, name),
+                args.outputs,
+                args.lookup,
+                args.drained,
+                args.vectorize,
+                args.max_downloads,
+                args.nlcd_cache_mb,
+                not args.no_soil_cache,
+                args.min_mapping_unit,
+                not args.no_stage_reuse,
+                console_feedback(args.quiet),
+            )
+        except Exception as e:
+            failed += 1
+            print(aoi_path + ": failed: " + str(e), file=sys.stderr)
+            continue
+        if not results:
+            failed += 1
+            print(aoi_path + ": failed", file=sys.stderr)
+            continue
+        for output, path in sorted(results.items()):
+            print(aoi_path + ": " + output + ": " + path)
+    return EXIT_FAILED if failed else EXIT_OK
+
+
+if __name__ == "__main__":
+    sys.exit(main())
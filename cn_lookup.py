@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+
+"""
+/***************************************************************************
+ CurveNumberGenerator
+                                 A QGIS plugin
+ This plugin generates a Curve Number layer for the given Area of Interest within the contiguous United States. It can also download Soil and Land Cover datasets for the same area.
+ Generated by Plugin Builder: http://g-sherman.github.io/Qgis-Plugin-Builder/
+                              -------------------
+        begin                : 2020-06-06
+        copyright            : (C) 2020 by Abdul Raheem Siddiqui
+        email                : mailto:ars.work.ce@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+import csv
+import hashlib
+import threading
+
+import numpy as np
+
+from cust_functions import HSG_CLASSES, HSG_WATER_INDEX, parse_gdcode
+
+__author__ = "Abdul Raheem Siddiqui"
+__date__ = "2020-12-25"
+__copyright__ = "(C) 2020 by Abdul Raheem Siddiqui"
+
+# This will get replaced with a git SHA1 when you do a git archive
+
+__revision__ = "$Format:%H$"
+
+CN_NODATA = 255
+
+# compiled lookup tables of this process by hash of their source
+_lut_cache = {}
+_lut_lock = threading.Lock()
+
+
+def build_cn_lut(lookup_rows) -> np.ndarray:
+    """Build dense CN array indexed by [NLCD code, HSG index] from (GDCode, CN) pairs,
+    raises ValueError naming the first invalid GDCode or CN"""
+    lut = np.full((256, HSG_WATER_INDEX + 1), CN_NODATA, dtype=np.uint8)
+    for gdcode, cn in lookup_rows:
+        if gdcode in (None, "") or cn in (None, ""):
+            continue
+        try:
+            nlcd_code, hsg = parse_gdcode(gdcode)
+            hsg_index = HSG_CLASSES.index(hsg)
+        except ValueError:
+            nlcd_code = -1
+        if not 0 <= nlcd_code < lut.shape[0]:
+            raise ValueError("Invalid GDCode in CN lookup table: " + str(gdcode))
+        try:
+            cn_value = int(float(cn))
+        except ValueError:
+            cn_value = -1
+        if not 0 <= cn_value < CN_NODATA:
+            raise ValueError(
+                "Invalid CN of GDCode {} in CN lookup table: {}".format(gdcode, cn)
+            )
+        lut[nlcd_code, hsg_index] = cn_value
+    # water soils without HSG are looked up as GDCode '11' irrespective of land cover
+    lut[:, HSG_WATER_INDEX] = lut[11, 0]
+    return lut
+
+
+def read_lookup_csv(path: str) -> list:
+    """Read (GDCode, CN_Join) pairs of a CN lookup CSV file"""
+    with open(path, newline="", encoding="utf-8-sig") as csv_file:
+        return [
+            (row.get("GDCode") or "", row.get("CN_Join") or "")
+            for row in csv.DictReader(csv_file)
+        ]
+
+
+def missing_gdcodes(lut: np.ndarray, nlcd_codes) -> list:
+    """GDCodes of NLCD codes and HSG classes without CN in the lookup table"""
+    return [
+        str(nlcd_code) + hsg
+        for nlcd_code in nlcd_codes
+        for index, hsg in enumerate(HSG_CLASSES)
+        if lut[nlcd_code, index] == CN_NODATA
+    ]
+
+
+def _cached_lut(key: str, lookup_rows) -> tuple:
+    with _lut_lock:
+        if key not in _lut_cache:
+            lut = build_cn_lut(lookup_rows())
+            # shared between runs, so it must never be changed in place
+            lut.setflags(write=False)
+            _lut_cache[key] = lut
+        return key, _lut_cache[key]
+
+
+def compile_cn_lut(lookup_rows) -> tuple:
+    """Get compiled CN array of (GDCode, CN) pairs, returns (hash, CN array)"""
+    lookup_rows = [(str(gdcode or ""), str(cn or "")) for gdcode, cn in lookup_rows]
+    key = hashlib.sha256(repr(lookup_rows).encode("utf-8")).hexdigest()
+    return _cached_lut(key, lambda: lookup_rows)
+
+
+def load_cn_lut(path: str) -> tuple:
+    """Get compiled CN array of a CN lookup CSV file, compiled once per process for every
+    file content, returns (hash, CN array)"""
+    sha = hashlib.sha256()
+    with open(path, "rb") as csv_file:
+        for chunk in iter(lambda: csv_file.read(1 << 16), b""):
+            sha.update(chunk)
+    return _cached_lut(sha.hexdigest(), lambda: read_lookup_csv(path))
+
+
+def clear_cn_lut_cache():
+    """Forget compiled lookup tables of this process"""
+    with _lut_lock:
+        _lut_cache.clear()
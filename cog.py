@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+
+"""
+/***************************************************************************
+ CurveNumberGenerator
+                                 A QGIS plugin
+ This plugin generates a Curve Number layer for the given Area of Interest within the contiguous United States. It can also download Soil and Land Cover datasets for the same area.
+ Generated by Plugin Builder: http://g-sherman.github.io/Qgis-Plugin-Builder/
+                              -------------------
+        begin                : 2020-06-06
+        copyright            : (C) 2020 by Abdul Raheem Siddiqui
+        email                : mailto:ars.work.ce@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+from osgeo import gdal
+
+__author__ = "Abdul Raheem Siddiqui"
+__date__ = "2020-12-25"
+__copyright__ = "(C) 2020 by Abdul Raheem Siddiqui"
+
+# This will get replaced with a git SHA1 when you do a git archive
+
+__revision__ = "$Format:%H$"
+
+COG_BLOCK_SIZE = 512
+# land cover and curve number are categories, overviews must not blend them
+COG_OPTIONS = [
+    "COMPRESS=DEFLATE",
+    "BLOCKSIZE=" + str(COG_BLOCK_SIZE),
+    "OVERVIEWS=AUTO",
+    "RESAMPLING=NEAREST",
+    "BIGTIFF=IF_SAFER",
+]
+
+
+def overview_levels(width: int, height: int, block_size: int = COG_BLOCK_SIZE) -> list:
+    """Overview decimation factors until the smallest overview fits in a single block"""
+    levels = []
+    factor = 1
+    while max(width, height) / factor > block_size:
+        factor *= 2
+        levels.append(factor)
+    return levels
+
+
+def write_cog(source, output_path: str, data_type=None, nodata=None) -> str:
+    """Write raster dataset or path as internally tiled, DEFLATE compressed Cloud
+    Optimized GeoTIFF with nearest neighbour overviews"""
+    options = {}
+    if data_type is not None:
+        options["outputType"] = data_type
+    if nodata is not None:
+        options["noData"] = nodata
+    if gdal.GetDriverByName("COG") is not None:
+        cog_ds = gdal.Translate(
+            output_path, source, format="COG", creationOptions=COG_OPTIONS, **options
+        )
+    else:  # for GDAL older than 3.1, overviews are built in memory and copied
+        mem_ds = gdal.Translate("", source, format="MEM", **options)
+        mem_ds.BuildOverviews(
+            "NEAREST", overview_levels(mem_ds.RasterXSize, mem_ds.RasterYSize)
+        )
+        cog_ds = gdal.Translate(
+            output_path,
+            mem_ds,
+            format="GTiff",
+            creationOptions=[
+                "COMPRESS=DEFLATE",
+                "TILED=YES",
+                "BLOCKXSIZE=" + str(COG_BLOCK_SIZE),
+                "BLOCKYSIZE=" + str(COG_BLOCK_SIZE),
+                "COPY_SRC_OVERVIEWS=YES",
+                "BIGTIFF=IF_SAFER",
+            ],
+        )
+        mem_ds = None
+    if cog_ds is None:
+        raise OSError("Could not write " + output_path)
+    cog_ds = None
+    return output_path
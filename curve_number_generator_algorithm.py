@@ -22,25 +22,32 @@
  ***************************************************************************/
 """
 import sys
+import hashlib
 import inspect
-import requests
+import json
 import os
 import processing
+from osgeo import gdal, ogr
 from qgis.PyQt.QtGui import QIcon
-from qgis.PyQt.QtCore import QCoreApplication, QVariant
+from qgis.PyQt.QtCore import QCoreApplication, Qt, QVariant
 from qgis.core import (
     QgsProcessing,
     QgsFeatureSink,
     QgsProcessingAlgorithm,
+    QgsProcessingException,
     QgsProcessingParameterFeatureSource,
-    QgsProcessingMultiStepFeedback,
+    QgsProcessingFeedback,
     QgsProcessingParameterVectorLayer,
     QgsProcessingParameterBoolean,
+    QgsProcessingParameterNumber,
     QgsProcessingParameterFeatureSink,
     QgsProcessingParameterRasterDestination,
+    QgsProcessingParameterFolderDestination,
     QgsProcessingParameterDefinition,
+    QgsProcessingParameterEnum,
     QgsCoordinateReferenceSystem,
-    QgsExpression,
+    QgsCoordinateTransform,
+    QgsApplication,
     QgsVectorLayer,
     QgsDistanceArea,
     QgsUnitTypes,
@@ -48,13 +55,71 @@ from qgis.core import (
     QgsProject,
     QgsGeometry,
     QgsField,
+    QgsFields,
     QgsFeature,
+    QgsFeatureRequest,
+    QgsMapLayerStyle,
+    QgsMemoryProviderUtils,
+    QgsProcessingUtils,
+    QgsRasterLayer,
+    QgsWkbTypes,
 )
 
 cmd_folder = os.path.split(inspect.getfile(inspect.currentframe()))[0]
 sys.path.append(cmd_folder)
 
-from cust_functions import check_crs_acceptable
+from cust_functions import (
+    HSG_CLASSES,
+    HSG_WATER_INDEX,
+    check_crs_acceptable,
+)
+from cn_lookup import (
+    CN_NODATA,
+    compile_cn_lut,
+    load_cn_lut,
+    missing_gdcodes,
+)
+from raster_cn import (
+    burn_zones,
+    compute_cn_grid,
+    layer_hsg_features,
+    write_cn_raster,
+)
+from zonal import breakdown_gdcode, composite_cn, cover_breakdown
+from nlcd import (
+    NLCD_CRS,
+    NLCD_PALETTE_CODES,
+    NLCD_PIXEL_SIZE,
+    NLCDTileCache,
+    count_regions,
+    fetch_nlcd,
+    nlcd_tiles,
+    reclassify_nlcd,
+    sieve_nlcd,
+)
+from ssurgo import (
+    SDA_MAX_VERTICES,
+    SOIL_BATCH_SIZE,
+    SoilCache,
+    iter_soil,
+    sda_wfs_url,
+    soil_attributes,
+)
+from aoi import (
+    degrees_for_meters,
+    dissolve_layer,
+    geometry_clipper,
+    geometry_intersects,
+    query_geometry,
+)
+from cog import write_cog
+from geopackage import GPKG_CHUNK_SIZE, GeoPackageSink, write_geopackage
+from network import download_file
+from overlay import cn_features, cn_fields, overlay_fields, overlay_soil_land_cover
+import nlcd
+import ssurgo
+from pipeline import Pipeline, Stage, StageMemo, update_costs
+from profiling import Profiler
 
 __author__ = "Abdul Raheem Siddiqui"
 __date__ = "2020-12-25"
@@ -64,6 +129,101 @@ __copyright__ = "(C) 2020 by Abdul Raheem Siddiqui"
 
 __revision__ = "$Format:%H$"
 
+# intermediate vector layers of child algorithms are kept in memory unless their
+# inputs have more features, then they are written to temporary files
+MEMORY_FEATURE_LIMIT = 500000
+
+# vector stages writing requested outputs straight to the output folder
+OUTPUT_FOLDER_STAGES = [
+    "nlcd_vector",
+    "soil_layer",
+    "cn_layer",
+    "composite_cn",
+    "cn_breakdown",
+]
+
+# default stage costs in seconds until durations of a run are measured
+STAGE_COSTS = {
+    "nlcd_download": 20.0,
+    "nlcd_raster": 2.0,
+    "nlcd_raster_style": 0.1,
+    "nlcd_vector": 10.0,
+    "nlcd_vector_style": 0.1,
+    "aoi_4326": 0.5,
+    "soil_download": 30.0,
+    "soil_fixed": 8.0,
+    "soil_layer": 2.0,
+    "soil_style": 0.1,
+    "cn_layer": 5.0,
+    "cn_raster": 5.0,
+    "cn_raster_vector": 10.0,
+    "cn_grid": 5.0,
+    "zones": 1.0,
+    "composite_cn": 0.5,
+    "cn_breakdown": 0.5,
+    "overlay": 15.0,
+    "cn_layer_style": 0.1,
+    "cn_raster_vector_style": 0.1,
+}
+# stages offered for cProfile capture, the enum index of a stage is its position
+# here plus one, so new stages are appended to keep saved selections valid
+PROFILE_STAGES = (
+    "nlcd_download",
+    "nlcd_raster",
+    "nlcd_raster_style",
+    "nlcd_vector",
+    "nlcd_vector_style",
+    "aoi_4326",
+    "soil_download",
+    "soil_fixed",
+    "soil_layer",
+    "soil_style",
+    "cn_layer",
+    "cn_raster",
+    "cn_raster_vector",
+    "cn_grid",
+    "zones",
+    "composite_cn",
+    "cn_breakdown",
+    "overlay",
+    "cn_layer_style",
+    "cn_raster_vector_style",
+)
+PROFILE_STAGE_OPTIONS = ("None",) + PROFILE_STAGES
+# results of pipeline stages kept for the session
+STAGE_MEMO = StageMemo()
+
+
+class StageFeedback(QgsProcessingFeedback):
+    """Feedback of a pipeline stage forwarding messages to the algorithm feedback"""
+
+    def __init__(self, parent, on_progress):
+        super().__init__()
+        self.parent = parent
+        # stages may run on worker threads, so no queued connections
+        self.progressChanged.connect(on_progress, Qt.DirectConnection)
+        parent.canceled.connect(self.cancel, Qt.DirectConnection)
+        if parent.isCanceled():
+            self.cancel()
+
+    def setProgressText(self, text):
+        self.parent.setProgressText(text)
+
+    def reportError(self, error, fatalError=False):
+        self.parent.reportError(error, fatalError)
+
+    def pushInfo(self, info):
+        self.parent.pushInfo(info)
+
+    def pushCommandInfo(self, info):
+        self.parent.pushCommandInfo(info)
+
+    def pushDebugInfo(self, info):
+        self.parent.pushDebugInfo(info)
+
+    def pushConsoleInfo(self, info):
+        self.parent.pushConsoleInfo(info)
+
 
 class CurveNumberGeneratorAlgorithm(QgsProcessingAlgorithm):
 
@@ -99,6 +259,50 @@ class CurveNumberGeneratorAlgorithm(QgsProcessingAlgorithm):
         )
         param.setFlags(param.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
         self.addParameter(param)
+        param = QgsProcessingParameterNumber(
+            "extentsoftlimitacres",
+            "Area Boundary extent soft limit [acres]",
+            type=QgsProcessingParameterNumber.Double,
+            minValue=0,
+            defaultValue=100000,
+        )
+        param.setFlags(param.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(param)
+        param = QgsProcessingParameterNumber(
+            "maxconcurrentdownloads",
+            "Maximum concurrent downloads",
+            type=QgsProcessingParameterNumber.Integer,
+            minValue=1,
+            maxValue=16,
+            defaultValue=4,
+        )
+        param.setFlags(param.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(param)
+        param = QgsProcessingParameterNumber(
+            "nlcdcachesizemb",
+            "NLCD tile cache size [MB], 0 to disable",
+            type=QgsProcessingParameterNumber.Integer,
+            minValue=0,
+            defaultValue=1024,
+        )
+        param.setFlags(param.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(param)
+        param = QgsProcessingParameterNumber(
+            "minimummappingunitpixels",
+            "NLCD minimum mapping unit [pixels], 0 to disable",
+            type=QgsProcessingParameterNumber.Integer,
+            minValue=0,
+            defaultValue=0,
+        )
+        param.setFlags(param.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(param)
+        param = QgsProcessingParameterBoolean(
+            "usesoilcache",
+            "Use local soil cache",
+            defaultValue=True,
+        )
+        param.setFlags(param.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(param)
         self.addParameter(
             QgsProcessingParameterBoolean(
                 "OutputNLCDLandCoverRaster",
@@ -125,13 +329,54 @@ class CurveNumberGeneratorAlgorithm(QgsProcessingAlgorithm):
                 defaultValue=False,
             )
         )
+        self.addParameter(
+            QgsProcessingParameterBoolean(
+                "OutputCurveNumberRaster",
+                "Output Curve Number Raster",
+                defaultValue=False,
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterBoolean(
+                "OutputCompositeCurveNumber",
+                "Output Composite Curve Number per Area Boundary feature",
+                defaultValue=False,
+            )
+        )
+        param = QgsProcessingParameterBoolean(
+            "VectorizeCurveNumberRaster",
+            "Vectorize Curve Number Raster",
+            defaultValue=False,
+        )
+        param.setFlags(param.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(param)
+        param = QgsProcessingParameterBoolean(
+            "reusestageresults",
+            "Reuse results of earlier runs with the same inputs",
+            defaultValue=True,
+        )
+        param.setFlags(param.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(param)
+        param = QgsProcessingParameterFolderDestination(
+            "OutputFolder",
+            "Save outputs to folder",
+            optional=True,
+            createByDefault=False,
+        )
+        param.setFlags(param.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(param)
+        param = QgsProcessingParameterEnum(
+            "profilestage",
+            "Capture cProfile statistics of stage",
+            options=list(PROFILE_STAGE_OPTIONS),
+            defaultValue=0,
+        )
+        param.setFlags(param.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(param)
 
     def processAlgorithm(self, parameters, context, model_feedback):
-        # Use a multi-step feedback, so that individual child algorithm progress reports are adjusted for the
-        # overall progress through the model
-        feedback = QgsProcessingMultiStepFeedback(21, model_feedback)
+        feedback = model_feedback
         results = {}
-        outputs = {}
 
         nlcd_rast_output = self.parameterAsBool(
             parameters, "OutputNLCDLandCoverRaster", context
@@ -143,15 +388,15 @@ class CurveNumberGeneratorAlgorithm(QgsProcessingAlgorithm):
         curve_number_output = self.parameterAsBool(
             parameters, "OutputCurveNumberLayer", context
         )
-
-        # Assiging Default CN_Lookup Table
-        if parameters["cnlookup"] == None:
-            csv_uri = (
-                "file:///" + os.path.join(cmd_folder, "CN_Lookup.csv") + "?delimiter=,"
-            )
-            csv = QgsVectorLayer(csv_uri, "CN_Lookup.csv", "delimitedtext")
-            parameters["cnlookup"] = csv
-            # feedback.pushInfo(str(csv_uri))
+        curve_number_raster_output = self.parameterAsBool(
+            parameters, "OutputCurveNumberRaster", context
+        )
+        curve_number_raster_vectorize = self.parameterAsBool(
+            parameters, "VectorizeCurveNumberRaster", context
+        )
+        composite_output = self.parameterAsBool(
+            parameters, "OutputCompositeCurveNumber", context
+        )
 
         area_layer = self.parameterAsVectorLayer(parameters, "areaboundary", context)
         EPSGCode = area_layer.crs().authid()
@@ -163,21 +408,27 @@ class CurveNumberGeneratorAlgorithm(QgsProcessingAlgorithm):
                 "INPUT": parameters["areaboundary"],
                 "OPERATION": "",
                 "TARGET_CRS": QgsCoordinateReferenceSystem("EPSG:5070"),
-                "OUTPUT": QgsProcessing.TEMPORARY_OUTPUT,
+                "OUTPUT": self.intermediateOutput(context, parameters["areaboundary"]),
             }
-            outputs["ReprojectLayer5070"] = processing.run(
+            reprojected = processing.run(
                 "native:reprojectlayer",
                 alg_params,
                 context=context,
                 feedback=feedback,
                 is_child_algorithm=True,
             )
-            area_layer = context.takeResultLayer(
-                outputs["ReprojectLayer5070"]["OUTPUT"]
-            )
+            area_layer = context.takeResultLayer(reprojected["OUTPUT"])
             EPSGCode = area_layer.crs().authid()
 
-        # Check if area of the extent is less than 100,000 Acres
+        # Warn if area of the extent is more than soft limit
+        extent_soft_limit = self.parameterAsDouble(
+            parameters, "extentsoftlimitacres", context
+        )
+        max_workers = self.parameterAsInt(parameters, "maxconcurrentdownloads", context)
+        cache_folder = os.path.join(
+            QgsApplication.qgisSettingsDirPath(), "cache", "curve_number_generator"
+        )
+        os.makedirs(cache_folder, exist_ok=True)
         d = QgsDistanceArea()
         tr_cont = QgsCoordinateTransformContext()
         d.setSourceCrs(area_layer.crs(), tr_cont)
@@ -185,204 +436,272 @@ class CurveNumberGeneratorAlgorithm(QgsProcessingAlgorithm):
         extent_area = d.measureArea(QgsGeometry().fromRect(area_layer.extent()))
         area_acres = d.convertAreaMeasurement(extent_area, QgsUnitTypes.AreaAcres)
 
-        if area_acres < 100000:
-            feedback.pushInfo(
-                str(
-                    "Area Boundary layer extent area is "
-                    + str(area_acres)
-                    + " acres"
-                    + "\n"
-                )
+        feedback.pushInfo(
+            str(
+                "Area Boundary layer extent area is "
+                + str(area_acres)
+                + " acres"
+                + "\n"
             )
-        else:
+        )
+        if extent_soft_limit and area_acres > extent_soft_limit:
             feedback.reportError(
-                "Area Boundary layer extent area should be less than 100,000 acres"
-                + "\n"
-                + "\n"
-                + "Execution Failed",
-                True,
-            )
-            return results
-
-        # NLCD Data
-
-        if (
-            curve_number_output == True
-            or nlcd_vect_output == True
-            or nlcd_rast_output == True
-        ):
-            # Get extent of the area boundary layer
-            xmin = area_layer.extent().xMinimum()
-            ymin = area_layer.extent().yMinimum()
-            xmax = area_layer.extent().xMaximum()
-            ymax = area_layer.extent().yMaximum()
-
-            BBOX_width = (xmax - xmin) / 30
-            BBOX_height = (ymax - ymin) / 30
-            BBOX_width_int = round(BBOX_width)
-            BBOX_height_int = round(BBOX_height)
-            request_URL = (
-                "https://www.mrlc.gov/geoserver/mrlc_display/NLCD_2016_Land_Cover_L48/ows?version=1.3.0&service=WMS&layers=NLCD_2016_Land_Cover_L48&styles&crs="
-                + str(EPSGCode)
-                + "&format=image/geotiff&request=GetMap&width="
-                + str(BBOX_width_int)
-                + "&height="
-                + str(BBOX_height_int)
-                + "&BBOX="
-                + str(xmin)
-                + ","
-                + str(ymin)
-                + ","
-                + str(xmax)
-                + ","
-                + str(ymax)
-                + "&"
-            )
-            # feedback.pushInfo(request_URL)
-
-            # Download NLCD
-            alg_params = {"URL": request_URL, "OUTPUT": QgsProcessing.TEMPORARY_OUTPUT}
-            outputs["DownloadNlcd"] = processing.run(
-                "native:filedownloader",
-                alg_params,
-                context=context,
-                feedback=feedback,
-                is_child_algorithm=True,
+                "Area Boundary layer extent area is more than "
+                + str(extent_soft_limit)
+                + " acres, downloads and processing may take a long time"
+                + "\n",
+                False,
             )
 
-            feedback.setCurrentStep(1)
+        drained = self.parameterAsBool(
+            parameters, "drainedsoilsleaveuncheckedifnotsure", context
+        )
+        # CN lookup table compiled to an array indexed by [NLCD code, HSG index] once
+        # per process for every table content
+        lookup_path = parameters.get("cnlookup")
+        if lookup_path in (None, ""):
+            lookup_path = os.path.join(cmd_folder, "CN_Lookup.csv")
+        try:
+            if (
+                isinstance(lookup_path, str)
+                and lookup_path.lower().endswith(".csv")
+                and os.path.isfile(lookup_path)
+            ):
+                lookup_key, cn_lut = load_cn_lut(lookup_path)
+            else:
+                lookup_key, cn_lut = compile_cn_lut(
+                    (feat["GDCode"], feat["CN_Join"])
+                    for feat in self.parameterAsSource(
+                        parameters, "cnlookup", context
+                    ).getFeatures()
+                )
+        except ValueError as e:
+            raise QgsProcessingException(str(e))
+        missing = missing_gdcodes(cn_lut, NLCD_PALETTE_CODES[1:])
+        if missing:
+            feedback.reportError(
+                "CN lookup table has no CN for GDCode "
+                + ", ".join(missing)
+                + ", these areas get no CN"
+                + "\n",
+                False,
+            )
+        # NLCD tiles on native grid covering area boundary layer extent
+        nlcd_extent = QgsCoordinateTransform(
+            area_layer.crs(),
+            QgsCoordinateReferenceSystem(NLCD_CRS),
+            context.transformContext(),
+        ).transformBoundingBox(area_layer.extent())
+        nlcd_cache_size = self.parameterAsInt(parameters, "nlcdcachesizemb", context)
+        min_mapping_unit = self.parameterAsInt(
+            parameters, "minimummappingunitpixels", context
+        )
+        use_soil_cache = self.parameterAsBool(parameters, "usesoilcache", context)
+        # only columns needed for curve number unless soil layer is requested
+        lean_soil = not soil_output
+        attr_dict = soil_attributes(lean_soil)
+
+        output_folder = self.parameterAsString(parameters, "OutputFolder", context)
+        if output_folder:
+            os.makedirs(output_folder, exist_ok=True)
+        outputs = [
+            (
+                nlcd_rast_output,
+                "nlcd_raster",
+                "NLCD_Raster.tif",
+                "NLCD Land Cover Raster",
+            ),
+            (
+                nlcd_vect_output,
+                "nlcd_vector",
+                "NLCD_Vector.gpkg",
+                "NLCD Land Cover Vector",
+            ),
+            (soil_output, "soil_layer", "Soil_Layer.gpkg", "SSURGO Soil Layer"),
+            (curve_number_output, "cn_layer", "CN_Layer.gpkg", "Curve Number Layer"),
+            (
+                curve_number_raster_output,
+                "cn_raster",
+                "CN_Raster.tif",
+                "Curve Number Raster",
+            ),
+            (
+                curve_number_raster_output and curve_number_raster_vectorize,
+                "cn_raster_vector",
+                "CN_Raster_Vectorized.gpkg",
+                "Curve Number Raster Vectorized",
+            ),
+            (
+                composite_output,
+                "composite_cn",
+                "CN_Composite.gpkg",
+                "Composite Curve Number",
+            ),
+            (
+                composite_output,
+                "cn_breakdown",
+                "CN_Breakdown.gpkg",
+                "Composite Curve Number Breakdown",
+            ),
+        ]
+        # Vector stages of requested outputs write straight to the output folder
+        # instead of memory layers copied there afterwards. Their results are not
+        # reused as a later run may overwrite the files.
+        destinations = {
+            stage: os.path.join(output_folder, file_name)
+            for requested, stage, file_name, _ in outputs
+            if requested and output_folder and stage in OUTPUT_FOLDER_STAGES
+        }
+
+        def create_sink(stage, fields, wkb_type, crs, features=0):
+            # GeoPackage of the stage destination, a temporary GeoPackage for more
+            # than MEMORY_FEATURE_LIMIT features, otherwise a memory layer
+            # intermediate stages are named after themselves
+            file_name, name = {
+                output_stage: (file_name, name)
+                for _, output_stage, file_name, name in outputs
+            }.get(stage, (stage + ".gpkg", stage))
+            path = destinations.get(stage)
+            if path is None and features > MEMORY_FEATURE_LIMIT:
+                path = QgsProcessingUtils.generateTempFilename(file_name)
+            if path is not None:
+                return (
+                    GeoPackageSink(
+                        path,
+                        os.path.splitext(file_name)[0],
+                        fields,
+                        wkb_type,
+                        crs,
+                    ),
+                    None,
+                )
+            layer = QgsMemoryProviderUtils.createMemoryLayer(
+                name, fields, wkb_type, crs
+            )
+            return layer.dataProvider(), layer
+
+        def close_sink(sink, layer):
+            # GeoPackage path or memory layer id of a sink from create_sink
+            if layer is None:
+                return sink.close()
+            context.temporaryLayerStore().addMapLayer(layer)
+            return layer.id()
+
+        # Stages of the pipeline, each one gets the values of the stages it requires
+
+        def nlcd_download(inputs, feedback):
+            # Get NLCD tiles from cache or download them
+            tiles = nlcd_tiles(
+                nlcd_extent.xMinimum(),
+                nlcd_extent.yMinimum(),
+                nlcd_extent.xMaximum(),
+                nlcd_extent.yMaximum(),
+            )
+            feedback.pushInfo("NLCD extent covers " + str(len(tiles)) + " tile(s)")
+            nlcd_folder = QgsProcessingUtils.generateTempFilename("nlcd")
+            os.makedirs(nlcd_folder, exist_ok=True)
+            nlcd_cache = None
+            if nlcd_cache_size > 0:
+                nlcd_cache = NLCDTileCache(cache_folder, nlcd_cache_size * 1024 * 1024)
+            # Mosaic tiles and cut them to area boundary extent
+            extent = area_layer.extent()
+            try:
+                nlcd_path = fetch_nlcd(
+                    tiles,
+                    EPSGCode,
+                    (
+                        extent.xMinimum(),
+                        extent.yMinimum(),
+                        extent.xMaximum(),
+                        extent.yMaximum(),
+                    ),
+                    nlcd_folder,
+                    max_workers,
+                    feedback,
+                    nlcd_cache,
+                )
+            except Exception as e:
+                raise QgsProcessingException("NLCD download failed: " + str(e))
             if feedback.isCanceled():
-                return {}
+                return None
+            return nlcd_path
+
+        def nlcd_raster(inputs, feedback):
+            # Reclassify WMS palette indices to NLCD codes
+            return reclassify_nlcd(
+                inputs["nlcd_download"],
+                QgsProcessingUtils.generateTempFilename("NLCD_Raster.tif"),
+            )
 
-            # Reclassify by table
+        def nlcd_vector(inputs, feedback):
+            nlcd_path = inputs["nlcd_raster"]
+            if min_mapping_unit > 1:
+                regions = count_regions(nlcd_path)
+                # Merge regions smaller than the minimum mapping unit so they do not
+                # become polygons of their own
+                nlcd_path = sieve_nlcd(
+                    nlcd_path,
+                    min_mapping_unit,
+                    QgsProcessingUtils.generateTempFilename("NLCD_Sieved.tif"),
+                )
+                if feedback.isCanceled():
+                    return None
+
+            # Polygonize (raster to vector)
             alg_params = {
-                "DATA_TYPE": 5,
-                "INPUT_RASTER": outputs["DownloadNlcd"]["OUTPUT"],
-                "NODATA_FOR_MISSING": False,
-                "NO_DATA": -9999,
-                "RANGE_BOUNDARIES": 0,
-                "RASTER_BAND": 1,
-                "TABLE": QgsExpression(
-                    "'0,1,11,1,2,12,2,3,21,3,4,22,4,5,23,5,6,24,6,7,31,7,8,32,8,9,41,9,10,42,10,11,43,11,12,51,12,13,52,13,14,71,14,15,72,15,16,73,16,17,74,17,18,81,18,19,82,19,20,90,20,21,95'"
-                ).evaluate(),
+                "BAND": 1,
+                "EIGHT_CONNECTEDNESS": False,
+                "EXTRA": "",
+                "FIELD": "VALUE",
+                "INPUT": nlcd_path,
                 "OUTPUT": QgsProcessing.TEMPORARY_OUTPUT,
             }
-            outputs["ReclassifyByTable"] = processing.run(
-                "native:reclassifybytable",
+            polygonized = processing.run(
+                "gdal:polygonize",
                 alg_params,
                 context=context,
                 feedback=feedback,
                 is_child_algorithm=True,
             )
-
-            feedback.setCurrentStep(2)
             if feedback.isCanceled():
-                return {}
+                return None
+            if min_mapping_unit > 1:
+                polygons = QgsProcessingUtils.mapLayerFromString(
+                    polygonized["OUTPUT"], context
+                ).featureCount()
+                feedback.pushInfo(
+                    "NLCD minimum mapping unit of {} pixels reduced {} polygons to {}"
+                    " ({:.1f}% fewer)".format(
+                        min_mapping_unit,
+                        regions,
+                        polygons,
+                        100 * (regions - polygons) / regions if regions else 0,
+                    )
+                )
 
-            # Set layer style
+            # Fix geometries
             alg_params = {
-                "INPUT": outputs["ReclassifyByTable"]["OUTPUT"],
-                "STYLE": os.path.join(cmd_folder, "NLCD_Raster.qml"),
+                "INPUT": polygonized["OUTPUT"],
+                "OUTPUT": destinations.get("nlcd_vector")
+                or self.intermediateOutput(context, polygonized["OUTPUT"]),
             }
+            return processing.run(
+                "native:fixgeometries",
+                alg_params,
+                context=context,
+                feedback=feedback,
+                is_child_algorithm=True,
+            )["OUTPUT"]
 
-            try:  # for QGIS Version later than 3.12
-                outputs["SetLayerStyle"] = processing.run(
-                    "native:setlayerstyle",
-                    alg_params,
-                    context=context,
-                    feedback=feedback,
-                    is_child_algorithm=True,
-                )
-            except:  # for QGIS Version older than 3.12
-                outputs["SetStyleForRasterLayer"] = processing.run(
-                    "qgis:setstyleforrasterlayer",
-                    alg_params,
-                    context=context,
-                    feedback=feedback,
-                    is_child_algorithm=True,
-                )
-
-            feedback.setCurrentStep(3)
-            if feedback.isCanceled():
-                return {}
-
-            if curve_number_output == True or nlcd_vect_output == True:
-                # Polygonize (raster to vector)
-                alg_params = {
-                    "BAND": 1,
-                    "EIGHT_CONNECTEDNESS": False,
-                    "EXTRA": "",
-                    "FIELD": "VALUE",
-                    "INPUT": outputs["ReclassifyByTable"]["OUTPUT"],
-                    "OUTPUT": QgsProcessing.TEMPORARY_OUTPUT,
-                }
-                outputs["PolygonizeRasterToVector"] = processing.run(
-                    "gdal:polygonize",
-                    alg_params,
-                    context=context,
-                    feedback=feedback,
-                    is_child_algorithm=True,
-                )
-
-                feedback.setCurrentStep(4)
-                if feedback.isCanceled():
-                    return {}
-
-                # Fix geometries
-                alg_params = {
-                    "INPUT": outputs["PolygonizeRasterToVector"]["OUTPUT"],
-                    "OUTPUT": QgsProcessing.TEMPORARY_OUTPUT,
-                }
-                outputs["FixGeometries"] = processing.run(
-                    "native:fixgeometries",
-                    alg_params,
-                    context=context,
-                    feedback=feedback,
-                    is_child_algorithm=True,
-                )
-
-                feedback.setCurrentStep(5)
-                if feedback.isCanceled():
-                    return {}
-
-                # Set layer style
-                alg_params = {
-                    "INPUT": outputs["FixGeometries"]["OUTPUT"],
-                    "STYLE": os.path.join(cmd_folder, "NLCD_Vector.qml"),
-                }
-                try:  # for QGIS Version 3.12 and later
-                    outputs["SetLayerStyle"] = processing.run(
-                        "native:setlayerstyle",
-                        alg_params,
-                        context=context,
-                        feedback=feedback,
-                        is_child_algorithm=True,
-                    )
-                except:  # for QGIS Version older than 3.12
-                    outputs["SetStyleForVectorLayer"] = processing.run(
-                        "qgis:setstyleforvectorlayer",
-                        alg_params,
-                        context=context,
-                        feedback=feedback,
-                        is_child_algorithm=True,
-                    )
-
-                feedback.setCurrentStep(6)
-                if feedback.isCanceled():
-                    return {}
-
-        # Soil Layer
-
-        if soil_output == True or curve_number_output == True:
-
+        def aoi_4326(inputs, feedback):
             # Reproject layer
             alg_params = {
                 "INPUT": parameters["areaboundary"],
                 "OPERATION": "",
                 "TARGET_CRS": QgsCoordinateReferenceSystem("EPSG:4326"),
-                "OUTPUT": QgsProcessing.TEMPORARY_OUTPUT,
+                "OUTPUT": self.intermediateOutput(context, parameters["areaboundary"]),
             }
-            outputs["ReprojectLayer4326"] = processing.run(
+            reprojected = processing.run(
                 "native:reprojectlayer",
                 alg_params,
                 context=context,
@@ -390,426 +709,570 @@ class CurveNumberGeneratorAlgorithm(QgsProcessingAlgorithm):
                 is_child_algorithm=True,
             )
 
-            feedback.setCurrentStep(7)
-            if feedback.isCanceled():
-                return {}
-
             # Get Area Boundary layer extent in EPSG:4326
-            area_layer_reprojected = context.takeResultLayer(
-                outputs["ReprojectLayer4326"]["OUTPUT"]
+            area_layer_reprojected = context.takeResultLayer(reprojected["OUTPUT"])
+            aoi_extent = area_layer_reprojected.extent()
+            # query only the dissolved area of interest simplified to a vertex
+            # budget SDA accepts and buffered by an NLCD pixel
+            aoi_geometry = query_geometry(
+                dissolve_layer(area_layer_reprojected),
+                degrees_for_meters(NLCD_PIXEL_SIZE, aoi_extent.center().y()),
+                SDA_MAX_VERTICES,
+            )
+            return (
+                (
+                    aoi_extent.xMinimum(),
+                    aoi_extent.yMinimum(),
+                    aoi_extent.xMaximum(),
+                    aoi_extent.yMaximum(),
+                ),
+                geometry_clipper(aoi_geometry),
+                geometry_intersects(aoi_geometry),
             )
 
-            # Download Soil
-
+        def soil_download(inputs, feedback):
+            bbox, clip, intersects = inputs["aoi_4326"]
             try:  # request using post rest
-
-                # create vector layer structure to store data
-                feedback.pushInfo("post")
-                uri = "Polygon?crs=epsg:4326"
-                soil_layer = QgsVectorLayer(uri, "soil layer", "memory")
-                provider = soil_layer.dataProvider()
-                attributes = []
-                attr_dict = [
-                    {"name": "musym", "type": "str"},
-                    {"name": "muname", "type": "str"},
-                    {"name": "mustatus", "type": "str"},
-                    {"name": "slopegraddcp", "type": "str"},
-                    {"name": "slopegradwta", "type": "str"},
-                    {"name": "brockdepmin", "type": "str"},
-                    {"name": "wtdepannmin", "type": "str"},
-                    {"name": "wtdepaprjunmin", "type": "str"},
-                    {"name": "flodfreqdcd", "type": "str"},
-                    {"name": "flodfreqmax", "type": "str"},
-                    {"name": "pondfreqprs", "type": "str"},
-                    {"name": "aws025wta", "type": "str"},
-                    {"name": "aws050wta", "type": "str"},
-                    {"name": "aws0100wta", "type": "str"},
-                    {"name": "aws0150wta", "type": "str"},
-                    {"name": "drclassdcd", "type": "str"},
-                    {"name": "drclasswettest", "type": "str"},
-                    {"name": "hydgrpdcd", "type": "str"},
-                    {"name": "iccdcd", "type": "str"},
-                    {"name": "iccdcdpct", "type": "str"},
-                    {"name": "niccdcd", "type": "str"},
-                    {"name": "niccdcdpct", "type": "str"},
-                    {"name": "engdwobdcd", "type": "str"},
-                    {"name": "engdwbdcd", "type": "str"},
-                    {"name": "engdwbll", "type": "str"},
-                    {"name": "engdwbml", "type": "str"},
-                    {"name": "engstafdcd", "type": "str"},
-                    {"name": "engstafll", "type": "str"},
-                    {"name": "engstafml", "type": "str"},
-                    {"name": "engsldcd", "type": "str"},
-                    {"name": "engsldcp", "type": "str"},
-                    {"name": "englrsdcd", "type": "str"},
-                    {"name": "engcmssdcd", "type": "str"},
-                    {"name": "engcmssmp", "type": "str"},
-                    {"name": "urbrecptdcd", "type": "str"},
-                    {"name": "urbrecptwta", "type": "str"},
-                    {"name": "forpehrtdcp", "type": "str"},
-                    {"name": "hydclprs", "type": "str"},
-                    {"name": "awmmfpwwta", "type": "str"},
-                    {"name": "mukey", "type": "str"},
-                    {"name": "mupolygonkey", "type": "str"},
-                    {"name": "areasymbol", "type": "str"},
-                    {"name": "nationalmusym", "type": "str"},
-                ]
-
-                # initialize fields
+                # stream soil from local cache and SDA parallel tiles for area
+                # layer extent in 4326
+                soil_cache = None
+                if use_soil_cache:
+                    soil_cache = SoilCache(os.path.join(cache_folder, "ssurgo.sqlite"))
+                soil_fields = QgsFields()
                 for field in attr_dict:
-                    attributes.append(QgsField(field["name"], QVariant.String))
-                    provider.addAttributes(attributes)
-                    soil_layer.updateFields()
-
-                # get area layer extent polygon as WKT in 4326
-                aoi_reproj_wkt = area_layer_reprojected.extent().asWktPolygon()
-
-                # send post request
-                body = {
-                    "format": "JSON",
-                    "query": f"select Ma.*, M.mupolygonkey, M.areasymbol, M.nationalmusym, M.mupolygongeo from mupolygon M, muaggatt Ma where M.mupolygonkey in (select * from SDA_Get_Mupolygonkey_from_intersection_with_WktWgs84('{aoi_reproj_wkt.lower()}')) and M.mukey=Ma.mukey",
-                }
-                url = "https://sdmdataaccess.sc.egov.usda.gov/TABULAR/post.rest"
-                soil_response = requests.post(url, json=body).json()
-
-                feedback.setCurrentStep(8)
-                if feedback.isCanceled():
-                    return {}
-
-                for row in soil_response["Table"]:
-                    # None attribute for empty data
-                    row = [None if not attr else attr for attr in row]
-                    feat = QgsFeature(soil_layer.fields())
-                    # populate data
-                    for index, col in enumerate(row):
-                        if index != len(attr_dict):
-                            feat.setAttribute(attr_dict[index]["name"], col)
-                        else:
-                            feat.setGeometry(QgsGeometry.fromWkt(col))
-                    provider.addFeatures([feat])
-
-                feedback.setCurrentStep(9)
-                if feedback.isCanceled():
-                    return {}
-
-            except:  # try wfs request
-
-                xmin_reprojected = area_layer_reprojected.extent().xMinimum()
-                ymin_reprojected = area_layer_reprojected.extent().yMinimum()
-                xmax_reprojected = area_layer_reprojected.extent().xMaximum()
-                ymax_reprojected = area_layer_reprojected.extent().yMaximum()
-
-                request_URL_soil = (
-                    "https://sdmdataaccess.sc.egov.usda.gov/Spatial/SDMWGS84GEOGRAPHIC.wfs?SERVICE=WFS&VERSION=1.1.0&REQUEST=GetFeature&TYPENAME=mapunitpolyextended&SRSNAME=EPSG:4326&BBOX="
-                    + str(xmin_reprojected)
-                    + ","
-                    + str(ymin_reprojected)
-                    + ","
-                    + str(xmax_reprojected)
-                    + ","
-                    + str(ymax_reprojected)
+                    soil_fields.append(QgsField(field["name"], QVariant.String))
+                soil_count = 0
+                # polygons are written to disk as they arrive so the download is
+                # never held in memory
+                try:
+                    with GeoPackageSink(
+                        QgsProcessingUtils.generateTempFilename("soil.gpkg"),
+                        "soil",
+                        soil_fields,
+                        QgsWkbTypes.MultiPolygon,
+                        QgsCoordinateReferenceSystem("EPSG:4326"),
+                    ) as soil_sink:
+                        for row in iter_soil(
+                            bbox,
+                            max_workers,
+                            feedback,
+                            soil_cache,
+                            lean_soil,
+                            clip,
+                            intersects,
+                        ):
+                            # None attribute for empty data
+                            row = [None if not attr else attr for attr in row]
+                            soil_sink.addValues(
+                                row[: len(attr_dict)],
+                                ogr.ForceToMultiPolygon(
+                                    ogr.CreateGeometryFromWkt(row[len(attr_dict)])
+                                ),
+                            )
+                            soil_count += 1
+                            if soil_count % SOIL_BATCH_SIZE == 0:
+                                feedback.setProgressText(
+                                    "Got " + str(soil_count) + " soil polygons"
+                                )
+                                if feedback.isCanceled():
+                                    return None
+                finally:
+                    if soil_cache is not None:
+                        soil_cache.close()
+                feedback.pushInfo(
+                    "Got " + str(soil_count) + " soil polygons using post"
                 )
+                return soil_sink.path, None
 
-                alg_params = {
-                    "URL": request_URL_soil,
-                    "OUTPUT": QgsProcessing.TEMPORARY_OUTPUT,
-                }
-                outputs["DownloadSoil"] = processing.run(
-                    "native:filedownloader",
-                    alg_params,
-                    context=context,
-                    feedback=feedback,
-                    is_child_algorithm=True,
+            except Exception as e:  # try wfs request
+                feedback.reportError(
+                    "Soil download using post failed, trying WFS: " + str(e), False
                 )
 
-                feedback.setCurrentStep(8)
-                if feedback.isCanceled():
-                    return {}
+                return (
+                    None,
+                    download_file(
+                        sda_wfs_url(bbox),
+                        QgsProcessingUtils.generateTempFilename("soil.gml"),
+                        feedback,
+                    ),
+                )
 
+        def soil_fixed(inputs, feedback):
+            soil, wfs_path = inputs["soil_download"]
+            if soil is None:
                 # Swap X and Y coordinates
                 alg_params = {
-                    "INPUT": outputs["DownloadSoil"]["OUTPUT"],
-                    "OUTPUT": QgsProcessing.TEMPORARY_OUTPUT,
+                    "INPUT": wfs_path,
+                    "OUTPUT": self.intermediateOutput(context, wfs_path),
                 }
-                outputs["SwapXAndYCoordinates"] = processing.run(
+                soil = processing.run(
                     "native:swapxy",
                     alg_params,
                     context=context,
                     feedback=feedback,
                     is_child_algorithm=True,
-                )
-
-                feedback.setCurrentStep(9)
+                )["OUTPUT"]
                 if feedback.isCanceled():
-                    return {}
-
-                soil_layer = outputs["SwapXAndYCoordinates"]["OUTPUT"]
+                    return None
 
             # Fix soil layer geometries
-            alg_params = {"INPUT": soil_layer, "OUTPUT": QgsProcessing.TEMPORARY_OUTPUT}
-            outputs["FixGeometries2"] = processing.run(
-                "native:fixgeometries",
-                alg_params,
-                context=context,
-                feedback=feedback,
-                is_child_algorithm=True,
-            )
-
-            feedback.setCurrentStep(10)
-            if feedback.isCanceled():
-                return {}
-
-            # Clip Soil Layer
             alg_params = {
-                "INPUT": outputs["FixGeometries2"]["OUTPUT"],
-                "OVERLAY": parameters["areaboundary"],
-                "OUTPUT": QgsProcessing.TEMPORARY_OUTPUT,
+                "INPUT": soil,
+                "OUTPUT": self.intermediateOutput(context, soil),
             }
-            outputs["Clip"] = processing.run(
-                "native:clip",
+            fixed = processing.run(
+                "native:fixgeometries",
                 alg_params,
                 context=context,
                 feedback=feedback,
                 is_child_algorithm=True,
             )
-
-            feedback.setCurrentStep(11)
             if feedback.isCanceled():
-                return {}
+                return None
 
             # Reproject Soil
             alg_params = {
-                "INPUT": outputs["Clip"]["OUTPUT"],
+                "INPUT": fixed["OUTPUT"],
                 "OPERATION": "",
                 "TARGET_CRS": QgsCoordinateReferenceSystem(EPSGCode),
-                "OUTPUT": QgsProcessing.TEMPORARY_OUTPUT,
+                "OUTPUT": self.intermediateOutput(context, fixed["OUTPUT"]),
             }
-            outputs["ReprojectSoil"] = processing.run(
+            return processing.run(
                 "native:reprojectlayer",
                 alg_params,
                 context=context,
                 feedback=feedback,
                 is_child_algorithm=True,
-            )
-
-            feedback.setCurrentStep(12)
-            if feedback.isCanceled():
-                return {}
-
-            # Set layer style
-            alg_params = {
-                "INPUT": outputs["ReprojectSoil"]["OUTPUT"],
-                "STYLE": os.path.join(cmd_folder, "Soil_Layer.qml"),
-            }
-            try:  # for QGIS Version 3.12 and later
-                outputs["SetLayerStyle"] = processing.run(
-                    "native:setlayerstyle",
-                    alg_params,
-                    context=context,
-                    feedback=feedback,
-                    is_child_algorithm=True,
-                )
-            except:  # for QGIS Version older than 3.12
-                outputs["SetStyleForVectorLayer"] = processing.run(
-                    "qgis:setstyleforvectorlayer",
-                    alg_params,
-                    context=context,
-                    feedback=feedback,
-                    is_child_algorithm=True,
-                )
-
-            feedback.setCurrentStep(13)
-            if feedback.isCanceled():
-                return {}
-
-        # Curve Number Calculations
-
-        if curve_number_output == True:
+            )["OUTPUT"]
 
-            # Intersection
+        def soil_layer(inputs, feedback):
+            # Clip Soil Layer
             alg_params = {
-                "INPUT": outputs["ReprojectSoil"]["OUTPUT"],
-                "INPUT_FIELDS": ["MUSYM", "HYDGRPDCD", "MUNAME"],
-                "OVERLAY": outputs["FixGeometries"]["OUTPUT"],
-                "OVERLAY_FIELDS": ["VALUE"],
-                "OVERLAY_FIELDS_PREFIX": "",
-                "OUTPUT": QgsProcessing.TEMPORARY_OUTPUT,
+                "INPUT": inputs["soil_fixed"],
+                "OVERLAY": parameters["areaboundary"],
+                "OUTPUT": destinations.get("soil_layer")
+                or self.intermediateOutput(context, inputs["soil_fixed"]),
             }
-            outputs["Intersection"] = processing.run(
-                "native:intersection",
+            return processing.run(
+                "native:clip",
                 alg_params,
                 context=context,
                 feedback=feedback,
                 is_child_algorithm=True,
-            )
+            )["OUTPUT"]
 
-            feedback.setCurrentStep(14)
-            if feedback.isCanceled():
-                return {}
-
-            # Create GDCodeTemp
-            alg_params = {
-                "FIELD_LENGTH": 5,
-                "FIELD_NAME": "GDCodeTemp",
-                "FIELD_PRECISION": 3,
-                "FIELD_TYPE": 2,
-                "FORMULA": 'IF ("HYDGRPDCD" IS NOT NULL, "Value" || "HYDGRPDCD", IF (("MUSYM" = \'W\' OR lower("MUSYM") = \'water\' OR lower("MUNAME") = \'water\' OR "MUNAME" = \'W\'), 11, "VALUE"))',
-                "INPUT": outputs["Intersection"]["OUTPUT"],
-                "NEW_FIELD": True,
-                "OUTPUT": QgsProcessing.TEMPORARY_OUTPUT,
-            }
-            outputs["CreateGdcodetemp"] = processing.run(
-                "qgis:fieldcalculator",
-                alg_params,
-                context=context,
-                feedback=feedback,
-                is_child_algorithm=True,
+        def overlay(inputs, feedback):
+            # Clip soil to area boundary and intersect it with land cover in one pass
+            soil = QgsProcessingUtils.mapLayerFromString(inputs["soil_fixed"], context)
+            land_cover = QgsProcessingUtils.mapLayerFromString(
+                inputs["nlcd_vector"], context
+            )
+            overlay_sink, overlay_layer = create_sink(
+                "overlay",
+                overlay_fields(soil, land_cover),
+                QgsWkbTypes.MultiPolygon,
+                soil.crs(),
+                soil.featureCount() + land_cover.featureCount(),
             )
+            overlaid = overlay_soil_land_cover(
+                soil,
+                land_cover,
+                dissolve_layer(area_layer),
+                context.transformContext(),
+                feedback,
+                overlay_sink,
+            )
+            overlay_value = close_sink(overlay_sink, overlay_layer)
+            return None if overlaid is None else overlay_value
 
-            feedback.setCurrentStep(15)
-            if feedback.isCanceled():
-                return {}
+        def cn_layer(inputs, feedback):
+            # Calculate GDCode, NLCD_LU and CN in a single pass
+            overlay_layer = QgsProcessingUtils.mapLayerFromString(
+                inputs["overlay"], context
+            )
+            fields = cn_fields(overlay_layer)
+            total = overlay_layer.featureCount() or 1
+            cn_sink, cn = create_sink(
+                "cn_layer",
+                fields,
+                overlay_layer.wkbType(),
+                overlay_layer.crs(),
+                total,
+            )
+            batch = []
+            for current, cn_feat in enumerate(
+                cn_features(overlay_layer, fields, cn_lut, drained)
+            ):
+                batch.append(cn_feat)
+                if len(batch) >= GPKG_CHUNK_SIZE:
+                    cn_sink.addFeatures(batch)
+                    batch = []
+                if current % 1000 == 0:
+                    if feedback.isCanceled():
+                        return None
+                    feedback.setProgress(100 * current / total)
+            cn_sink.addFeatures(batch)
+            return close_sink(cn_sink, cn)
+
+        def cn_grid(inputs, feedback):
+            # Burn HSG on NLCD grid and lookup CN per pixel
+            return compute_cn_grid(
+                inputs["nlcd_raster"],
+                layer_hsg_features(
+                    QgsProcessingUtils.mapLayerFromString(
+                        inputs["soil_layer"], context
+                    ),
+                    drained,
+                ),
+                cn_lut,
+            ) + (cn_lut,)
+
+        def cn_raster(inputs, feedback):
+            return write_cn_raster(
+                gdal.Open(inputs["nlcd_raster"]),
+                inputs["cn_grid"][3],
+                QgsProcessingUtils.generateTempFilename("CN_Raster.tif"),
+            )
 
-            # Create GDCode
-            alg_params = {
-                "FIELD_LENGTH": 5,
-                "FIELD_NAME": "GDCode",
-                "FIELD_PRECISION": 3,
-                "FIELD_TYPE": 2,
-                "FORMULA": "if( var('drainedsoilsleaveuncheckedifnotsure') = True,replace(\"GDCodeTemp\", '/D', ''),replace(\"GDCodeTemp\", map('A/', '', 'B/', '', 'C/', '')))",
-                "INPUT": outputs["CreateGdcodetemp"]["OUTPUT"],
-                "NEW_FIELD": True,
-                "OUTPUT": QgsProcessing.TEMPORARY_OUTPUT,
-            }
-            outputs["CreateGdcode"] = processing.run(
-                "qgis:fieldcalculator",
-                alg_params,
-                context=context,
-                feedback=feedback,
-                is_child_algorithm=True,
+        def zones(inputs, feedback):
+            # Burn position of every area boundary feature on the NLCD grid
+            zone_features = list(area_layer.getFeatures())
+            nlcd_ds = gdal.Open(inputs["nlcd_raster"])
+            geotransform = nlcd_ds.GetGeoTransform()
+            pixel_acres = abs(
+                geotransform[1] * geotransform[5]
+            ) * QgsUnitTypes.fromUnitToUnitFactor(
+                QgsUnitTypes.distanceToAreaUnit(area_layer.crs().mapUnits()),
+                QgsUnitTypes.AreaAcres,
+            )
+            return (
+                zone_features,
+                burn_zones(zone_features, nlcd_ds),
+                pixel_acres,
             )
 
-            feedback.setCurrentStep(16)
-            if feedback.isCanceled():
-                return {}
+        def composite_cn_layer(inputs, feedback):
+            # Area weighted CN of every area boundary feature
+            zone_features, zone_grid, pixel_acres = inputs["zones"]
+            composite, pixels = composite_cn(
+                zone_grid, inputs["cn_grid"][3], CN_NODATA, len(zone_features)
+            )
+            # AreaFID is the position of the area boundary feature, the same as in
+            # the breakdown table, as feature ids change when outputs are written
+            composite_fields = QgsFields()
+            composite_fields.append(QgsField("AreaFID", QVariant.LongLong))
+            area_fields = [
+                index
+                for index, field in enumerate(area_layer.fields())
+                if field.name() != "AreaFID"
+            ]
+            for index in area_fields:
+                composite_fields.append(area_layer.fields().at(index))
+            composite_fields.append(QgsField("CN_Comp", QVariant.Double, len=5, prec=1))
+            composite_fields.append(QgsField("CN_Acres", QVariant.Double))
+            composite_sink, composite_layer = create_sink(
+                "composite_cn", composite_fields, area_layer.wkbType(), area_layer.crs()
+            )
+            composite_features = []
+            for zone, feat in enumerate(zone_features, 1):
+                composite_feat = QgsFeature(composite_fields)
+                composite_feat.setGeometry(feat.geometry())
+                attributes = feat.attributes()
+                composite_feat.setAttributes(
+                    [zone]
+                    + [attributes[index] for index in area_fields]
+                    + [
+                        None if not pixels[zone] else round(composite[zone], 1),
+                        float(pixels[zone] * pixel_acres),
+                    ]
+                )
+                composite_features.append(composite_feat)
+            composite_sink.addFeatures(composite_features)
+            return close_sink(composite_sink, composite_layer)
+
+        def cn_breakdown(inputs, feedback):
+            # Area of every NLCD and HSG combination in every area boundary feature
+            zone_features, zone_grid, pixel_acres = inputs["zones"]
+            nlcd, nodata, hsg, _, cn_lut = inputs["cn_grid"]
+            rows = cover_breakdown(zone_grid, nlcd, nodata, hsg, len(zone_features))
+            zone_pixels = {}
+            for zone, _, _, pixels in rows:
+                zone_pixels[zone] = zone_pixels.get(zone, 0) + pixels
+            breakdown_fields = QgsFields()
+            breakdown_fields.append(QgsField("AreaFID", QVariant.LongLong))
+            breakdown_fields.append(QgsField("NLCD_LU", QVariant.Int, len=2))
+            breakdown_fields.append(QgsField("HSG", QVariant.String, len=5))
+            breakdown_fields.append(QgsField("GDCode", QVariant.String, len=5))
+            breakdown_fields.append(QgsField("CN", QVariant.Int, len=3))
+            breakdown_fields.append(QgsField("Acres", QVariant.Double))
+            breakdown_fields.append(QgsField("Percent", QVariant.Double))
+            breakdown_sink, breakdown_layer = create_sink(
+                "cn_breakdown",
+                breakdown_fields,
+                QgsWkbTypes.NoGeometry,
+                area_layer.crs(),
+            )
+            breakdown_features = []
+            for zone, nlcd_code, hsg_class, pixels in rows:
+                cn = int(cn_lut[nlcd_code, hsg_class])
+                breakdown_feat = QgsFeature(breakdown_fields)
+                breakdown_feat.setAttributes(
+                    [
+                        zone,
+                        nlcd_code,
+                        (
+                            HSG_CLASSES[hsg_class]
+                            if hsg_class < HSG_WATER_INDEX
+                            else "Water"
+                        ),
+                        breakdown_gdcode(nlcd_code, hsg_class),
+                        None if cn == CN_NODATA else cn,
+                        float(pixels * pixel_acres),
+                        100 * pixels / zone_pixels[zone],
+                    ]
+                )
+                breakdown_features.append(breakdown_feat)
+            breakdown_sink.addFeatures(breakdown_features)
+            return close_sink(breakdown_sink, breakdown_layer)
 
-            # Create NLCD_LU
+        def cn_raster_vector(inputs, feedback):
+            # Polygonize (raster to vector)
             alg_params = {
-                "FIELD_LENGTH": 2,
-                "FIELD_NAME": "NLCD_LU",
-                "FIELD_PRECISION": 3,
-                "FIELD_TYPE": 1,
-                "FORMULA": '"Value"',
-                "INPUT": outputs["CreateGdcode"]["OUTPUT"],
-                "NEW_FIELD": True,
+                "BAND": 1,
+                "EIGHT_CONNECTEDNESS": False,
+                "EXTRA": "",
+                "FIELD": "CN",
+                "INPUT": inputs["cn_raster"],
                 "OUTPUT": QgsProcessing.TEMPORARY_OUTPUT,
             }
-            outputs["CreateNlcd_lu"] = processing.run(
-                "qgis:fieldcalculator",
+            return processing.run(
+                "gdal:polygonize",
                 alg_params,
                 context=context,
                 feedback=feedback,
                 is_child_algorithm=True,
-            )
+            )["OUTPUT"]
 
-            feedback.setCurrentStep(17)
-            if feedback.isCanceled():
-                return {}
+        def style_stage(required, style):
+            def apply_style(inputs, feedback):
+                self.setStyle(inputs[required], style, context, feedback)
+                return inputs[required]
 
-            # Join with CNLookup
-            alg_params = {
-                "DISCARD_NONMATCHING": False,
-                "FIELD": "GDCode",
-                "FIELDS_TO_COPY": ["CN_Join"],
-                "FIELD_2": "GDCode",
-                "INPUT": outputs["CreateNlcd_lu"]["OUTPUT"],
-                "INPUT_2": parameters["cnlookup"],
-                "METHOD": 1,
-                "PREFIX": "",
-                "OUTPUT": QgsProcessing.TEMPORARY_OUTPUT,
-            }
-            outputs["JoinWithCnlookup"] = processing.run(
-                "native:joinattributestable",
-                alg_params,
-                context=context,
-                feedback=feedback,
-                is_child_algorithm=True,
-            )
+            return apply_style
 
-            feedback.setCurrentStep(18)
-            if feedback.isCanceled():
-                return {}
+        reuse_stage_results = self.parameterAsBool(
+            parameters, "reusestageresults", context
+        )
+        # stage results are reused between runs as long as the parameters they
+        # depend on are unchanged
+        aoi_key = self.layerHash(area_layer) + EPSGCode
+        pipeline = Pipeline(
+            [
+                Stage(
+                    "nlcd_download",
+                    nlcd_download,
+                    threadsafe=True,
+                    key=(aoi_key, nlcd.NLCD_WMS_URL),
+                    memoize=True,
+                ),
+                Stage("nlcd_raster", nlcd_raster, ["nlcd_download"], memoize=True),
+                Stage(
+                    "nlcd_raster_style",
+                    style_stage("nlcd_raster", "NLCD_Raster.qml"),
+                    ["nlcd_raster"],
+                ),
+                Stage(
+                    "nlcd_vector",
+                    nlcd_vector,
+                    ["nlcd_raster"],
+                    key=min_mapping_unit,
+                    memoize="nlcd_vector" not in destinations,
+                ),
+                Stage(
+                    "nlcd_vector_style",
+                    style_stage("nlcd_vector", "NLCD_Vector.qml"),
+                    ["nlcd_vector"],
+                ),
+                Stage("aoi_4326", aoi_4326, key=aoi_key, memoize=True),
+                Stage(
+                    "soil_download",
+                    soil_download,
+                    ["aoi_4326"],
+                    threadsafe=True,
+                    key=(ssurgo.SDA_URL, ssurgo.SDA_WFS_URL, lean_soil),
+                    memoize=True,
+                ),
+                Stage(
+                    "soil_fixed",
+                    soil_fixed,
+                    ["soil_download"],
+                    key=EPSGCode,
+                    memoize=True,
+                ),
+                Stage(
+                    "soil_layer",
+                    soil_layer,
+                    ["soil_fixed"],
+                    key=aoi_key,
+                    memoize="soil_layer" not in destinations,
+                ),
+                Stage(
+                    "soil_style",
+                    style_stage("soil_layer", "Soil_Layer.qml"),
+                    ["soil_layer"],
+                ),
+                Stage(
+                    "overlay",
+                    overlay,
+                    ["soil_fixed", "nlcd_vector"],
+                    key=aoi_key,
+                    memoize=True,
+                ),
+                Stage(
+                    "cn_layer",
+                    cn_layer,
+                    ["overlay"],
+                    key=(drained, lookup_key),
+                    memoize="cn_layer" not in destinations,
+                ),
+                Stage(
+                    "cn_layer_style",
+                    style_stage("cn_layer", "CN_Grid.qml"),
+                    ["cn_layer"],
+                ),
+                Stage(
+                    "cn_grid",
+                    cn_grid,
+                    ["soil_layer", "nlcd_raster"],
+                    key=(drained, lookup_key),
+                    memoize=True,
+                ),
+                Stage("cn_raster", cn_raster, ["cn_grid", "nlcd_raster"], memoize=True),
+                Stage(
+                    "cn_raster_vector", cn_raster_vector, ["cn_raster"], memoize=True
+                ),
+                Stage(
+                    "cn_raster_vector_style",
+                    style_stage("cn_raster_vector", "CN_Grid.qml"),
+                    ["cn_raster_vector"],
+                ),
+                Stage("zones", zones, ["nlcd_raster"], key=aoi_key, memoize=True),
+                Stage(
+                    "composite_cn",
+                    composite_cn_layer,
+                    ["zones", "cn_grid"],
+                    memoize="composite_cn" not in destinations,
+                ),
+                Stage(
+                    "cn_breakdown",
+                    cn_breakdown,
+                    ["zones", "cn_grid"],
+                    memoize="cn_breakdown" not in destinations,
+                ),
+            ]
+        )
 
-            # Create Integer CN
-            alg_params = {
-                "FIELD_LENGTH": 3,
-                "FIELD_NAME": "CN",
-                "FIELD_PRECISION": 0,
-                "FIELD_TYPE": 1,
-                "FORMULA": "CN_Join  * 1",
-                "INPUT": outputs["JoinWithCnlookup"]["OUTPUT"],
-                "NEW_FIELD": True,
-                "OUTPUT": QgsProcessing.TEMPORARY_OUTPUT,
-            }
-            outputs["CreateIntegerCn"] = processing.run(
-                "qgis:fieldcalculator",
-                alg_params,
-                context=context,
-                feedback=feedback,
-                is_child_algorithm=True,
+        # Run only the stages requested outputs need
+        targets = []
+        if nlcd_rast_output:
+            targets.append("nlcd_raster_style")
+        if nlcd_vect_output:
+            targets.append("nlcd_vector_style")
+        if soil_output:
+            targets.append("soil_style")
+        if curve_number_output:
+            targets.append("cn_layer_style")
+        if curve_number_raster_output:
+            targets.append(
+                "cn_raster_vector_style"
+                if curve_number_raster_vectorize
+                else "cn_raster"
             )
+        if composite_output:
+            targets += ["composite_cn", "cn_breakdown"]
+
+        # progress is weighted by stage durations measured in previous runs
+        costs_path = os.path.join(cache_folder, "stage_costs.json")
+        costs = dict(STAGE_COSTS)
+        try:
+            with open(costs_path) as costs_file:
+                costs.update(json.load(costs_file))
+        except (OSError, ValueError):
+            pass
 
-            feedback.setCurrentStep(19)
-            if feedback.isCanceled():
-                return {}
+        # profile is written next to the outputs
+        if output_folder:
+            profile_folder = output_folder
+        else:
+            profile_folder = QgsProcessingUtils.generateTempFilename("profile")
+            os.makedirs(profile_folder, exist_ok=True)
+        profile_option = PROFILE_STAGE_OPTIONS[
+            self.parameterAsEnum(parameters, "profilestage", context)
+        ]
+        cprofile_stage = profile_option if profile_option in PROFILE_STAGES else None
+        profiler = Profiler(
+            lambda value: self.measureOutput(value, context),
+            cprofile_stage,
+            os.path.join(profile_folder, str(cprofile_stage) + ".prof"),
+        )
 
-            # Drop field(s)
-            alg_params = {
-                "COLUMN": ["VALUE", "GDCodeTemp", "CN_Join"],
-                "INPUT": outputs["CreateIntegerCn"]["OUTPUT"],
-                "OUTPUT": QgsProcessing.TEMPORARY_OUTPUT,
-            }
-            outputs["DropFields"] = processing.run(
-                "qgis:deletecolumn",
-                alg_params,
-                context=context,
-                feedback=feedback,
-                is_child_algorithm=True,
+        values = pipeline.run(
+            targets,
+            feedback,
+            costs=costs,
+            stage_feedback=lambda on_progress: StageFeedback(feedback, on_progress),
+            profiler=profiler,
+            memo=STAGE_MEMO if reuse_stage_results else None,
+            copy=lambda value: self.memoValue(value, context),
+        )
+        if feedback.isCanceled():
+            return {}
+
+        results["Profile"] = profiler.write(
+            os.path.join(profile_folder, "Profile.json")
+        )
+        feedback.pushInfo("Stage profile written to " + results["Profile"])
+        for line in profiler.summary():
+            feedback.pushInfo(line)
+        if cprofile_stage in profiler.stages:
+            results["StageCProfile"] = profiler.cprofile_path
+            feedback.pushInfo(
+                "cProfile statistics written to " + profiler.cprofile_path
             )
 
-            feedback.setCurrentStep(20)
-            if feedback.isCanceled():
-                return {}
+        try:
+            with open(costs_path, "w") as costs_file:
+                json.dump(update_costs(costs, pipeline.durations), costs_file)
+        except OSError:
+            pass
 
-            # Set layer style
-            alg_params = {
-                "INPUT": outputs["DropFields"]["OUTPUT"],
-                "STYLE": os.path.join(cmd_folder, "CN_Grid.qml"),
-            }
-            try:  # for QGIS Version 3.12 and later
-                outputs["SetLayerStyle"] = processing.run(
-                    "native:setlayerstyle",
-                    alg_params,
-                    context=context,
-                    feedback=feedback,
-                    is_child_algorithm=True,
+        # Write the other requested outputs to the output folder and vector outputs
+        # kept in memory to temporary GeoPackages, so layers loaded into the project
+        # are read from disk
+        for requested, stage, file_name, name in outputs:
+            if not requested:
+                continue
+            output = values[stage]
+            layer = QgsProcessingUtils.mapLayerFromString(output, context)
+            path = None
+            if stage in destinations:  # written to the output folder by the stage
+                results[os.path.splitext(file_name)[0]] = output
+            elif output_folder:
+                path = self.saveOutput(
+                    output, os.path.join(output_folder, file_name), context
                 )
-            except:  # for QGIS Version older than 3.12
-                outputs["SetStyleForVectorLayer"] = processing.run(
-                    "qgis:setstyleforvectorlayer",
-                    alg_params,
-                    context=context,
-                    feedback=feedback,
-                    is_child_algorithm=True,
+                results[os.path.splitext(file_name)[0]] = path
+            elif isinstance(layer, QgsVectorLayer) and layer.providerType() == "memory":
+                path = self.saveOutput(
+                    output, QgsProcessingUtils.generateTempFilename(file_name), context
                 )
+            if path and isinstance(layer, QgsVectorLayer):
+                output = self.diskLayer(layer, path, name, context)
 
-        if nlcd_rast_output:
-            # Load NLCD Raster into project
-            alg_params = {
-                "INPUT": outputs["ReclassifyByTable"]["OUTPUT"],
-                "NAME": "NLCD Land Cover Raster",
-            }
-            outputs["LoadLayerIntoProject1"] = processing.run(
+            # Load output into project
+            alg_params = {"INPUT": output, "NAME": name}
+            processing.run(
                 "native:loadlayer",
                 alg_params,
                 context=context,
@@ -817,49 +1280,119 @@ class CurveNumberGeneratorAlgorithm(QgsProcessingAlgorithm):
                 is_child_algorithm=True,
             )
 
-        if nlcd_vect_output:
-            # Load NLCD Vector Layer into project
-            alg_params = {
-                "INPUT": outputs["FixGeometries"]["OUTPUT"],
-                "NAME": "NLCD Land Cover Vector",
-            }
-            outputs["LoadLayerIntoProject2"] = processing.run(
-                "native:loadlayer",
-                alg_params,
-                context=context,
-                feedback=feedback,
-                is_child_algorithm=True,
-            )
+        return results
 
-        if soil_output:
-            # Load Soil Layer into project
-            alg_params = {
-                "INPUT": outputs["ReprojectSoil"]["OUTPUT"],
-                "NAME": "SSURGO Soil Layer",
-            }
-            outputs["LoadLayerIntoProject3"] = processing.run(
-                "native:loadlayer",
+    def setStyle(self, layer, style, context, feedback):
+        """Apply QML style file from plugin folder to layer"""
+        alg_params = {"INPUT": layer, "STYLE": os.path.join(cmd_folder, style)}
+        try:  # for QGIS Version 3.12 and later
+            processing.run(
+                "native:setlayerstyle",
                 alg_params,
                 context=context,
                 feedback=feedback,
                 is_child_algorithm=True,
             )
-
-        if curve_number_output:
-            # Load Curve Number Layer into project
-            alg_params = {
-                "INPUT": outputs["DropFields"]["OUTPUT"],
-                "NAME": "Curve Number Layer",
-            }
-            outputs["LoadLayerIntoProject4"] = processing.run(
-                "native:loadlayer",
+        except:  # for QGIS Version older than 3.12
+            processing.run(
+                (
+                    "qgis:setstyleforrasterlayer"
+                    if isinstance(
+                        QgsProcessingUtils.mapLayerFromString(layer, context),
+                        QgsRasterLayer,
+                    )
+                    else "qgis:setstyleforvectorlayer"
+                ),
                 alg_params,
                 context=context,
                 feedback=feedback,
                 is_child_algorithm=True,
             )
 
-        return results
+    def saveOutput(self, output, path, context):
+        """Write output layer to Cloud Optimized GeoTIFF or GeoPackage path, vector
+        features are streamed in chunked transactions"""
+        layer = QgsProcessingUtils.mapLayerFromString(output, context)
+        if isinstance(layer, QgsRasterLayer):
+            return write_cog(layer.source(), path)
+        return write_geopackage(
+            layer.getFeatures(),
+            layer.fields(),
+            layer.wkbType(),
+            layer.crs(),
+            path,
+            os.path.splitext(os.path.basename(path))[0],
+        )
+
+    def diskLayer(self, layer, path, name, context):
+        """GeoPackage layer written from layer with the style of layer"""
+        disk_layer = QgsVectorLayer(path, name, "ogr")
+        if not disk_layer.isValid():
+            raise QgsProcessingException("Could not read " + path)
+        style = QgsMapLayerStyle()
+        style.readFromLayer(layer)
+        style.writeToLayer(disk_layer)
+        context.temporaryLayerStore().addMapLayer(disk_layer)
+        return disk_layer.id()
+
+    def intermediateOutput(self, context, *sources):
+        """Memory layer output of a child algorithm run on sources, a temporary file
+        when the sources have too many features to keep in memory"""
+        features = 0
+        for source in sources:
+            features += self.measureOutput(source, context) or 0
+        if features > MEMORY_FEATURE_LIMIT:
+            return QgsProcessing.TEMPORARY_OUTPUT
+        return "memory:"
+
+    def layerHash(self, layer):
+        """Hash of the CRS, attributes and geometries of all features of layer"""
+        sha = hashlib.sha256(layer.crs().authid().encode("utf-8"))
+        for feat in layer.getFeatures():
+            sha.update(repr(feat.attributes()).encode("utf-8"))
+            if feat.hasGeometry():
+                sha.update(bytes(feat.geometry().asWkb()))
+        return sha.hexdigest()
+
+    def memoValue(self, value, context):
+        """Copy memory layers of a stage value out of the run context for the stage memo,
+        or copies of memo layers into the run context"""
+        if isinstance(value, QgsVectorLayer):
+            layer = value.materialize(QgsFeatureRequest())
+            context.temporaryLayerStore().addMapLayer(layer)
+            return layer.id()
+        if isinstance(value, str):
+            layer = context.temporaryLayerStore().mapLayer(value)
+            if isinstance(layer, QgsVectorLayer) and layer.providerType() == "memory":
+                return layer.materialize(QgsFeatureRequest())
+        return value
+
+    def measureOutput(self, value, context):
+        """Feature or pixel count of a pipeline stage value, None if it is not a layer"""
+        if isinstance(value, tuple):  # soil download GeoPackage or WFS file
+            value = value[0] if value[0] is not None else value[1]
+        if isinstance(value, list):
+            return len(value)
+        if isinstance(value, QgsVectorLayer):
+            return value.featureCount()
+        if not isinstance(value, str):
+            return None
+        layer = context.temporaryLayerStore().mapLayer(value)
+        if layer is not None:  # memory layer
+            return layer.featureCount()
+        gdal.PushErrorHandler("CPLQuietErrorHandler")
+        try:
+            dataset = gdal.OpenEx(value.split("|")[0])
+        finally:
+            gdal.PopErrorHandler()
+        if dataset is None:
+            return None
+        if dataset.RasterCount:
+            return dataset.RasterXSize * dataset.RasterYSize
+        return sum(
+            dataset.GetLayer(index).GetFeatureCount()
+            for index in range(dataset.GetLayerCount())
+        )
 
     def name(self):
         """
@@ -917,15 +1450,37 @@ class CurveNumberGeneratorAlgorithm(QgsProcessingAlgorithm):
 If left unchecked, the algorithm will assume HSG D for all dual category soils. 
 
 If checked the algorithm will assume HSG A/B/C for each dual category soil.</p>
+<h3>Area Boundary extent soft limit [acres]</h3>
+<p>A warning is issued when the Area Boundary extent is larger than this area. Large areas are downloaded in tiles but may take a long time to process.</p>
+<h3>Maximum concurrent downloads</h3>
+<p>Number of NLCD tiles and soil queries downloaded at the same time.</p>
+<h3>NLCD tile cache size [MB], 0 to disable</h3>
+<p>NLCD tiles are kept in a local cache so overlapping areas only download missing tiles. Least recently used tiles are removed when the cache grows beyond this size.</p>
+<h3>NLCD minimum mapping unit [pixels], 0 to disable</h3>
+<p>Land cover regions smaller than this number of pixels are merged into their largest neighbour before the NLCD raster is vectorized, so isolated pixels do not become polygons of their own. This speeds up the soil land cover intersection of the Curve Number Layer. The Curve Number Raster and Composite Curve Number are calculated from the original pixels. The number of polygons before and after merging and the reduction in percent are listed in the log.</p>
+<h3>Use local soil cache</h3>
+<p>SSURGO polygons are kept in a local database so overlapping areas only query the uncovered part from Soil Data Access. Cached survey areas are refreshed whenever a new version is published.</p>
 <h2>Outputs</h2>
 <h3>NLCD Land Cover Vector</h3>
 <p>NLCD 2016 Land Cover Dataset Vectorized</p>
 <h3>NLCD Land Cover Raster</h3>
 <p>NLCD 2016 Land Cover Dataset</p>
 <h3>Soil Layer</h3>
-<p>SSURGO Extended Soil Dataset </p>
+<p>SSURGO Extended Soil Dataset. When this output is not requested only the map unit symbol, name and Hydrologic Soil Group needed for Curve Number are downloaded.</p>
 <h3>Curve Number Layer</h3>
 <p>Generated Curve Number Layer based on Land Cover and HSG values.</p>
+<h3>Curve Number Raster</h3>
+<p>Curve Number GeoTIFF on the NLCD 30 m grid. Soil HSG is burned onto the land cover grid and CN is looked up per pixel, which is much faster than the vector Curve Number Layer for large areas.</p>
+<h3>Composite Curve Number per Area Boundary feature</h3>
+<p>Area weighted Curve Number of every Area Boundary feature, e.g. subbasins, computed on the Curve Number Raster grid, and a breakdown table of the area of every NLCD and HSG combination in every feature, joined to it by AreaFID. Features smaller than a 30 m pixel may get no composite Curve Number.</p>
+<h3>Vectorize Curve Number Raster</h3>
+<p>Also output a polygonized copy of the Curve Number Raster.</p>
+<h3>Reuse results of earlier runs with the same inputs</h3>
+<p>Results of every step are kept for the QGIS session under a key made from the Area Boundary, its CRS, the service URLs and the parameters of the step and of the steps before it. When only e.g. Drained Soils or the CN_Lookup table change, downloads and the soil land cover intersection are reused and only the Curve Number is calculated again. Reused steps are listed in the log.</p>
+<h3>Save outputs to folder</h3>
+<p>Optionally write every requested output to this folder as Cloud Optimized GeoTIFF or GeoPackage, e.g. NLCD_Raster.tif, Soil_Layer.gpkg, CN_Layer.gpkg and CN_Raster.tif. Layers added to the project are read from these files. Without a folder, vector outputs are written to temporary GeoPackages, so large outputs are not kept in memory.</p>
+<h3>Capture cProfile statistics of stage</h3>
+<p>Every run writes Profile.json with wall time, CPU time, memory growth, downloaded data and feature or pixel counts of each stage to the output folder, or a temporary folder, and summarizes it in the log. Optionally the selected stage is also run under cProfile and its statistics are saved next to the profile.</p>
 <br><p align="right">Algorithm author: Abdul Raheem Siddiqui</p><p align="right">Help author: Abdul Raheem Siddiqui</p><p align="right">Algorithm version: 1.0</p><p align="right">Contact email: ars.work.ce@gmail.com</p><p>Disclaimer: The curve numbers generated with this algorithm are high level estimates and should be reviewed in detail before being used for detailed modeling or construction projects.</p></body></html>"""
 
     def helpUrl(self):
@@ -0,0 +1,424 @@
+# -*- coding: utf-8 -*-
+
+"""
+/***************************************************************************
+ CurveNumberGenerator
+                                 A QGIS plugin
+ This plugin generates a Curve Number layer for the given Area of Interest within the contiguous United States. It can also download Soil and Land Cover datasets for the same area.
+ Generated by Plugin Builder: http://g-sherman.github.io/Qgis-Plugin-Builder/
+                              -------------------
+        begin                : 2020-06-06
+        copyright            : (C) 2020 by Abdul Raheem Siddiqui
+        email                : mailto:ars.work.ce@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+import sys
+import inspect
+import os
+from concurrent.futures import FIRST_COMPLETED, wait
+from qgis.PyQt.QtGui import QIcon
+from qgis.PyQt.QtCore import QCoreApplication, QVariant
+from qgis.core import (
+    QgsProcessing,
+    QgsFeatureSink,
+    QgsProcessingAlgorithm,
+    QgsProcessingException,
+    QgsProcessingParameterFeatureSource,
+    QgsProcessingParameterField,
+    QgsProcessingParameterBoolean,
+    QgsProcessingParameterNumber,
+    QgsProcessingParameterFeatureSink,
+    QgsProcessingParameterDefinition,
+    QgsCoordinateReferenceSystem,
+    QgsCoordinateTransform,
+    QgsApplication,
+    QgsGeometry,
+    QgsField,
+    QgsFields,
+    QgsFeature,
+    QgsWkbTypes,
+)
+
+cmd_folder = os.path.split(inspect.getfile(inspect.currentframe()))[0]
+sys.path.append(cmd_folder)
+
+from aoi import degrees_for_meters, query_geometry
+from batch import run_cn_job, worker_pool
+from cn_lookup import compile_cn_lut, missing_gdcodes, read_lookup_csv
+from nlcd import NLCD_CRS, NLCD_PALETTE_CODES, NLCD_PIXEL_SIZE, NLCDTileCache
+from ssurgo import SDA_MAX_VERTICES
+
+__author__ = "Abdul Raheem Siddiqui"
+__date__ = "2020-12-25"
+__copyright__ = "(C) 2020 by Abdul Raheem Siddiqui"
+
+# This will get replaced with a git SHA1 when you do a git archive
+
+__revision__ = "$Format:%H$"
+
+
+class CurveNumberGeneratorBatchAlgorithm(QgsProcessingAlgorithm):
+
+    OUTPUT = "CurveNumber"
+    REPORT = "JobReport"
+
+    def initAlgorithm(self, config=None):
+        self.addParameter(
+            QgsProcessingParameterFeatureSource(
+                "areaboundaries",
+                "Area Boundaries",
+                types=[QgsProcessing.TypeVectorPolygon],
+                defaultValue=None,
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterField(
+                "groupfield",
+                "Group features by field, each feature is a job if empty",
+                parentLayerParameterName="areaboundaries",
+                optional=True,
+            )
+        )
+        param = QgsProcessingParameterFeatureSource(
+            "cnlookup",
+            "CN_Lookup.csv",
+            optional=True,
+            types=[QgsProcessing.TypeVector],
+            defaultValue="",
+        )
+        param.setFlags(param.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(param)
+        param = QgsProcessingParameterBoolean(
+            "drainedsoilsleaveuncheckedifnotsure",
+            "Drained Soils? [leave unchecked if not sure]",
+            defaultValue=False,
+        )
+        param.setFlags(param.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(param)
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                "workerprocesses",
+                "Worker processes, 0 to run jobs in this process",
+                type=QgsProcessingParameterNumber.Integer,
+                minValue=0,
+                maxValue=64,
+                defaultValue=max(1, min(4, (os.cpu_count() or 2) - 1)),
+            )
+        )
+        param = QgsProcessingParameterNumber(
+            "maxconcurrentdownloads",
+            "Maximum concurrent downloads per job",
+            type=QgsProcessingParameterNumber.Integer,
+            minValue=1,
+            maxValue=16,
+            defaultValue=2,
+        )
+        param.setFlags(param.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(param)
+        param = QgsProcessingParameterNumber(
+            "nlcdcachesizemb",
+            "NLCD tile cache size [MB], 0 to disable",
+            type=QgsProcessingParameterNumber.Integer,
+            minValue=0,
+            defaultValue=1024,
+        )
+        param.setFlags(param.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(param)
+        param = QgsProcessingParameterBoolean(
+            "usesoilcache",
+            "Use local soil cache",
+            defaultValue=True,
+        )
+        param.setFlags(param.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(param)
+        self.addParameter(
+            QgsProcessingParameterFeatureSink(
+                self.OUTPUT,
+                "Curve Number",
+                type=QgsProcessing.TypeVectorPolygon,
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterFeatureSink(
+                self.REPORT,
+                "Job Report",
+                type=QgsProcessing.TypeVector,
+            )
+        )
+
+    def processAlgorithm(self, parameters, context, feedback):
+        source = self.parameterAsSource(parameters, "areaboundaries", context)
+        group_field = self.parameterAsString(parameters, "groupfield", context)
+
+        # plain strings so jobs can be sent to worker processes
+        if parameters.get("cnlookup") in (None, ""):
+            lookup_rows = read_lookup_csv(os.path.join(cmd_folder, "CN_Lookup.csv"))
+        else:
+            lookup_rows = [
+                (
+                    str(feat["GDCode"]) if feat["GDCode"] else "",
+                    str(feat["CN_Join"]) if feat["CN_Join"] else "",
+                )
+                for feat in self.parameterAsSource(
+                    parameters, "cnlookup", context
+                ).getFeatures()
+            ]
+        try:
+            cn_lut = compile_cn_lut(lookup_rows)[1]
+        except ValueError as e:
+            raise QgsProcessingException(str(e))
+        missing = missing_gdcodes(cn_lut, NLCD_PALETTE_CODES[1:])
+        if missing:
+            feedback.reportError(
+                "CN lookup table has no CN for GDCode "
+                + ", ".join(missing)
+                + ", these areas get no CN"
+                + "\n",
+                False,
+            )
+
+        cache_folder = os.path.join(
+            QgsApplication.qgisSettingsDirPath(), "cache", "curve_number_generator"
+        )
+        os.makedirs(cache_folder, exist_ok=True)
+        cache_size = self.parameterAsInt(parameters, "nlcdcachesizemb", context)
+
+        # Group area boundaries into jobs
+        groups = {}
+        for feat in source.getFeatures():
+            if not feat.hasGeometry():
+                continue
+            source_id = str(feat[group_field]) if group_field else str(feat.id())
+            groups.setdefault(source_id, []).append(feat.geometry())
+
+        to_nlcd = QgsCoordinateTransform(
+            source.sourceCrs(),
+            QgsCoordinateReferenceSystem(NLCD_CRS),
+            context.transformContext(),
+        )
+        to_wgs84 = QgsCoordinateTransform(
+            source.sourceCrs(),
+            QgsCoordinateReferenceSystem("EPSG:4326"),
+            context.transformContext(),
+        )
+        jobs = []
+        for source_id, geometries in groups.items():
+            aoi = QgsGeometry.unaryUnion(geometries)
+            aoi.transform(to_nlcd)
+            wgs84 = QgsGeometry.unaryUnion(geometries)
+            wgs84.transform(to_wgs84)
+            sda_geometry = query_geometry(
+                wgs84,
+                degrees_for_meters(NLCD_PIXEL_SIZE, wgs84.boundingBox().center().y()),
+                SDA_MAX_VERTICES,
+            )
+            jobs.append(
+                {
+                    "source_id": source_id,
+                    "aoi_wkt": aoi.asWkt(),
+                    "sda_wkt": sda_geometry.asWkt(8),
+                    "lookup_rows": lookup_rows,
+                    "drained": self.parameterAsBool(
+                        parameters, "drainedsoilsleaveuncheckedifnotsure", context
+                    ),
+                    "max_workers": self.parameterAsInt(
+                        parameters, "maxconcurrentdownloads", context
+                    ),
+                    "cache_folder": cache_folder,
+                    "nlcd_cache_bytes": cache_size * 1024 * 1024,
+                    "use_soil_cache": self.parameterAsBool(
+                        parameters, "usesoilcache", context
+                    ),
+                }
+            )
+        feedback.pushInfo("Running " + str(len(jobs)) + " job(s)")
+
+        fields = QgsFields()
+        fields.append(QgsField("SOURCE_ID", QVariant.String))
+        fields.append(QgsField("CN", QVariant.Int, len=3))
+        sink, dest_id = self.parameterAsSink(
+            parameters,
+            self.OUTPUT,
+            context,
+            fields,
+            QgsWkbTypes.Polygon,
+            QgsCoordinateReferenceSystem(NLCD_CRS),
+        )
+        report_fields = QgsFields()
+        report_fields.append(QgsField("SOURCE_ID", QVariant.String))
+        report_fields.append(QgsField("STATUS", QVariant.String))
+        report_fields.append(QgsField("MESSAGE", QVariant.String))
+        report_fields.append(QgsField("FEATURES", QVariant.Int))
+        report_sink, report_id = self.parameterAsSink(
+            parameters,
+            self.REPORT,
+            context,
+            report_fields,
+            QgsWkbTypes.NoGeometry,
+            QgsCoordinateReferenceSystem(),
+        )
+
+        finished = []
+
+        def add_result(result):
+            if result["error"]:
+                feedback.reportError(
+                    "Job " + result["source_id"] + " failed: " + result["error"], False
+                )
+            else:
+                for cn, wkb in result["polygons"]:
+                    geometry = QgsGeometry()
+                    geometry.fromWkb(wkb)
+                    feat = QgsFeature(fields)
+                    feat.setGeometry(geometry)
+                    feat.setAttributes([result["source_id"], cn])
+                    sink.addFeature(feat, QgsFeatureSink.FastInsert)
+                feedback.pushInfo(
+                    "Job "
+                    + result["source_id"]
+                    + " finished with "
+                    + str(len(result["polygons"]))
+                    + " polygons"
+                )
+            report = QgsFeature(report_fields)
+            report.setAttributes(
+                [
+                    result["source_id"],
+                    "failed" if result["error"] else "succeeded",
+                    result["error"],
+                    len(result["polygons"]),
+                ]
+            )
+            report_sink.addFeature(report, QgsFeatureSink.FastInsert)
+            finished.append(result)
+            feedback.setProgress(100 * len(finished) / len(jobs))
+
+        # jobs never evict NLCD tiles, tiles in use by other workers are unknown to
+        # them, so the cache is evicted here before and after the jobs run
+        nlcd_cache = None
+        if cache_size > 0:
+            nlcd_cache = NLCDTileCache(cache_folder, cache_size * 1024 * 1024)
+            nlcd_cache.evict()
+
+        processes = self.parameterAsInt(parameters, "workerprocesses", context)
+        if processes == 0:
+            for job in jobs:
+                if feedback.isCanceled():
+                    break
+                add_result(run_cn_job(job))
+        else:
+            executor = worker_pool(processes)
+            try:
+                pending = {executor.submit(run_cn_job, job): job for job in jobs}
+                while pending and not feedback.isCanceled():
+                    done, _ = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        job = pending.pop(future)
+                        try:
+                            result = future.result()
+                        except Exception as e:  # worker process died
+                            result = {
+                                "source_id": job["source_id"],
+                                "polygons": [],
+                                "error": "{}: {}".format(type(e).__name__, e),
+                            }
+                        add_result(result)
+                for future in pending:
+                    future.cancel()
+            finally:
+                executor.shutdown(wait=not feedback.isCanceled())
+        # workers of a canceled batch may still be running
+        if nlcd_cache is not None and not feedback.isCanceled():
+            nlcd_cache.evict()
+
+        failed = len([result for result in finished if result["error"]])
+        feedback.pushInfo(
+            "{} of {} job(s) finished, {} failed".format(
+                len(finished), len(jobs), failed
+            )
+        )
+        return {self.OUTPUT: dest_id, self.REPORT: report_id}
+
+    def name(self):
+        """
+        Returns the algorithm name, used for identifying the algorithm. This
+        string should be fixed for the algorithm, and must not be localised.
+        The name should be unique within each provider. Names should contain
+        lowercase alphanumeric characters only and no spaces or other
+        formatting characters.
+        """
+        return "Curve Number Generator Batch"
+
+    def displayName(self):
+        """
+        Returns the translated algorithm name, which should be used for any
+        user-visible display of the algorithm name.
+        """
+        return self.tr(self.name())
+
+    def group(self):
+        """
+        Returns the name of the group this algorithm belongs to. This string
+        should be localised.
+        """
+        return self.tr(self.groupId())
+
+    def groupId(self):
+        """
+        Returns the unique ID of the group this algorithm belongs to. This
+        string should be fixed for the algorithm, and must not be localised.
+        The group id should be unique within each provider. Group id should
+        contain lowercase alphanumeric characters only and no spaces or other
+        formatting characters.
+        """
+        return ""
+
+    def tr(self, string):
+        return QCoreApplication.translate("Processing", string)
+
+    def icon(self):
+        cmd_folder = os.path.split(inspect.getfile(inspect.currentframe()))[0]
+        icon = QIcon(os.path.join(os.path.join(cmd_folder, "logo.png")))
+        return icon
+
+    def shortHelpString(self):
+        return """<html><body><h2>Algorithm description</h2>
+<p>This algorithm generates Curve Number polygons for many Areas of Interest at once. Every feature, or every group of features with the same value in the group field, is processed as its own job on a pool of worker processes. Jobs share the NLCD and soil caches, a failing job is reported and the batch continues.</p>
+<h2>Input parameters</h2>
+<h3>Area Boundaries</h3>
+<p>Areas of Interest, e.g. subcatchments</p>
+<h3>Group features by field</h3>
+<p>Features with the same value are processed as one job. If empty every feature is a job identified by its feature id.</p>
+<h3>CN_Lookup.csv [optional]</h3>
+<p>Optional Table to relate NLCD Land Use Value and HSG Value to a particular curve number. By default the algorithm uses pre defined table.</p>
+<h3>Drained Soils? [leave unchecked if not sure]</h3>
+<p>If checked the algorithm will assume HSG A/B/C for each dual category soil, otherwise HSG D.</p>
+<h3>Worker processes</h3>
+<p>Number of jobs processed at the same time. With 0 jobs run one after another in the QGIS process.</p>
+<h3>Maximum concurrent downloads per job</h3>
+<p>Number of NLCD tiles and soil queries each job downloads at the same time.</p>
+<h3>NLCD tile cache size [MB], 0 to disable</h3>
+<p>Size of the NLCD tile cache shared by all jobs.</p>
+<h3>Use local soil cache</h3>
+<p>Share the local SSURGO cache between jobs.</p>
+<h2>Outputs</h2>
+<h3>Curve Number</h3>
+<p>Curve Number polygons on the NLCD 30 m grid in EPSG:5070 with the SOURCE_ID of their job.</p>
+<h3>Job Report</h3>
+<p>Status, error message and number of Curve Number polygons of every job.</p>
+<br><p align="right">Algorithm author: Abdul Raheem Siddiqui</p><p align="right">Help author: Abdul Raheem Siddiqui</p><p align="right">Algorithm version: 1.0</p><p align="right">Contact email: ars.work.ce@gmail.com</p><p>Disclaimer: The curve numbers generated with this algorithm are high level estimates and should be reviewed in detail before being used for detailed modeling or construction projects.</p></body></html>"""
+
+    def helpUrl(self):
+        return "mailto:ars.work.ce@gmail.com"
+
+    def createInstance(self):
+        return CurveNumberGeneratorBatchAlgorithm()
@@ -36,6 +36,7 @@ from qgis.PyQt.QtGui import QIcon
 
 from qgis.core import QgsProcessingProvider
 from .curve_number_generator_algorithm import CurveNumberGeneratorAlgorithm
+from .curve_number_generator_batch_algorithm import CurveNumberGeneratorBatchAlgorithm
 
 
 class CurveNumberGeneratorProvider(QgsProcessingProvider):
@@ -58,8 +59,7 @@ class CurveNumberGeneratorProvider(QgsProcessingProvider):
         Loads all algorithms belonging to this provider.
         """
         self.addAlgorithm(CurveNumberGeneratorAlgorithm())
-        # add additional algorithms here
-        # self.addAlgorithm(MyOtherAlgorithm())
+        self.addAlgorithm(CurveNumberGeneratorBatchAlgorithm())
 
     def id(self):
         """
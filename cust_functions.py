@@ -4,3 +4,52 @@ def check_crs_acceptable(crs: str) -> bool:
     if crs in acceptable_CRS:
         return True
     return False
+
+
+# Hydrologic Soil Groups in the order used to index CN lookup arrays, "" is for soils without HSG
+HSG_CLASSES = ["", "A", "B", "C", "D"]
+# Soils mapped as water without an HSG take the CN of GDCode "11"
+HSG_WATER_INDEX = len(HSG_CLASSES)
+# HSG index of raster pixels no soil polygon covers
+HSG_NO_SOIL = 255
+
+
+def is_water_soil(musym, muname) -> bool:
+    """ Check if a soil map unit represents water based on its symbol or name"""
+    musym = str(musym) if musym else ""
+    muname = str(muname) if muname else ""
+    return (
+        musym == "W"
+        or musym.lower() == "water"
+        or muname.lower() == "water"
+        or muname == "W"
+    )
+
+
+def resolve_hsg(hydgrpdcd, drained: bool) -> str:
+    """ Resolve dual category HSG (A/D, B/D, C/D) based on drained condition"""
+    if not hydgrpdcd:
+        return ""
+    hsg = str(hydgrpdcd)
+    if drained:
+        return hsg.replace("/D", "")
+    for dual in ("A/", "B/", "C/"):
+        hsg = hsg.replace(dual, "")
+    return hsg
+
+
+def hsg_index(hydgrpdcd, musym, muname, drained: bool) -> int:
+    """ Get index of soil HSG in HSG_CLASSES, HSG_WATER_INDEX for water soils"""
+    hsg = resolve_hsg(hydgrpdcd, drained)
+    if not hsg and is_water_soil(musym, muname):
+        return HSG_WATER_INDEX
+    if hsg in HSG_CLASSES:
+        return HSG_CLASSES.index(hsg)
+    return 0
+
+
+def parse_gdcode(gdcode) -> tuple:
+    """ Split GDCode like '41B' into NLCD code 41 and HSG 'B'"""
+    gdcode = str(gdcode).strip()
+    digits = gdcode.rstrip("ABCD")
+    return int(digits), gdcode[len(digits) :]
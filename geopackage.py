@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+
+"""
+/***************************************************************************
+ CurveNumberGenerator
+                                 A QGIS plugin
+ This plugin generates a Curve Number layer for the given Area of Interest within the contiguous United States. It can also download Soil and Land Cover datasets for the same area.
+ Generated by Plugin Builder: http://g-sherman.github.io/Qgis-Plugin-Builder/
+                              -------------------
+        begin                : 2020-06-06
+        copyright            : (C) 2020 by Abdul Raheem Siddiqui
+        email                : mailto:ars.work.ce@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+import os
+
+from osgeo import ogr, osr
+from qgis.PyQt.QtCore import QVariant
+from qgis.core import QgsWkbTypes
+
+__author__ = "Abdul Raheem Siddiqui"
+__date__ = "2020-12-25"
+__copyright__ = "(C) 2020 by Abdul Raheem Siddiqui"
+
+# This will get replaced with a git SHA1 when you do a git archive
+
+__revision__ = "$Format:%H$"
+
+# features written per transaction
+GPKG_CHUNK_SIZE = 10000
+GPKG_GEOMETRY_COLUMN = "geom"
+# OGR field types of QGIS field types, other types are written as strings
+OGR_FIELD_TYPES = {
+    QVariant.Bool: ogr.OFTInteger,
+    QVariant.Int: ogr.OFTInteger,
+    QVariant.UInt: ogr.OFTInteger64,
+    QVariant.LongLong: ogr.OFTInteger64,
+    QVariant.ULongLong: ogr.OFTInteger64,
+    QVariant.Double: ogr.OFTReal,
+}
+
+
+class GeoPackageSink:
+    """Feature sink streaming features to a GeoPackage layer in chunked transactions,
+    the spatial index is built once when the sink is closed"""
+
+    def __init__(
+        self,
+        path: str,
+        layer_name: str,
+        fields,
+        wkb_type,
+        crs,
+        chunk_size: int = GPKG_CHUNK_SIZE,
+    ):
+        self.path = path
+        self.layer_name = layer_name
+        self.chunk_size = chunk_size
+        self.pending = 0
+        self.field_names = fields.names()
+        self.has_geometry = wkb_type != QgsWkbTypes.NoGeometry
+
+        if os.path.exists(path):
+            os.remove(path)
+        self.dataset = ogr.GetDriverByName("GPKG").CreateDataSource(path)
+        if self.dataset is None:
+            raise OSError("Could not create GeoPackage " + path)
+        srs = None
+        if self.has_geometry and crs.isValid():
+            srs = osr.SpatialReference()
+            srs.ImportFromWkt(crs.toWkt())
+        self.layer = self.dataset.CreateLayer(
+            layer_name,
+            srs,
+            QgsWkbTypes.flatType(wkb_type) if self.has_geometry else ogr.wkbNone,
+            options=[
+                "SPATIAL_INDEX=NO",
+                "GEOMETRY_NAME=" + GPKG_GEOMETRY_COLUMN,
+                "FID=fid",
+            ],
+        )
+        for field in fields:
+            field_defn = ogr.FieldDefn(
+                field.name(), OGR_FIELD_TYPES.get(field.type(), ogr.OFTString)
+            )
+            if field.type() == QVariant.Bool:
+                field_defn.SetSubType(ogr.OFSTBoolean)
+            elif field.type() == QVariant.String and field.length() > 0:
+                field_defn.SetWidth(field.length())
+            self.layer.CreateField(field_defn)
+        self.layer_defn = self.layer.GetLayerDefn()
+        self.dataset.StartTransaction()
+
+    def addFeature(self, feature) -> bool:
+        return self.addValues(
+            feature.attributes(),
+            (
+                ogr.CreateGeometryFromWkb(bytes(feature.geometry().asWkb()))
+                if feature.hasGeometry()
+                else None
+            ),
+        )
+
+    def addValues(self, attributes, geometry=None) -> bool:
+        """Write a feature of attribute values in field order and an OGR geometry"""
+        ogr_feature = ogr.Feature(self.layer_defn)
+        for index, value in enumerate(attributes):
+            # NULL attributes are QVariant
+            if value is None or isinstance(value, QVariant):
+                continue
+            if not isinstance(value, (int, float, str)):
+                value = str(value)
+            ogr_feature.SetField(self.field_names[index], value)
+        if self.has_geometry and geometry is not None:
+            ogr_feature.SetGeometry(geometry)
+        self.layer.CreateFeature(ogr_feature)
+        self.pending += 1
+        if self.pending >= self.chunk_size:
+            self.dataset.CommitTransaction()
+            self.dataset.StartTransaction()
+            self.pending = 0
+        return True
+
+    def addFeatures(self, features) -> bool:
+        for feature in features:
+            self.addFeature(feature)
+        return True
+
+    def close(self) -> str:
+        """Commit remaining features and build the spatial index, returns the path"""
+        self.dataset.CommitTransaction()
+        if self.has_geometry:
+            self.dataset.ExecuteSQL(
+                "SELECT CreateSpatialIndex('{}', '{}')".format(
+                    self.layer_name, GPKG_GEOMETRY_COLUMN
+                )
+            )
+        self.dataset = None
+        return self.path
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        if self.dataset is not None:
+            self.close()
+
+
+def write_geopackage(
+    features, fields, wkb_type, crs, path: str, layer_name: str, feedback=None
+) -> str:
+    """Stream features to a new GeoPackage layer, returns the path"""
+    sink = GeoPackageSink(path, layer_name, fields, wkb_type, crs)
+    for current, feature in enumerate(features):
+        if current % GPKG_CHUNK_SIZE == 0 and feedback is not None:
+            if feedback.isCanceled():
+                break
+        sink.addFeature(feature)
+    return sink.close()
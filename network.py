@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+
+"""
+/***************************************************************************
+ CurveNumberGenerator
+                                 A QGIS plugin
+ This plugin generates a Curve Number layer for the given Area of Interest within the contiguous United States. It can also download Soil and Land Cover datasets for the same area.
+ Generated by Plugin Builder: http://g-sherman.github.io/Qgis-Plugin-Builder/
+                              -------------------
+        begin                : 2020-06-06
+        copyright            : (C) 2020 by Abdul Raheem Siddiqui
+        email                : mailto:ars.work.ce@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+__author__ = "Abdul Raheem Siddiqui"
+__date__ = "2020-12-25"
+__copyright__ = "(C) 2020 by Abdul Raheem Siddiqui"
+
+# This will get replaced with a git SHA1 when you do a git archive
+
+__revision__ = "$Format:%H$"
+
+# (connect, read) timeouts in seconds
+DEFAULT_TIMEOUT = (10, 300)
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+MAX_RETRIES = 4
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+# seconds between cancel checks while waiting to retry
+CANCEL_POLL_INTERVAL = 0.5
+# keep-alive connections kept per host
+POOL_SIZE = 16
+
+_session = None
+_session_lock = threading.Lock()
+# response body bytes read by all threads, used to profile downloads
+_bytes_received = 0
+_bytes_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """Get shared HTTP session with a keep-alive connection pool per host"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=POOL_SIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers.update(
+                {
+                    "Accept-Encoding": "gzip, deflate",
+                    "User-Agent": "QGIS Curve Number Generator",
+                }
+            )
+            _session = session
+        return _session
+
+
+def backoff_delay(attempt: int, retry_after=None) -> float:
+    """Exponential backoff with full jitter, honouring Retry-After seconds if given"""
+    if retry_after:
+        try:
+            return min(float(retry_after), BACKOFF_MAX)
+        except ValueError:
+            pass
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2**attempt))
+
+
+def request(
+    method: str,
+    url: str,
+    retry_statuses: tuple = RETRY_STATUSES,
+    max_retries: int = MAX_RETRIES,
+    feedback=None,
+    **kwargs
+) -> requests.Response:
+    """Send request through shared session, retrying connection errors and retry_statuses,
+    a canceled feedback stops waiting for the next retry"""
+    kwargs.setdefault("timeout", DEFAULT_TIMEOUT)
+    attempt = 0
+    while True:
+        try:
+            response = get_session().request(method, url, **kwargs)
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt >= max_retries:
+                raise
+            delay = backoff_delay(attempt)
+        else:
+            if response.status_code not in retry_statuses or attempt >= max_retries:
+                response.raise_for_status()
+                return response
+            delay = backoff_delay(attempt, response.headers.get("Retry-After"))
+            response.close()
+        if feedback is None:
+            time.sleep(delay)
+        else:
+            feedback.pushInfo(
+                "Retrying {} in {:.1f} seconds".format(url.split("?")[0], delay)
+            )
+            retry_time = time.monotonic() + delay
+            while True:
+                if feedback.isCanceled():
+                    raise requests.ConnectionError("Request canceled: " + url)
+                remaining = retry_time - time.monotonic()
+                if remaining <= 0:
+                    break
+                time.sleep(min(remaining, CANCEL_POLL_INTERVAL))
+        attempt += 1
+
+
+def bytes_received() -> int:
+    """Total response body bytes read through iter_chunks"""
+    return _bytes_received
+
+
+def iter_chunks(response: requests.Response, chunk_size: int = 1 << 16):
+    """Iterate response body chunks counting received bytes"""
+    global _bytes_received
+    for chunk in response.iter_content(chunk_size=chunk_size):
+        with _bytes_lock:
+            _bytes_received += len(chunk)
+        yield chunk
+
+
+def download_file(url: str, path: str, feedback=None, **kwargs) -> str:
+    """Stream response body of GET request to path"""
+    response = request("GET", url, feedback=feedback, stream=True, **kwargs)
+    with open(path, "wb") as out_file:
+        for chunk in iter_chunks(response):
+            out_file.write(chunk)
+    return path
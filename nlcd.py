@@ -0,0 +1,409 @@
+# -*- coding: utf-8 -*-
+
+"""
+/***************************************************************************
+ CurveNumberGenerator
+                                 A QGIS plugin
+ This plugin generates a Curve Number layer for the given Area of Interest within the contiguous United States. It can also download Soil and Land Cover datasets for the same area.
+ Generated by Plugin Builder: http://g-sherman.github.io/Qgis-Plugin-Builder/
+                              -------------------
+        begin                : 2020-06-06
+        copyright            : (C) 2020 by Abdul Raheem Siddiqui
+        email                : mailto:ars.work.ce@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+import hashlib
+import math
+import os
+import shutil
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+from osgeo import gdal, ogr
+
+from cog import write_cog
+from network import iter_chunks, request
+
+__author__ = "Abdul Raheem Siddiqui"
+__date__ = "2020-12-25"
+__copyright__ = "(C) 2020 by Abdul Raheem Siddiqui"
+
+# This will get replaced with a git SHA1 when you do a git archive
+
+__revision__ = "$Format:%H$"
+
+NLCD_WMS_URL = (
+    "https://www.mrlc.gov/geoserver/mrlc_display/NLCD_2016_Land_Cover_L48/ows"
+)
+NLCD_LAYER = "NLCD_2016_Land_Cover_L48"
+NLCD_YEAR = 2016
+NLCD_CRS = "EPSG:5070"
+NLCD_PIXEL_SIZE = 30
+# upper left corner of the native NLCD CONUS grid in EPSG:5070
+NLCD_GRID_ORIGIN = (-2493045, 3310005)
+# tile width and height in pixels for a single GetMap request
+NLCD_TILE_SIZE = 512
+# NLCD class codes by palette index of the WMS GeoTIFF, index 0 has no class
+NLCD_PALETTE_CODES = (
+    0,
+    11,
+    12,
+    21,
+    22,
+    23,
+    24,
+    31,
+    32,
+    41,
+    42,
+    43,
+    51,
+    52,
+    71,
+    72,
+    73,
+    74,
+    81,
+    82,
+    90,
+    95,
+)
+
+# NLCD class code of every palette index
+NLCD_CODE_LUT = np.zeros(256, dtype=np.uint8)
+NLCD_CODE_LUT[: len(NLCD_PALETTE_CODES)] = NLCD_PALETTE_CODES
+
+
+def snap_extent(
+    xmin: float,
+    ymin: float,
+    xmax: float,
+    ymax: float,
+    pixel_size: float = NLCD_PIXEL_SIZE,
+    origin: tuple = NLCD_GRID_ORIGIN,
+) -> tuple:
+    """Grow extent outwards to pixel edges of the grid starting at origin"""
+    ox, oy = origin
+    return (
+        ox + math.floor((xmin - ox) / pixel_size) * pixel_size,
+        oy + math.floor((ymin - oy) / pixel_size) * pixel_size,
+        ox + math.ceil((xmax - ox) / pixel_size) * pixel_size,
+        oy + math.ceil((ymax - oy) / pixel_size) * pixel_size,
+    )
+
+
+def nlcd_tiles(
+    xmin: float,
+    ymin: float,
+    xmax: float,
+    ymax: float,
+    tile_size: int = NLCD_TILE_SIZE,
+    pixel_size: float = NLCD_PIXEL_SIZE,
+    origin: tuple = NLCD_GRID_ORIGIN,
+) -> list:
+    """Get grid aligned tiles covering EPSG:5070 extent, returns list of (col, row, bbox, width, height)"""
+    ox, oy = origin
+    span = tile_size * pixel_size
+    col_min = math.floor((xmin - ox) / span)
+    col_max = max(math.ceil((xmax - ox) / span), col_min + 1)
+    row_min = math.floor((oy - ymax) / span)
+    row_max = max(math.ceil((oy - ymin) / span), row_min + 1)
+
+    tiles = []
+    for row in range(row_min, row_max):
+        for col in range(col_min, col_max):
+            bbox = (
+                ox + col * span,
+                oy - (row + 1) * span,
+                ox + (col + 1) * span,
+                oy - row * span,
+            )
+            tiles.append((col, row, bbox, tile_size, tile_size))
+    return tiles
+
+
+def nlcd_tile_url(crs: str, bbox: tuple, width: int, height: int) -> str:
+    """Build WMS GetMap request URL for a single NLCD tile"""
+    return (
+        NLCD_WMS_URL
+        + "?version=1.3.0&service=WMS&layers="
+        + NLCD_LAYER
+        + "&styles&crs="
+        + str(crs)
+        + "&format=image/geotiff&request=GetMap&width="
+        + str(width)
+        + "&height="
+        + str(height)
+        + "&BBOX="
+        + ",".join(str(coord) for coord in bbox)
+        + "&"
+    )
+
+
+def download_nlcd_tile(url: str, path: str, feedback=None) -> str:
+    """Download a single NLCD tile to path, retries stop when feedback is canceled"""
+    response = request("GET", url, feedback=feedback, stream=True, timeout=(10, 120))
+    if "tiff" not in response.headers.get("Content-Type", ""):
+        # geoserver reports errors as XML with status 200
+        raise ValueError("NLCD WMS did not return a GeoTIFF: " + response.text[:500])
+    with open(path, "wb") as tile_file:
+        for chunk in iter_chunks(response):
+            tile_file.write(chunk)
+    return path
+
+
+class NLCDTileCache:
+    """On-disk cache of NLCD tiles keyed by layer, year and grid tile index with LRU eviction
+
+    Tiles in use are only known to this process, so processes sharing the cache
+    concurrently pass evict_on_put=False and leave evict() to their parent process.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int, evict_on_put: bool = True):
+        self.cache_dir = os.path.join(cache_dir, NLCD_LAYER, str(NLCD_YEAR))
+        self.max_bytes = max_bytes
+        self.evict_on_put = evict_on_put
+        # tiles used by the current run are never evicted
+        self.in_use = set()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def tile_path(self, col: int, row: int) -> str:
+        return os.path.join(self.cache_dir, "{}_{}.tif".format(col, row))
+
+    @staticmethod
+    def checksum(path: str) -> str:
+        sha = hashlib.sha256()
+        with open(path, "rb") as tile_file:
+            for chunk in iter(lambda: tile_file.read(1 << 16), b""):
+                sha.update(chunk)
+        return sha.hexdigest()
+
+    def get(self, col: int, row: int):
+        """Get path of cached tile, None if missing or corrupt"""
+        path = self.tile_path(col, row)
+        try:
+            with open(path + ".sha256") as checksum_file:
+                expected = checksum_file.read().strip()
+            valid = expected == self.checksum(path) and gdal.Open(path) is not None
+        except OSError:
+            return None
+        if not valid:
+            self.remove(path)
+            return None
+        # modification time is used as last access time for LRU eviction
+        os.utime(path)
+        self.in_use.add(path)
+        return path
+
+    def put(self, col: int, row: int, source_path: str) -> str:
+        """Move downloaded tile into cache and evict least recently used tiles"""
+        path = self.tile_path(col, row)
+        # write under a unique name and rename so concurrent runs never see partial tiles
+        temp_suffix = "." + uuid.uuid4().hex
+        with open(path + ".sha256" + temp_suffix, "w") as checksum_file:
+            checksum_file.write(self.checksum(source_path))
+        shutil.move(source_path, path + temp_suffix)
+        os.replace(path + temp_suffix, path)
+        os.replace(path + ".sha256" + temp_suffix, path + ".sha256")
+        self.in_use.add(path)
+        if self.evict_on_put:
+            self.evict()
+        return path
+
+    def remove(self, path: str):
+        for stale in (path, path + ".sha256"):
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+
+    def evict(self):
+        """Remove least recently used tiles until cache is within size cap"""
+        tiles = []
+        total = 0
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".tif"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            total += stat.st_size
+            if path not in self.in_use:
+                tiles.append((stat.st_mtime, stat.st_size, path))
+        for _, size, path in sorted(tiles):
+            if total <= self.max_bytes:
+                break
+            self.remove(path)
+            total -= size
+
+
+def fetch_nlcd_tile(tile: tuple, out_dir: str, cache=None, feedback=None) -> tuple:
+    """Get NLCD tile from cache or download it, returns (path, cache hit)"""
+    col, row, bbox, width, height = tile
+    if cache is not None:
+        path = cache.get(col, row)
+        if path:
+            return path, True
+    path = download_nlcd_tile(
+        nlcd_tile_url(NLCD_CRS, bbox, width, height),
+        os.path.join(out_dir, "nlcd_{}_{}.tif".format(col, row)),
+        feedback,
+    )
+    if cache is not None:
+        path = cache.put(col, row, path)
+    return path, False
+
+
+def download_nlcd(
+    tiles: list, out_dir: str, max_workers: int = 4, feedback=None, cache=None
+) -> list:
+    """Get NLCD tiles concurrently, returns list of tile paths"""
+    paths = []
+    hits = 0
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(fetch_nlcd_tile, tile, out_dir, cache, feedback)
+            for tile in tiles
+        ]
+        for future in as_completed(futures):
+            if feedback is not None and feedback.isCanceled():
+                for pending in futures:
+                    pending.cancel()
+                return []
+            path, hit = future.result()
+            paths.append(path)
+            hits += hit
+            if feedback is not None:
+                feedback.setProgress(100 * len(paths) / len(futures))
+    if feedback is not None and cache is not None:
+        feedback.pushInfo("NLCD tiles from cache: {} of {}".format(hits, len(futures)))
+    return sorted(paths)
+
+
+def palette_to_nlcd(palette: np.ndarray) -> np.ndarray:
+    """Convert WMS palette indices to NLCD class codes, 0 where there is no class"""
+    return NLCD_CODE_LUT[palette.astype(np.uint8, copy=False)]
+
+
+def reclassify_nlcd(
+    palette_path: str, output_path: str, block_rows: int = NLCD_TILE_SIZE
+) -> str:
+    """Convert WMS palette raster to NLCD class codes block by block and write them as
+    UInt8 Cloud Optimized GeoTIFF, 0 where there is no class"""
+    palette_ds = gdal.Open(palette_path)
+    palette_band = palette_ds.GetRasterBand(1)
+    width, height = palette_ds.RasterXSize, palette_ds.RasterYSize
+    nlcd_ds = gdal.GetDriverByName("MEM").Create("", width, height, 1, gdal.GDT_Byte)
+    nlcd_ds.SetGeoTransform(palette_ds.GetGeoTransform())
+    nlcd_ds.SetProjection(palette_ds.GetProjection())
+    nlcd_band = nlcd_ds.GetRasterBand(1)
+    nlcd_band.SetNoDataValue(0)
+    for row in range(0, height, block_rows):
+        block = palette_band.ReadAsArray(
+            0, row, width, min(block_rows, height - row)
+        ).astype(np.uint8, copy=False)
+        # palette indices are replaced by their codes in place
+        np.take(NLCD_CODE_LUT, block, out=block, mode="clip")
+        nlcd_band.WriteArray(block, 0, row)
+    palette_ds = None
+    return write_cog(nlcd_ds, output_path)
+
+
+def mosaic_tiles(paths: list, vrt_path: str) -> str:
+    """Mosaic downloaded tiles into a single VRT"""
+    vrt = gdal.BuildVRT(vrt_path, paths)
+    vrt.FlushCache()
+    vrt = None
+    return vrt_path
+
+
+def clip_nlcd(nlcd_path: str, crs: str, extent: tuple, output_path: str) -> str:
+    """Cut NLCD mosaic to extent in crs, reprojecting when crs is not the native NLCD crs"""
+    if crs == NLCD_CRS:
+        # keep native pixels, no resampling
+        options = gdal.WarpOptions(
+            outputBounds=snap_extent(*extent),
+            xRes=NLCD_PIXEL_SIZE,
+            yRes=NLCD_PIXEL_SIZE,
+            resampleAlg="near",
+        )
+    else:
+        options = gdal.WarpOptions(
+            dstSRS=crs,
+            outputBounds=extent,
+            xRes=NLCD_PIXEL_SIZE,
+            yRes=NLCD_PIXEL_SIZE,
+            targetAlignedPixels=True,
+            resampleAlg="near",
+        )
+    clipped = gdal.Warp(output_path, nlcd_path, options=options)
+    clipped.FlushCache()
+    clipped = None
+    return output_path
+
+
+def fetch_nlcd(
+    tiles: list,
+    crs: str,
+    extent: tuple,
+    folder: str,
+    max_workers: int = 4,
+    feedback=None,
+    cache=None,
+) -> str:
+    """Get NLCD tiles, mosaic them and cut them to extent in crs, files are written to
+    folder, returns path of the WMS palette raster or None if canceled"""
+    tiles_folder = os.path.join(folder, "tiles")
+    os.makedirs(tiles_folder, exist_ok=True)
+    tile_paths = download_nlcd(tiles, tiles_folder, max_workers, feedback, cache)
+    if not tile_paths:
+        return None
+    return clip_nlcd(
+        mosaic_tiles(tile_paths, os.path.join(folder, "NLCD.vrt")),
+        crs,
+        extent,
+        os.path.join(folder, "NLCD.tif"),
+    )
+
+
+def sieve_nlcd(nlcd_path: str, threshold: int, output_path: str) -> str:
+    """Merge 4-connected regions smaller than threshold pixels into their largest
+    neighbour, the minimum mapping unit of polygonized NLCD"""
+    nlcd_ds = gdal.Open(nlcd_path)
+    sieved_ds = gdal.GetDriverByName("GTiff").CreateCopy(
+        output_path, nlcd_ds, options=["COMPRESS=DEFLATE", "TILED=YES"]
+    )
+    nlcd_band = nlcd_ds.GetRasterBand(1)
+    # nodata pixels are neither merged nor merged into
+    gdal.SieveFilter(
+        nlcd_band,
+        nlcd_band.GetMaskBand(),
+        sieved_ds.GetRasterBand(1),
+        threshold,
+        4,
+    )
+    sieved_ds.FlushCache()
+    sieved_ds = None
+    return output_path
+
+
+def count_regions(nlcd_path: str) -> int:
+    """Count 4-connected regions of NLCD, the polygons polygonizing it would create"""
+    nlcd_band = gdal.Open(nlcd_path).GetRasterBand(1)
+    # polygons are only counted, so they get no attributes
+    region_ds = ogr.GetDriverByName("Memory").CreateDataSource("regions")
+    region_layer = region_ds.CreateLayer("regions")
+    gdal.Polygonize(nlcd_band, nlcd_band.GetMaskBand(), region_layer, -1)
+    return region_layer.GetFeatureCount()
@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+
+"""
+/***************************************************************************
+ CurveNumberGenerator
+                                 A QGIS plugin
+ This plugin generates a Curve Number layer for the given Area of Interest within the contiguous United States. It can also download Soil and Land Cover datasets for the same area.
+ Generated by Plugin Builder: http://g-sherman.github.io/Qgis-Plugin-Builder/
+                              -------------------
+        begin                : 2020-06-06
+        copyright            : (C) 2020 by Abdul Raheem Siddiqui
+        email                : mailto:ars.work.ce@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+from qgis.PyQt.QtCore import QVariant
+from qgis.core import (
+    QgsFeature,
+    QgsFeatureRequest,
+    QgsField,
+    QgsFields,
+    QgsGeometry,
+    QgsMemoryProviderUtils,
+    QgsSpatialIndex,
+    QgsWkbTypes,
+)
+
+from cn_lookup import CN_NODATA
+from cust_functions import hsg_index
+from zonal import breakdown_gdcode
+
+__author__ = "Abdul Raheem Siddiqui"
+__date__ = "2020-12-25"
+__copyright__ = "(C) 2020 by Abdul Raheem Siddiqui"
+
+# This will get replaced with a git SHA1 when you do a git archive
+
+__revision__ = "$Format:%H$"
+
+SOIL_FIELDS = ["MUSYM", "HYDGRPDCD", "MUNAME"]
+LAND_COVER_FIELDS = ["VALUE"]
+# soil polygons between cancel checks and progress updates, and overlay features
+# written to the sink at once
+OVERLAY_BATCH_SIZE = 100
+
+
+def prepared_engine(geometry: QgsGeometry):
+    """Geometry engine of geometry prepared for repeated predicates"""
+    engine = QgsGeometry.createGeometryEngine(geometry.constGet())
+    engine.prepareGeometry()
+    return engine
+
+
+def polygon_part(geometry: QgsGeometry):
+    """Polygonal part of an overlay result as multipolygon, None if there is none"""
+    if geometry.isNull() or geometry.isEmpty():
+        return None
+    if QgsWkbTypes.flatType(geometry.wkbType()) == QgsWkbTypes.GeometryCollection:
+        geometry = geometry.convertGeometryCollectionToSubclass(
+            QgsWkbTypes.PolygonGeometry
+        )
+        if geometry.isNull() or geometry.isEmpty():
+            return None
+    if geometry.type() != QgsWkbTypes.PolygonGeometry:
+        return None
+    geometry.convertToMultiType()
+    return geometry
+
+
+def clip_to_area(geometry: QgsGeometry, area_geometry, area_engine):
+    """Part of geometry inside the area, None when it is outside"""
+    if not area_engine.intersects(geometry.constGet()):
+        return None
+    if area_engine.contains(geometry.constGet()):
+        return geometry
+    return polygon_part(geometry.intersection(area_geometry))
+
+
+def overlay_fields(soil_layer, land_cover_layer) -> QgsFields:
+    """Fields of the overlay, soil MUSYM, HYDGRPDCD and MUNAME and land cover VALUE"""
+    fields = QgsFields()
+    for name in SOIL_FIELDS:
+        fields.append(soil_layer.fields().field(soil_layer.fields().lookupField(name)))
+    for name in LAND_COVER_FIELDS:
+        fields.append(
+            land_cover_layer.fields().field(land_cover_layer.fields().lookupField(name))
+        )
+    return fields
+
+
+def overlay_soil_land_cover(
+    soil_layer,
+    land_cover_layer,
+    area_geometry,
+    transform_context,
+    feedback=None,
+    sink=None,
+):
+    """Intersect soil polygons clipped to area geometry with land cover polygons in a
+    single pass, features with overlay_fields are written in the soil layer CRS to sink
+    in batches, a new memory layer if not given, returns the sink or memory layer, None
+    if canceled
+
+    Land cover polygons are bulk loaded in a spatial index, so every soil polygon is
+    only intersected with the land cover polygons its bounding box overlaps."""
+    fields = overlay_fields(soil_layer, land_cover_layer)
+    overlay_layer = None
+    if sink is None:
+        overlay_layer = QgsMemoryProviderUtils.createMemoryLayer(
+            "Soil Land Cover Overlay",
+            fields,
+            QgsWkbTypes.MultiPolygon,
+            soil_layer.crs(),
+        )
+        sink = overlay_layer.dataProvider()
+
+    land_cover_request = (
+        QgsFeatureRequest()
+        .setSubsetOfAttributes(LAND_COVER_FIELDS, land_cover_layer.fields())
+        .setDestinationCrs(soil_layer.crs(), transform_context)
+    )
+    land_cover_values = {
+        feat.id(): [feat[name] for name in LAND_COVER_FIELDS]
+        for feat in land_cover_layer.getFeatures(
+            QgsFeatureRequest(land_cover_request).setFlags(QgsFeatureRequest.NoGeometry)
+        )
+    }
+    # building the index from an iterator bulk loads it as an STR packed R-tree, the
+    # index keeps the only copy of the land cover geometries
+    index = QgsSpatialIndex(
+        land_cover_layer.getFeatures(
+            QgsFeatureRequest(land_cover_request).setNoAttributes()
+        ),
+        None,
+        QgsSpatialIndex.FlagStoreFeatureGeometries,
+    )
+    if feedback is not None and feedback.isCanceled():
+        return None
+
+    area_engine = prepared_engine(area_geometry)
+    area_box = area_geometry.boundingBox()
+    soil_request = (
+        QgsFeatureRequest()
+        .setSubsetOfAttributes(SOIL_FIELDS, soil_layer.fields())
+        .setFilterRect(area_box)
+    )
+    total = soil_layer.featureCount() or 1
+    overlay_features = []
+    for current, soil_feat in enumerate(soil_layer.getFeatures(soil_request)):
+        if current % OVERLAY_BATCH_SIZE == 0 and feedback is not None:
+            if feedback.isCanceled():
+                return None
+            feedback.setProgress(100 * current / total)
+        if not soil_feat.hasGeometry():
+            continue
+        soil_geometry = clip_to_area(soil_feat.geometry(), area_geometry, area_engine)
+        if soil_geometry is None:
+            continue
+        attributes = [soil_feat[name] for name in SOIL_FIELDS]
+
+        soil_engine = prepared_engine(soil_geometry)
+        for fid in index.intersects(soil_geometry.boundingBox()):
+            land_cover_geometry = index.geometry(fid)
+            if not soil_engine.intersects(land_cover_geometry.constGet()):
+                continue
+            if soil_engine.contains(land_cover_geometry.constGet()):
+                part = polygon_part(QgsGeometry(land_cover_geometry))
+            else:
+                part = polygon_part(soil_geometry.intersection(land_cover_geometry))
+            if part is None:
+                continue
+            overlay_feat = QgsFeature(fields)
+            overlay_feat.setGeometry(part)
+            overlay_feat.setAttributes(attributes + land_cover_values[fid])
+            overlay_features.append(overlay_feat)
+            if len(overlay_features) >= OVERLAY_BATCH_SIZE:
+                sink.addFeatures(overlay_features)
+                overlay_features = []
+
+    sink.addFeatures(overlay_features)
+    return sink if overlay_layer is None else overlay_layer
+
+
+def cn_fields(overlay_layer) -> QgsFields:
+    """Fields of the Curve Number layer, soil MUSYM, HYDGRPDCD and MUNAME of the
+    overlay and GDCode, NLCD_LU and CN"""
+    fields = QgsFields()
+    for name in SOIL_FIELDS:
+        fields.append(
+            overlay_layer.fields().field(overlay_layer.fields().lookupField(name))
+        )
+    fields.append(QgsField("GDCode", QVariant.String, len=5))
+    fields.append(QgsField("NLCD_LU", QVariant.Int, len=2))
+    fields.append(QgsField("CN", QVariant.Int, len=3))
+    return fields
+
+
+def cn_features(overlay_layer, fields, cn_lut, drained: bool):
+    """Get Curve Number features with cn_fields of overlay layer features, GDCode,
+    NLCD_LU and CN are looked up once per land cover and HSG"""
+    # (VALUE, HSG index) -> (GDCode, NLCD_LU, CN)
+    cn_attributes = {}
+    for feat in overlay_layer.getFeatures():
+        key = (
+            int(feat["VALUE"]),
+            hsg_index(feat["HYDGRPDCD"], feat["MUSYM"], feat["MUNAME"], drained),
+        )
+        if key not in cn_attributes:
+            cn_value = int(cn_lut[key])
+            cn_attributes[key] = (
+                breakdown_gdcode(*key),
+                key[0],
+                None if cn_value == CN_NODATA else cn_value,
+            )
+        cn_feat = QgsFeature(fields)
+        cn_feat.setGeometry(feat.geometry())
+        cn_feat.setAttributes(
+            [feat[name] for name in SOIL_FIELDS] + list(cn_attributes[key])
+        )
+        yield cn_feat
@@ -0,0 +1,281 @@
+# -*- coding: utf-8 -*-
+
+"""
+/***************************************************************************
+ CurveNumberGenerator
+                                 A QGIS plugin
+ This plugin generates a Curve Number layer for the given Area of Interest within the contiguous United States. It can also download Soil and Land Cover datasets for the same area.
+ Generated by Plugin Builder: http://g-sherman.github.io/Qgis-Plugin-Builder/
+                              -------------------
+        begin                : 2020-06-06
+        copyright            : (C) 2020 by Abdul Raheem Siddiqui
+        email                : mailto:ars.work.ce@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+__author__ = "Abdul Raheem Siddiqui"
+__date__ = "2020-12-25"
+__copyright__ = "(C) 2020 by Abdul Raheem Siddiqui"
+
+# This will get replaced with a git SHA1 when you do a git archive
+
+__revision__ = "$Format:%H$"
+
+# weight of the latest measured duration when updating stage costs
+COST_SMOOTHING = 0.5
+# stage values kept by a StageMemo
+STAGE_MEMO_SIZE = 32
+
+
+class Stage:
+    """Named pipeline step computed from the values of the stages it requires
+
+    Threadsafe stages may run on a worker thread concurrently with other stages,
+    the others run one at a time on the thread calling Pipeline.run. Values of
+    memoized stages are reused from a StageMemo while key, the parameters the
+    stage depends on, and the keys of the required stages are unchanged.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        function,
+        requires: tuple = (),
+        threadsafe: bool = False,
+        cost: float = 1.0,
+        key=(),
+        memoize: bool = False,
+    ):
+        self.name = name
+        self.function = function
+        self.requires = tuple(requires)
+        self.threadsafe = threadsafe
+        self.cost = cost
+        self.key = key
+        self.memoize = memoize
+
+
+class StageMemo:
+    """Least recently used cache of stage values by stage key, shared between runs"""
+
+    def __init__(self, size: int = STAGE_MEMO_SIZE):
+        self.size = size
+        self.values = OrderedDict()
+        self.lock = threading.Lock()
+
+    def __contains__(self, key):
+        with self.lock:
+            return key in self.values
+
+    def get(self, key):
+        with self.lock:
+            self.values.move_to_end(key)
+            return self.values[key]
+
+    def put(self, key, value):
+        with self.lock:
+            self.values[key] = value
+            self.values.move_to_end(key)
+            while len(self.values) > self.size:
+                self.values.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.values.clear()
+
+
+class Pipeline:
+    """Dependency graph of stages, runs only what the requested targets need"""
+
+    def __init__(self, stages: list):
+        self.stages = {stage.name: stage for stage in stages}
+        # measured wall time of stages of the last run in seconds
+        self.durations = {}
+        # stages of the last run reused from the memo
+        self.reused = []
+
+    def keys(self) -> dict:
+        """Get key of every stage from its own key and the keys of required stages"""
+        keys = {}
+
+        def key(name):
+            if name not in keys:
+                stage = self.stages[name]
+                keys[name] = hashlib.sha256(
+                    repr(
+                        (
+                            name,
+                            stage.key,
+                            [key(required) for required in stage.requires],
+                        )
+                    ).encode("utf-8")
+                ).hexdigest()
+            return keys[name]
+
+        for name in self.plan(self.stages):
+            key(name)
+        return keys
+
+    def plan(self, targets, reused=()) -> list:
+        """Get names of stages needed for targets in dependency order, requirements of
+        reused stages are not needed"""
+        order = []
+        visiting = set()
+
+        def visit(name):
+            if name in order:
+                return
+            if name not in self.stages:
+                raise ValueError("Unknown pipeline stage: " + name)
+            if name in visiting:
+                raise ValueError("Pipeline stage depends on itself: " + name)
+            visiting.add(name)
+            for required in () if name in reused else self.stages[name].requires:
+                visit(required)
+            visiting.discard(name)
+            order.append(name)
+
+        for target in targets:
+            visit(target)
+        return order
+
+    def run(
+        self,
+        targets,
+        feedback=None,
+        max_workers: int = 2,
+        costs: dict = None,
+        stage_feedback=None,
+        profiler=None,
+        memo: StageMemo = None,
+        copy=None,
+    ) -> dict:
+        """Run stages needed for targets, returns {stage name: value}
+
+        Each stage function is called with a dict of the values of its required
+        stages and a feedback. stage_feedback(on_progress) creates the feedback of
+        a stage, which must call on_progress with its 0-100 progress. Overall
+        progress is weighted by costs, {stage name: seconds}, falling back to
+        Stage.cost. Stages are run through profiler.run when a profiler is given.
+        Values of memoized stages are taken from and put into memo through
+        copy(value), so values tied to a run can be detached from and attached to it.
+        """
+        copy = copy or (lambda value: value)
+        keys = {} if memo is None else self.keys()
+        reused = {
+            name
+            for name, stage in self.stages.items()
+            if memo is not None and stage.memoize and keys[name] in memo
+        }
+        pending = self.plan(targets, reused)
+        values = {}
+        self.reused = [name for name in pending if name in reused]
+        for name in self.reused:
+            pending.remove(name)
+            values[name] = copy(memo.get(keys[name]))
+            if feedback is not None:
+                feedback.pushInfo(
+                    "Reusing result of stage " + name + " of an earlier run"
+                )
+        costs = costs or {}
+        weights = {
+            name: max(costs.get(name, self.stages[name].cost), 1e-3) for name in pending
+        }
+        total = sum(weights.values()) or 1
+        stage_progress = {name: 0.0 for name in pending}
+
+        def on_progress(name):
+            def report(progress):
+                stage_progress[name] = min(max(progress, 0), 100) / 100
+                if feedback is not None:
+                    feedback.setProgress(
+                        100
+                        * sum(
+                            weights[stage] * stage_progress[stage] for stage in weights
+                        )
+                        / total
+                    )
+
+            return report
+
+        def run_stage(name):
+            stage = self.stages[name]
+            report = on_progress(name)
+            start = time.perf_counter()
+            inputs = {required: values[required] for required in stage.requires}
+            current_feedback = (
+                feedback if stage_feedback is None else stage_feedback(report)
+            )
+            if profiler is None:
+                value = stage.function(inputs, current_feedback)
+            else:
+                value = profiler.run(stage, inputs, current_feedback)
+            self.durations[name] = time.perf_counter() - start
+            report(100)
+            return value
+
+        def finish(name, value):
+            values[name] = value
+            if memo is None or not self.stages[name].memoize:
+                return
+            # results of canceled stages may be incomplete
+            if feedback is not None and feedback.isCanceled():
+                return
+            memo.put(keys[name], copy(value))
+
+        running = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            try:
+                while pending or running:
+                    if feedback is not None and feedback.isCanceled():
+                        break
+                    ready = [
+                        name
+                        for name in pending
+                        if all(
+                            required in values
+                            for required in self.stages[name].requires
+                        )
+                    ]
+                    for name in ready:
+                        if self.stages[name].threadsafe:
+                            pending.remove(name)
+                            running[executor.submit(run_stage, name)] = name
+                    inline = [name for name in ready if name in pending]
+                    if inline:
+                        pending.remove(inline[0])
+                        finish(inline[0], run_stage(inline[0]))
+                        continue
+                    if not running:
+                        break
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        finish(running.pop(future), future.result())
+            finally:
+                for future in running:
+                    future.cancel()
+        return values
+
+
+def update_costs(costs: dict, durations: dict) -> dict:
+    """Blend measured stage durations into stage costs"""
+    updated = dict(costs)
+    for name, duration in durations.items():
+        if name in updated:
+            duration = COST_SMOOTHING * duration + (1 - COST_SMOOTHING) * updated[name]
+        updated[name] = duration
+    return updated
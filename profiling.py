@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+
+"""
+/***************************************************************************
+ CurveNumberGenerator
+                                 A QGIS plugin
+ This plugin generates a Curve Number layer for the given Area of Interest within the contiguous United States. It can also download Soil and Land Cover datasets for the same area.
+ Generated by Plugin Builder: http://g-sherman.github.io/Qgis-Plugin-Builder/
+                              -------------------
+        begin                : 2020-06-06
+        copyright            : (C) 2020 by Abdul Raheem Siddiqui
+        email                : mailto:ars.work.ce@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+import cProfile
+import json
+import sys
+import threading
+import time
+import tracemalloc
+
+from network import bytes_received
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+__author__ = "Abdul Raheem Siddiqui"
+__date__ = "2020-12-25"
+__copyright__ = "(C) 2020 by Abdul Raheem Siddiqui"
+
+# This will get replaced with a git SHA1 when you do a git archive
+
+__revision__ = "$Format:%H$"
+
+
+def peak_rss_mb():
+    """Peak resident set size of the process in MB, None where unknown"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes elsewhere
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / (1 << 10)
+
+
+def children_cpu_seconds():
+    """CPU time of finished child processes such as GDAL utilities, None where unknown"""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def difference(end, start):
+    return None if end is None or start is None else end - start
+
+
+class Profiler:
+    """Record wall time, CPU time, memory, downloaded bytes and counts of pipeline
+    stages
+
+    measure(value) gives the feature or pixel count of a stage value, or None.
+    The stage named cprofile_stage is run under cProfile and its statistics are
+    dumped to cprofile_path. Python allocations are only recorded when
+    tracemalloc is tracing, e.g. with PYTHONTRACEMALLOC=1. Process wide figures,
+    peak RSS, child CPU time and downloaded bytes, include stages running at the
+    same time.
+    """
+
+    def __init__(self, measure=None, cprofile_stage=None, cprofile_path=None):
+        self.measure = measure
+        self.cprofile_stage = cprofile_stage
+        self.cprofile_path = cprofile_path
+        self.stages = {}
+        self.lock = threading.Lock()
+        self.start = time.perf_counter()
+
+    def run(self, stage, inputs: dict, feedback):
+        """Run stage function with inputs and feedback, recording its profile"""
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            traced_start = tracemalloc.get_traced_memory()[0]
+        rss_start = peak_rss_mb()
+        children_start = children_cpu_seconds()
+        bytes_start = bytes_received()
+        cpu_start = time.thread_time()
+        wall_start = time.perf_counter()
+
+        if stage.name == self.cprofile_stage:
+            profile = cProfile.Profile()
+            value = profile.runcall(stage.function, inputs, feedback)
+            profile.dump_stats(self.cprofile_path)
+        else:
+            value = stage.function(inputs, feedback)
+
+        record = {
+            "started": wall_start - self.start,
+            "wall_seconds": time.perf_counter() - wall_start,
+            "cpu_seconds": time.thread_time() - cpu_start,
+            "children_cpu_seconds": difference(children_cpu_seconds(), children_start),
+            "peak_rss_growth_mb": difference(peak_rss_mb(), rss_start),
+            "python_allocated_mb": (
+                (tracemalloc.get_traced_memory()[0] - traced_start) / (1 << 20)
+                if tracing
+                else None
+            ),
+            "downloaded_mb": (bytes_received() - bytes_start) / (1 << 20),
+            "input_count": None,
+            "output_count": None,
+        }
+        with self.lock:
+            input_counts = [
+                self.stages[required]["output_count"]
+                for required in stage.requires
+                if required in self.stages
+            ]
+        if input_counts and None not in input_counts:
+            record["input_count"] = sum(input_counts)
+        if self.measure is not None:
+            record["output_count"] = self.measure(value)
+        with self.lock:
+            self.stages[stage.name] = record
+        return value
+
+    def report(self) -> dict:
+        """Profile of all recorded stages"""
+        with self.lock:
+            stages = dict(self.stages)
+        return {
+            "wall_seconds": time.perf_counter() - self.start,
+            "peak_rss_mb": peak_rss_mb(),
+            "stages": stages,
+        }
+
+    def write(self, path: str) -> str:
+        with open(path, "w") as profile_file:
+            json.dump(self.report(), profile_file, indent=2)
+        return path
+
+    def summary(self) -> list:
+        """One line per stage, slowest first"""
+        lines = []
+        for name, record in sorted(
+            self.report()["stages"].items(), key=lambda item: -item[1]["wall_seconds"]
+        ):
+            line = "{}: {:.2f} s wall, {:.2f} s CPU".format(
+                name, record["wall_seconds"], record["cpu_seconds"]
+            )
+            if record["downloaded_mb"]:
+                line += ", {:.1f} MB downloaded".format(record["downloaded_mb"])
+            if record["peak_rss_growth_mb"]:
+                line += ", peak RSS +{:.0f} MB".format(record["peak_rss_growth_mb"])
+            if record["output_count"] is not None:
+                line += ", {} out".format(record["output_count"])
+            lines.append(line)
+        return lines
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+
+"""
+/***************************************************************************
+ CurveNumberGenerator
+                                 A QGIS plugin
+ This plugin generates a Curve Number layer for the given Area of Interest within the contiguous United States. It can also download Soil and Land Cover datasets for the same area.
+ Generated by Plugin Builder: http://g-sherman.github.io/Qgis-Plugin-Builder/
+                              -------------------
+        begin                : 2020-06-06
+        copyright            : (C) 2020 by Abdul Raheem Siddiqui
+        email                : mailto:ars.work.ce@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+import numpy as np
+from osgeo import gdal, ogr, osr
+
+from cn_lookup import CN_NODATA
+from cog import write_cog
+from cust_functions import HSG_NO_SOIL, hsg_index
+
+__author__ = "Abdul Raheem Siddiqui"
+__date__ = "2020-12-25"
+__copyright__ = "(C) 2020 by Abdul Raheem Siddiqui"
+
+# This will get replaced with a git SHA1 when you do a git archive
+
+__revision__ = "$Format:%H$"
+
+
+def rasterize_values(
+    features, srs, reference_ds, data_type=gdal.GDT_Byte
+) -> np.ndarray:
+    """Rasterize (value, WKB geometry) features in srs on the pixel grid of reference
+    dataset, 0 where there is no feature"""
+    value_ds = gdal.GetDriverByName("MEM").Create(
+        "", reference_ds.RasterXSize, reference_ds.RasterYSize, 1, data_type
+    )
+    value_ds.SetGeoTransform(reference_ds.GetGeoTransform())
+    value_ds.SetProjection(reference_ds.GetProjection())
+
+    vector_ds = ogr.GetDriverByName("Memory").CreateDataSource("values")
+    vector_layer = vector_ds.CreateLayer("values", srs, ogr.wkbMultiPolygon)
+    vector_layer.CreateField(ogr.FieldDefn("VALUE", ogr.OFTInteger))
+
+    for value, wkb in features:
+        # raster is initialized with 0 which already means no feature
+        if value == 0:
+            continue
+        feat = ogr.Feature(vector_layer.GetLayerDefn())
+        feat.SetField("VALUE", value)
+        feat.SetGeometry(ogr.CreateGeometryFromWkb(wkb))
+        vector_layer.CreateFeature(feat)
+
+    # features in another srs are transformed to the raster srs
+    gdal.RasterizeLayer(value_ds, [1], vector_layer, options=["ATTRIBUTE=VALUE"])
+    return value_ds.GetRasterBand(1).ReadAsArray()
+
+
+def rasterize_hsg(hsg_features, srs, reference_ds) -> np.ndarray:
+    """Rasterize (HSG index, WKB geometry) features in srs on the pixel grid of reference
+    dataset, HSG_NO_SOIL where no soil polygon covers a pixel"""
+    # burned shifted by one as 0 is left for pixels without a feature
+    burned = rasterize_values(
+        ((hsg + 1, wkb) for hsg, wkb in hsg_features), srs, reference_ds
+    )
+    return np.where(burned == 0, HSG_NO_SOIL, burned - 1).astype(np.uint8)
+
+
+def burn_zones(zone_features: list, reference_ds) -> np.ndarray:
+    """Rasterize zone ids, the 1 based position of each of zone features, on the pixel
+    grid of reference dataset"""
+    srs = osr.SpatialReference()
+    srs.ImportFromWkt(reference_ds.GetProjection())
+    return rasterize_values(
+        (
+            (zone, bytes(feat.geometry().asWkb()))
+            for zone, feat in enumerate(zone_features, 1)
+            if feat.hasGeometry()
+        ),
+        srs,
+        reference_ds,
+        gdal.GDT_UInt32,
+    )
+
+
+def layer_hsg_features(soil_layer, drained: bool):
+    """Get (HSG index, WKB geometry) of soil layer features"""
+    for soil_feat in soil_layer.getFeatures():
+        if soil_feat.hasGeometry():
+            yield (
+                hsg_index(
+                    soil_feat["HYDGRPDCD"],
+                    soil_feat["MUSYM"],
+                    soil_feat["MUNAME"],
+                    drained,
+                ),
+                bytes(soil_feat.geometry().asWkb()),
+            )
+
+
+def lookup_cn(nlcd: np.ndarray, nodata, hsg: np.ndarray, lut: np.ndarray) -> np.ndarray:
+    """Look up CN of NLCD code and HSG index arrays, CN_NODATA where NLCD is invalid or
+    there is no soil"""
+    valid = (nlcd >= 0) & (nlcd < lut.shape[0]) & (hsg != HSG_NO_SOIL)
+    if nodata is not None:
+        valid &= nlcd != nodata
+    nlcd_codes = np.where(valid, nlcd, 0).astype(np.uint8)
+    hsg_indices = np.where(valid, hsg, 0).astype(np.uint8)
+    return np.where(valid, lut[nlcd_codes, hsg_indices], CN_NODATA).astype(np.uint8)
+
+
+def write_cn_raster(reference_ds, cn: np.ndarray, output_path: str) -> str:
+    """Write CN array on the pixel grid of reference dataset as UInt8 Cloud Optimized
+    GeoTIFF"""
+    cn_ds = gdal.GetDriverByName("MEM").Create(
+        "", reference_ds.RasterXSize, reference_ds.RasterYSize, 1, gdal.GDT_Byte
+    )
+    cn_ds.SetGeoTransform(reference_ds.GetGeoTransform())
+    cn_ds.SetProjection(reference_ds.GetProjection())
+    cn_band = cn_ds.GetRasterBand(1)
+    cn_band.SetNoDataValue(CN_NODATA)
+    cn_band.WriteArray(cn)
+    return write_cog(cn_ds, output_path)
+
+
+def compute_cn_grid(nlcd_path: str, hsg_features, lut: np.ndarray, srs=None) -> tuple:
+    """Compute per pixel CN from NLCD raster and (HSG index, WKB geometry) soil features
+    in srs, the NLCD crs if not given, returns (NLCD, NLCD nodata, HSG index, CN) arrays
+    on the NLCD grid"""
+    nlcd_ds = gdal.Open(nlcd_path)
+    nlcd_band = nlcd_ds.GetRasterBand(1)
+    nlcd = nlcd_band.ReadAsArray()
+    nodata = nlcd_band.GetNoDataValue()
+    if srs is None:
+        srs = osr.SpatialReference()
+        srs.ImportFromWkt(nlcd_ds.GetProjection())
+    hsg = rasterize_hsg(hsg_features, srs, nlcd_ds)
+    return nlcd, nodata, hsg, lookup_cn(nlcd, nodata, hsg, lut)
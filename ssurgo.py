@@ -0,0 +1,694 @@
+# -*- coding: utf-8 -*-
+
+"""
+/***************************************************************************
+ CurveNumberGenerator
+                                 A QGIS plugin
+ This plugin generates a Curve Number layer for the given Area of Interest within the contiguous United States. It can also download Soil and Land Cover datasets for the same area.
+ Generated by Plugin Builder: http://g-sherman.github.io/Qgis-Plugin-Builder/
+                              -------------------
+        begin                : 2020-06-06
+        copyright            : (C) 2020 by Abdul Raheem Siddiqui
+        email                : mailto:ars.work.ce@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+import codecs
+import json
+import math
+import queue
+import re
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from network import iter_chunks, request
+
+__author__ = "Abdul Raheem Siddiqui"
+__date__ = "2020-12-25"
+__copyright__ = "(C) 2020 by Abdul Raheem Siddiqui"
+
+# This will get replaced with a git SHA1 when you do a git archive
+
+__revision__ = "$Format:%H$"
+
+SDA_URL = "https://sdmdataaccess.sc.egov.usda.gov/TABULAR/post.rest"
+SDA_WFS_URL = "https://sdmdataaccess.sc.egov.usda.gov/Spatial/SDMWGS84GEOGRAPHIC.wfs"
+# width and height of the SDA query and cache tile grid in degrees
+SDA_TILE_SIZE = 0.1
+# how many times a failing tile is split into quadrants before giving up
+SDA_MAX_SPLIT_DEPTH = 4
+# rows buffered between download threads and the consumer
+SDA_QUEUE_SIZE = 10000
+# rows written to the soil cache or soil layer per batch
+SOIL_BATCH_SIZE = 5000
+# map unit keys per muaggatt query
+SDA_MUKEY_CHUNK = 1000
+# vertices of the area of interest geometry sent to SDA
+SDA_MAX_VERTICES = 500
+
+# muaggatt columns followed by mupolygon columns, in the order returned by SDA
+SOIL_ATTRIBUTES = [
+    {"name": "musym", "type": "str"},
+    {"name": "muname", "type": "str"},
+    {"name": "mustatus", "type": "str"},
+    {"name": "slopegraddcp", "type": "str"},
+    {"name": "slopegradwta", "type": "str"},
+    {"name": "brockdepmin", "type": "str"},
+    {"name": "wtdepannmin", "type": "str"},
+    {"name": "wtdepaprjunmin", "type": "str"},
+    {"name": "flodfreqdcd", "type": "str"},
+    {"name": "flodfreqmax", "type": "str"},
+    {"name": "pondfreqprs", "type": "str"},
+    {"name": "aws025wta", "type": "str"},
+    {"name": "aws050wta", "type": "str"},
+    {"name": "aws0100wta", "type": "str"},
+    {"name": "aws0150wta", "type": "str"},
+    {"name": "drclassdcd", "type": "str"},
+    {"name": "drclasswettest", "type": "str"},
+    {"name": "hydgrpdcd", "type": "str"},
+    {"name": "iccdcd", "type": "str"},
+    {"name": "iccdcdpct", "type": "str"},
+    {"name": "niccdcd", "type": "str"},
+    {"name": "niccdcdpct", "type": "str"},
+    {"name": "engdwobdcd", "type": "str"},
+    {"name": "engdwbdcd", "type": "str"},
+    {"name": "engdwbll", "type": "str"},
+    {"name": "engdwbml", "type": "str"},
+    {"name": "engstafdcd", "type": "str"},
+    {"name": "engstafll", "type": "str"},
+    {"name": "engstafml", "type": "str"},
+    {"name": "engsldcd", "type": "str"},
+    {"name": "engsldcp", "type": "str"},
+    {"name": "englrsdcd", "type": "str"},
+    {"name": "engcmssdcd", "type": "str"},
+    {"name": "engcmssmp", "type": "str"},
+    {"name": "urbrecptdcd", "type": "str"},
+    {"name": "urbrecptwta", "type": "str"},
+    {"name": "forpehrtdcp", "type": "str"},
+    {"name": "hydclprs", "type": "str"},
+    {"name": "awmmfpwwta", "type": "str"},
+    {"name": "mukey", "type": "str"},
+    {"name": "mupolygonkey", "type": "str"},
+    {"name": "areasymbol", "type": "str"},
+    {"name": "nationalmusym", "type": "str"},
+]
+# columns coming from mupolygon instead of muaggatt
+MUPOLYGON_COLUMNS = ("mupolygonkey", "areasymbol", "nationalmusym")
+# muaggatt columns used to calculate curve number
+CN_SOIL_COLUMNS = ("musym", "muname", "hydgrpdcd")
+# columns of lean CN only soil rows, keys are kept for de-duplication and caching
+CN_SOIL_ATTRIBUTES = [
+    attr
+    for attr in SOIL_ATTRIBUTES
+    if attr["name"] in CN_SOIL_COLUMNS + ("mukey", "mupolygonkey", "areasymbol")
+]
+
+# bumped whenever the layout of the cache changes, older caches are dropped
+SOIL_CACHE_VERSION = 3
+SOIL_CACHE_TABLES = (
+    "muaggatt",
+    "mupolygon",
+    "mupolygon_rtree",
+    "tile",
+    "tile_areasymbol",
+    "sacatalog",
+)
+SOIL_CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS muaggatt (
+    mukey TEXT PRIMARY KEY,
+    lean INTEGER,
+    attributes TEXT
+);
+CREATE TABLE IF NOT EXISTS mupolygon (
+    id INTEGER PRIMARY KEY,
+    mupolygonkey TEXT UNIQUE,
+    mukey TEXT,
+    areasymbol TEXT,
+    nationalmusym TEXT,
+    geometry TEXT
+);
+CREATE INDEX IF NOT EXISTS mupolygon_areasymbol ON mupolygon (areasymbol);
+CREATE VIRTUAL TABLE IF NOT EXISTS mupolygon_rtree USING rtree (id, minx, maxx, miny, maxy);
+CREATE TABLE IF NOT EXISTS tile (
+    col INTEGER,
+    row INTEGER,
+    lean INTEGER,
+    PRIMARY KEY (col, row)
+);
+CREATE TABLE IF NOT EXISTS tile_areasymbol (col INTEGER, row INTEGER, areasymbol TEXT);
+CREATE INDEX IF NOT EXISTS tile_areasymbol_areasymbol ON tile_areasymbol (areasymbol);
+CREATE TABLE IF NOT EXISTS sacatalog (areasymbol TEXT PRIMARY KEY, saverest TEXT);
+"""
+
+
+def bbox_wkt(bbox: tuple) -> str:
+    """Get WKT polygon of (xmin, ymin, xmax, ymax) bbox"""
+    xmin, ymin, xmax, ymax = bbox
+    return "polygon(({0} {1}, {2} {1}, {2} {3}, {0} {3}, {0} {1}))".format(
+        xmin, ymin, xmax, ymax
+    )
+
+
+def wkt_bounds(wkt: str) -> tuple:
+    """Get (xmin, ymin, xmax, ymax) of WKT geometry"""
+    coords = [
+        float(coord) for coord in re.findall(r"-?\d+(?:\.\d*)?(?:[eE][-+]?\d+)?", wkt)
+    ]
+    xs = coords[0::2]
+    ys = coords[1::2]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def sda_wfs_url(bbox: tuple) -> str:
+    """WFS GetFeature URL of SSURGO polygons in WGS84 bbox, coordinates come as y, x"""
+    return (
+        SDA_WFS_URL
+        + "?SERVICE=WFS&VERSION=1.1.0&REQUEST=GetFeature&TYPENAME=mapunitpolyextended"
+        "&SRSNAME=EPSG:4326&BBOX=" + ",".join(str(coord) for coord in bbox)
+    )
+
+
+def soil_tiles(bbox: tuple, tile_size: float = SDA_TILE_SIZE) -> list:
+    """Get grid aligned tiles covering bbox, returns list of (col, row, tile bbox)"""
+    xmin, ymin, xmax, ymax = bbox
+    col_min = math.floor(xmin / tile_size)
+    col_max = max(math.ceil(xmax / tile_size), col_min + 1)
+    row_min = math.floor(ymin / tile_size)
+    row_max = max(math.ceil(ymax / tile_size), row_min + 1)
+    return [
+        (
+            col,
+            row,
+            (
+                col * tile_size,
+                row * tile_size,
+                (col + 1) * tile_size,
+                (row + 1) * tile_size,
+            ),
+        )
+        for row in range(row_min, row_max)
+        for col in range(col_min, col_max)
+    ]
+
+
+def quadrants(bbox: tuple) -> list:
+    """Split bbox into its four quadrants"""
+    xmin, ymin, xmax, ymax = bbox
+    xmid = (xmin + xmax) / 2
+    ymid = (ymin + ymax) / 2
+    return [
+        (xmin, ymin, xmid, ymid),
+        (xmid, ymin, xmax, ymid),
+        (xmin, ymid, xmid, ymax),
+        (xmid, ymid, xmax, ymax),
+    ]
+
+
+def soil_attributes(lean: bool = False) -> list:
+    """Get attributes of soil rows, only CN columns and keys if lean"""
+    return CN_SOIL_ATTRIBUTES if lean else SOIL_ATTRIBUTES
+
+
+def polygon_columns(lean: bool = False) -> list:
+    """Get mupolygon columns of soil polygon rows, the WKT geometry follows them"""
+    return ["mukey", "mupolygonkey", "areasymbol"] + ([] if lean else ["nationalmusym"])
+
+
+def muaggatt_columns(lean: bool = False) -> list:
+    """Get muaggatt columns of soil rows including mukey"""
+    return [
+        attr["name"]
+        for attr in soil_attributes(lean)
+        if attr["name"] not in MUPOLYGON_COLUMNS
+    ]
+
+
+def sda_polygon_query(wkt: str, lean: bool = False) -> str:
+    """SQL to get soil polygons with their map unit key intersecting WGS84 WKT"""
+    return (
+        "select "
+        + ", ".join("M." + column for column in polygon_columns(lean))
+        + ", M.mupolygongeo from mupolygon M where M.mupolygonkey in "
+        "(select * from SDA_Get_Mupolygonkey_from_intersection_with_WktWgs84('"
+        + wkt.lower()
+        + "'))"
+    )
+
+
+def sda_muaggatt_query(mukeys: list, lean: bool = False) -> str:
+    """SQL to get aggregated attributes of map units"""
+    return (
+        "select "
+        + ", ".join(muaggatt_columns(lean))
+        + " from muaggatt where mukey in ("
+        + ", ".join("'" + mukey.replace("'", "''") + "'" for mukey in mukeys)
+        + ")"
+    )
+
+
+def iter_table_rows(chunks, encoding: str = "utf-8"):
+    """Incrementally parse rows of the "Table" array of an SDA JSON response"""
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder(encoding)()
+    buffer = ""
+    in_table = False
+    for chunk in chunks:
+        buffer += text_decoder.decode(chunk)
+        if not in_table:
+            table = buffer.find('"Table"')
+            start = buffer.find("[", table) if table >= 0 else -1
+            if start < 0:
+                continue
+            buffer = buffer[start + 1 :]
+            in_table = True
+        position = 0
+        while True:
+            while position < len(buffer) and buffer[position] in " \t\r\n,":
+                position += 1
+            if position == len(buffer):
+                break
+            if buffer[position] == "]":
+                return
+            try:
+                row, position = decoder.raw_decode(buffer, position)
+            except ValueError:
+                # row is not complete yet, wait for more data
+                break
+            yield row
+        buffer = buffer[position:]
+    if in_table:
+        raise ValueError("Incomplete SDA response")
+
+
+def post_sda_rows(query: str):
+    """Run query on Soil Data Access and stream result rows"""
+    # SDA reports invalid queries and result size limits with status 500, these are
+    # not retried so the tile can be split instead
+    response = request(
+        "POST",
+        SDA_URL,
+        retry_statuses=(429, 502, 503, 504),
+        stream=True,
+        json={"format": "JSON", "query": query},
+    )
+    # SDA returns an empty body when nothing intersects
+    with response:
+        yield from iter_table_rows(iter_chunks(response, 1 << 20))
+
+
+def post_sda(query: str) -> list:
+    """Run query on Soil Data Access and return result rows"""
+    return list(post_sda_rows(query))
+
+
+def survey_area_versions(areasymbols: list) -> dict:
+    """Get current publication version (saverest) of survey areas"""
+    if not areasymbols:
+        return {}
+    query = (
+        "select areasymbol, saverest from sacatalog where areasymbol in ("
+        + ", ".join(
+            "'" + areasymbol.replace("'", "''") + "'" for areasymbol in areasymbols
+        )
+        + ")"
+    )
+    return {areasymbol: saverest for areasymbol, saverest in post_sda(query)}
+
+
+def fetch_muaggatt(mukeys, lean: bool = False) -> dict:
+    """Get aggregated attributes of map units, returns {mukey: {column: value}}"""
+    columns = muaggatt_columns(lean)
+    mukeys = sorted(mukeys)
+    lookup = {}
+    for start in range(0, len(mukeys), SDA_MUKEY_CHUNK):
+        query = sda_muaggatt_query(mukeys[start : start + SDA_MUKEY_CHUNK], lean)
+        for row in post_sda_rows(query):
+            attributes = dict(zip(columns, row))
+            lookup[attributes["mukey"]] = attributes
+    return lookup
+
+
+def join_soil_rows(polygons: list, lookup: dict, lean: bool = False):
+    """Join soil polygon rows with map unit attributes, fetching unknown map units into lookup"""
+    lookup.update(
+        fetch_muaggatt({polygon[0] for polygon in polygons} - lookup.keys(), lean)
+    )
+    polygon_index = {
+        column: index for index, column in enumerate(polygon_columns(lean))
+    }
+    names = [attr["name"] for attr in soil_attributes(lean)]
+    for polygon in polygons:
+        muaggatt = lookup.get(polygon[0])
+        # SDA joins polygons and map units with an inner join too
+        if muaggatt is None:
+            continue
+        yield [
+            polygon[polygon_index[name]] if name in polygon_index else muaggatt[name]
+            for name in names
+        ] + [polygon[-1]]
+
+
+class SoilCache:
+    """SQLite cache of SSURGO polygons and muaggatt attributes with an R*Tree spatial index
+
+    Coverage is tracked per SDA tile so a tile is either fully cached or fetched again, and
+    every survey area in the cache is stored with the version it was published under.
+    """
+
+    def __init__(self, path: str):
+        self.connection = sqlite3.connect(path, timeout=60)
+        with self.connection:
+            version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+            if version != SOIL_CACHE_VERSION:
+                for table in SOIL_CACHE_TABLES:
+                    self.connection.execute("DROP TABLE IF EXISTS " + table)
+                self.connection.execute(
+                    "PRAGMA user_version = " + str(SOIL_CACHE_VERSION)
+                )
+        self.connection.executescript(SOIL_CACHE_SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def survey_areas(self, tiles: list) -> dict:
+        """Get cached versions of survey areas present in tiles"""
+        versions = {}
+        for col, row, _ in tiles:
+            for areasymbol, saverest in self.connection.execute(
+                "SELECT s.areasymbol, s.saverest FROM tile_areasymbol t "
+                "JOIN sacatalog s ON s.areasymbol = t.areasymbol "
+                "WHERE t.col = ? AND t.row = ?",
+                (col, row),
+            ):
+                versions[areasymbol] = saverest
+        return versions
+
+    def invalidate(self, areasymbols: list):
+        """Drop survey areas and coverage of every tile they appear in"""
+        with self.connection:
+            for areasymbol in areasymbols:
+                params = (areasymbol,)
+                self.connection.execute(
+                    "DELETE FROM tile WHERE (col, row) IN "
+                    "(SELECT col, row FROM tile_areasymbol WHERE areasymbol = ?)",
+                    params,
+                )
+                self.connection.execute(
+                    "DELETE FROM tile_areasymbol WHERE (col, row) NOT IN "
+                    "(SELECT col, row FROM tile)"
+                )
+                self.connection.execute(
+                    "DELETE FROM mupolygon_rtree WHERE id IN "
+                    "(SELECT id FROM mupolygon WHERE areasymbol = ?)",
+                    params,
+                )
+                self.connection.execute(
+                    "DELETE FROM muaggatt WHERE mukey IN "
+                    "(SELECT mukey FROM mupolygon WHERE areasymbol = ?)",
+                    params,
+                )
+                self.connection.execute(
+                    "DELETE FROM mupolygon WHERE areasymbol = ?", params
+                )
+                self.connection.execute(
+                    "DELETE FROM sacatalog WHERE areasymbol = ?", params
+                )
+
+    def covered_tiles(self, tiles: list, lean: bool = False) -> set:
+        """Get (col, row) of tiles that are fully cached, with all attributes unless lean"""
+        return {
+            (col, row)
+            for col, row, _ in tiles
+            if self.connection.execute(
+                "SELECT 1 FROM tile WHERE col = ? AND row = ? AND lean <= ?",
+                (col, row, int(lean)),
+            ).fetchone()
+        }
+
+    def add_polygons(self, polygons: list, lean: bool = False):
+        """Store a batch of soil polygon rows with polygon_columns(lean)"""
+        with self.connection:
+            for polygon in polygons:
+                self.add_polygon(dict(zip(polygon_columns(lean), polygon)), polygon[-1])
+
+    def missing_mukeys(self, mukeys, lean: bool = False) -> set:
+        """Get map units whose attributes are not cached, or cached lean if not lean"""
+        missing = set()
+        for mukey in mukeys:
+            cached = self.connection.execute(
+                "SELECT lean FROM muaggatt WHERE mukey = ?", (mukey,)
+            ).fetchone()
+            if cached is None or cached[0] > int(lean):
+                missing.add(mukey)
+        return missing
+
+    def add_muaggatt(self, lookup: dict, lean: bool = False):
+        """Store map unit attributes from {mukey: {column: value}}"""
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO muaggatt (mukey, lean, attributes) "
+                "VALUES (?, ?, ?)",
+                [
+                    (mukey, int(lean), json.dumps(attributes))
+                    for mukey, attributes in lookup.items()
+                ],
+            )
+
+    def add_tiles(self, tile_areasymbols: dict, versions: dict, lean: bool = False):
+        """Mark fetched tiles as covered with the survey areas present in them"""
+        with self.connection:
+            for (col, row), areasymbols in tile_areasymbols.items():
+                self.connection.execute(
+                    "DELETE FROM tile_areasymbol WHERE col = ? AND row = ?", (col, row)
+                )
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO tile (col, row, lean) VALUES (?, ?, ?)",
+                    (col, row, int(lean)),
+                )
+                self.connection.executemany(
+                    "INSERT INTO tile_areasymbol (col, row, areasymbol) VALUES (?, ?, ?)",
+                    [(col, row, areasymbol) for areasymbol in areasymbols],
+                )
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO sacatalog (areasymbol, saverest) VALUES (?, ?)",
+                versions.items(),
+            )
+
+    def add_polygon(self, polygon: dict, wkt: str):
+        mupolygonkey = polygon["mupolygonkey"]
+        self.connection.execute(
+            "DELETE FROM mupolygon_rtree WHERE id IN "
+            "(SELECT id FROM mupolygon WHERE mupolygonkey = ?)",
+            (mupolygonkey,),
+        )
+        cursor = self.connection.execute(
+            "INSERT OR REPLACE INTO mupolygon "
+            "(mupolygonkey, mukey, areasymbol, nationalmusym, geometry) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (
+                mupolygonkey,
+                polygon["mukey"],
+                polygon["areasymbol"],
+                polygon.get("nationalmusym"),
+                wkt,
+            ),
+        )
+        xmin, ymin, xmax, ymax = wkt_bounds(wkt)
+        self.connection.execute(
+            "INSERT INTO mupolygon_rtree (id, minx, maxx, miny, maxy) VALUES (?, ?, ?, ?, ?)",
+            (cursor.lastrowid, xmin, xmax, ymin, ymax),
+        )
+
+    def rows(self, bbox: tuple, attributes: list = SOIL_ATTRIBUTES, intersects=None):
+        """Iterate cached rows with given attributes for polygons whose bounds intersect
+        bbox, and for which intersects((xmin, ymin, xmax, ymax), WKT) is true if given
+        """
+        xmin, ymin, xmax, ymax = bbox
+        cursor = self.connection.execute(
+            "SELECT m.mukey, m.mupolygonkey, m.areasymbol, m.nationalmusym, m.geometry, "
+            "a.attributes, r.minx, r.miny, r.maxx, r.maxy "
+            "FROM mupolygon_rtree r JOIN mupolygon m ON m.id = r.id "
+            "JOIN muaggatt a ON a.mukey = m.mukey "
+            "WHERE r.maxx >= ? AND r.minx <= ? AND r.maxy >= ? AND r.miny <= ?",
+            (xmin, xmax, ymin, ymax),
+        )
+        # attributes are parsed once per map unit
+        lookup = {}
+        for row in cursor:
+            mukey, mupolygonkey, areasymbol, nationalmusym, geometry, muaggatt = row[:6]
+            # cached tiles hold whole tiles, not only the queried area
+            if intersects is not None and not intersects(row[6:], geometry):
+                continue
+            if mukey not in lookup:
+                lookup[mukey] = json.loads(muaggatt)
+            soil_row = dict(lookup[mukey])
+            soil_row.update(
+                mupolygonkey=mupolygonkey,
+                areasymbol=areasymbol,
+                nationalmusym=nationalmusym,
+            )
+            yield [soil_row.get(attr["name"]) for attr in attributes] + [geometry]
+
+
+def stream_query(query: str, tile_key: tuple, rows_queue, stop):
+    """Put rows of SDA query on rows_queue until the query ends or stop is set"""
+    for row in post_sda_rows(query):
+        while not stop.is_set():
+            try:
+                rows_queue.put((tile_key, row), timeout=0.5)
+                break
+            except queue.Full:
+                continue
+        if stop.is_set():
+            return
+
+
+def iter_soil_tiles(
+    tiles: list,
+    max_workers: int = 4,
+    feedback=None,
+    lean: bool = False,
+    clip=None,
+):
+    """Stream SDA rows of tiles queried in parallel, splitting failing tiles
+
+    Yields (tile key, row) for every row. The bounded queue keeps memory flat when
+    rows arrive faster than they are consumed. If given, clip(bbox) returns the WKT
+    actually queried for a tile bbox, or None to skip it.
+    """
+    rows_queue = queue.Queue(maxsize=SDA_QUEUE_SIZE)
+    stop = threading.Event()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+
+        def submit(tile_key, bbox, depth):
+            wkt = bbox_wkt(bbox) if clip is None else clip(bbox)
+            if wkt is None:
+                return
+            query = sda_polygon_query(wkt, lean)
+            future = executor.submit(stream_query, query, tile_key, rows_queue, stop)
+            pending[future] = (tile_key, bbox, depth)
+
+        pending = {}
+        for col, row, bbox in tiles:
+            submit((col, row), bbox, 0)
+        try:
+            while pending:
+                done = [future for future in pending if future.done()]
+                # rows of finished queries are already queued, drain them first
+                while True:
+                    try:
+                        yield rows_queue.get(timeout=0 if done else 0.1)
+                    except queue.Empty:
+                        break
+                for future in done:
+                    tile_key, bbox, depth = pending.pop(future)
+                    try:
+                        future.result()
+                    except (requests.RequestException, ValueError) as e:
+                        if depth >= SDA_MAX_SPLIT_DEPTH:
+                            raise
+                        if feedback is not None:
+                            feedback.pushInfo(
+                                "Splitting soil query tile after error: " + str(e)[:200]
+                            )
+                        for quadrant in quadrants(bbox):
+                            submit(tile_key, quadrant, depth + 1)
+                if feedback is not None and feedback.isCanceled():
+                    return
+        finally:
+            stop.set()
+            for future in pending:
+                future.cancel()
+
+
+def iter_soil(
+    bbox: tuple,
+    max_workers: int = 4,
+    feedback=None,
+    cache=None,
+    lean: bool = False,
+    clip=None,
+    intersects=None,
+):
+    """Stream soil rows intersecting WGS84 bbox from cache and SDA, unique on mupolygonkey
+
+    Rows have the columns of soil_attributes(lean) followed by the WKT geometry.
+    Polygons are fetched with their map unit key only and the aggregated attributes
+    are fetched once per map unit and joined locally. If given, clip(bbox) returns
+    WKT of the area of interest inside bbox or None where they do not intersect, and
+    cached rows are limited to those for which intersects(bounds, WKT) is true.
+    """
+    tiles = soil_tiles(bbox)
+    if clip is not None:
+        tiles = [tile for tile in tiles if clip(tile[2]) is not None]
+    missing = tiles
+    if cache is not None:
+        cached_versions = cache.survey_areas(tiles)
+        if cached_versions:
+            current_versions = survey_area_versions(list(cached_versions))
+            stale = [
+                areasymbol
+                for areasymbol, saverest in cached_versions.items()
+                if current_versions.get(areasymbol) != saverest
+            ]
+            if stale and feedback is not None:
+                feedback.pushInfo("Refreshing cached survey areas: " + ", ".join(stale))
+            cache.invalidate(stale)
+        covered = cache.covered_tiles(tiles, lean)
+        missing = [tile for tile in tiles if (tile[0], tile[1]) not in covered]
+        if feedback is not None:
+            feedback.pushInfo(
+                "Soil tiles from cache: {} of {}".format(len(covered), len(tiles))
+            )
+
+    if cache is None:
+        seen = set()
+        lookup = {}
+        batch = []
+        for _, polygon in iter_soil_tiles(missing, max_workers, feedback, lean, clip):
+            if polygon[1] in seen:
+                continue
+            seen.add(polygon[1])
+            batch.append(polygon)
+            if len(batch) >= SOIL_BATCH_SIZE:
+                yield from join_soil_rows(batch, lookup, lean)
+                batch = []
+        if feedback is not None and feedback.isCanceled():
+            return
+        yield from join_soil_rows(batch, lookup, lean)
+        return
+
+    # stream new polygons of whole tiles into the cache in batches, fetch attributes
+    # of map units not cached yet and read everything back from the cache
+    tile_areasymbols = {}
+    mukeys = set()
+    batch = []
+    for tile_key, polygon in iter_soil_tiles(missing, max_workers, feedback, lean):
+        batch.append(polygon)
+        mukeys.add(polygon[0])
+        tile_areasymbols.setdefault(tile_key, set()).add(polygon[2])
+        if len(batch) >= SOIL_BATCH_SIZE:
+            cache.add_polygons(batch, lean)
+            batch = []
+    cache.add_polygons(batch, lean)
+    if feedback is not None and feedback.isCanceled():
+        return
+    cache.add_muaggatt(fetch_muaggatt(cache.missing_mukeys(mukeys, lean), lean), lean)
+    for tile in missing:
+        tile_areasymbols.setdefault((tile[0], tile[1]), set())
+    new_areasymbols = set().union(*tile_areasymbols.values())
+    cache.add_tiles(
+        tile_areasymbols, survey_area_versions(sorted(new_areasymbols)), lean
+    )
+    yield from cache.rows(bbox, soil_attributes(lean), intersects)
@@ -0,0 +1,55 @@
+# coding=utf-8
+"""Tests for area of interest geometry sent to Soil Data Access."""
+
+__author__ = 'Abdul Raheem Siddiqui'
+__date__ = '2020-12-25'
+__copyright__ = '(C) 2020 by Abdul Raheem Siddiqui'
+
+import unittest
+
+from qgis.core import QgsGeometry
+
+from aoi import geometry_clipper, geometry_intersects, query_geometry
+
+from .utilities import get_qgis_app
+QGIS_APP = get_qgis_app()
+
+
+class AOITest(unittest.TestCase):
+    """Test simplified and buffered AOI geometry"""
+
+    def setUp(self):
+        # L shaped watershed with a densified edge
+        edge = ', '.join('{} 0'.format(i / 1000) for i in range(1, 1000))
+        self.geometry = QgsGeometry.fromWkt(
+            'POLYGON ((0 0, {}, 1 0, 1 0.1, 0.1 0.1, 0.1 1, 0 1, 0 0))'.format(edge))
+
+    def test_query_geometry_covers_aoi(self):
+        """Query geometry respects the vertex budget and covers the buffered AOI"""
+        result = query_geometry(self.geometry, 0.001, 100)
+        self.assertLessEqual(result.constGet().nCoordinates(), 100)
+        self.assertTrue(result.contains(self.geometry))
+        # much smaller than the bounding box
+        self.assertLess(result.area(), 0.5)
+
+    def test_clipper_skips_tiles_outside_aoi(self):
+        """Tiles outside the AOI are skipped and others are clipped"""
+        clip = geometry_clipper(self.geometry)
+        self.assertIsNone(clip((0.5, 0.5, 0.6, 0.6)))
+        self.assertAlmostEqual(
+            QgsGeometry.fromWkt(clip((0.5, 0.05, 0.6, 0.15))).area(), 0.005)
+
+    def test_intersects_tests_geometry_not_bounds(self):
+        """Polygons in the notch of the AOI do not intersect it"""
+        intersects = geometry_intersects(self.geometry)
+        self.assertTrue(intersects(
+            (0.5, 0.05, 0.6, 0.15),
+            'POLYGON ((0.5 0.05, 0.6 0.05, 0.6 0.15, 0.5 0.05))'))
+        self.assertFalse(intersects(
+            (0.5, 0.5, 0.6, 0.6), 'POLYGON ((0.5 0.5, 0.6 0.5, 0.6 0.6, 0.5 0.5))'))
+        self.assertFalse(intersects(
+            (2, 2, 3, 3), 'POLYGON ((2 2, 3 2, 3 3, 2 2))'))
+
+
+if __name__ == '__main__':
+    unittest.main()
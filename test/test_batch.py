@@ -0,0 +1,61 @@
+# coding=utf-8
+"""Tests for batch Curve Number jobs."""
+
+__author__ = 'Abdul Raheem Siddiqui'
+__date__ = '2020-12-25'
+__copyright__ = '(C) 2020 by Abdul Raheem Siddiqui'
+
+import unittest
+
+from osgeo import ogr
+
+from batch import ogr_clipper, run_cn_job, soil_hsg_features
+
+
+class BatchTest(unittest.TestCase):
+    """Test batch job helpers"""
+
+    def test_ogr_clipper(self):
+        """Tiles are clipped to the area of interest or skipped"""
+        clip = ogr_clipper('POLYGON ((0 0, 0.15 0, 0.15 0.05, 0 0.05, 0 0))')
+        self.assertIsNone(clip((0, 0.1, 0.1, 0.2)))
+        part = ogr.CreateGeometryFromWkt(clip((0.1, 0, 0.2, 0.1)))
+        self.assertAlmostEqual(part.GetArea(), 0.0025)
+        # tiles inside the area of interest are queried whole
+        part = ogr.CreateGeometryFromWkt(clip((0, 0, 0.05, 0.05)))
+        self.assertAlmostEqual(part.GetArea(), 0.0025)
+        self.assertIsNone(clip((1, 1, 2, 2)))
+
+    def test_soil_hsg_features(self):
+        """Lean soil rows are converted to HSG index and WKB"""
+        rows = [['W', 'Water', None, 'mu1', '1', 'TX001',
+                 'POLYGON ((0 0, 1 0, 1 1, 0 0))']]
+        (index, wkb), = soil_hsg_features(rows, False)
+        self.assertEqual(index, 5)
+        self.assertEqual(ogr.CreateGeometryFromWkb(wkb).GetArea(), 0.5)
+
+    def test_soil_hsg_features_clipped(self):
+        """Soil is clipped to the area of interest and soil outside it is dropped"""
+        rows = [['AbB', 'Abbott', 'B', 'mu1', '1', 'TX001',
+                 'POLYGON ((0 0, 1 0, 1 1, 0 1, 0 0))'],
+                ['AbB', 'Abbott', 'B', 'mu1', '2', 'TX001',
+                 'POLYGON ((2 2, 3 2, 3 3, 2 3, 2 2))'],
+                ['AbB', 'Abbott', 'B', 'mu1', '3', 'TX001',
+                 'POLYGON ((0.1 0.1, 0.2 0.1, 0.2 0.2, 0.1 0.2, 0.1 0.1))']]
+        aoi = ogr.CreateGeometryFromWkt('POLYGON ((0 0, 0.5 0, 0.5 1, 0 1, 0 0))')
+        features = list(soil_hsg_features(rows, False, aoi))
+        self.assertEqual([index for index, _ in features], [2, 2])
+        self.assertEqual(
+            [round(ogr.CreateGeometryFromWkb(wkb).GetArea(), 2)
+             for _, wkb in features], [0.5, 0.01])
+
+    def test_failed_job_is_reported(self):
+        """Errors are returned in the job result instead of raised"""
+        result = run_cn_job({'source_id': '7', 'aoi_wkt': 'not wkt'})
+        self.assertEqual(result['source_id'], '7')
+        self.assertEqual(result['polygons'], [])
+        self.assertTrue(result['error'])
+
+
+if __name__ == '__main__':
+    unittest.main()
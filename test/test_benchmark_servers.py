@@ -0,0 +1,69 @@
+# coding=utf-8
+"""Tests for the local stand-in servers of the benchmark suite."""
+
+__author__ = 'Abdul Raheem Siddiqui'
+__date__ = '2020-12-25'
+__copyright__ = '(C) 2020 by Abdul Raheem Siddiqui'
+
+import os
+import sys
+import tempfile
+import unittest
+
+from osgeo import gdal
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'benchmark'))
+
+import nlcd
+import ssurgo
+from servers import HSG_VALUES, StandInServer, restore, sda_rows
+
+
+class StandInServerTest(unittest.TestCase):
+    """Test the stand-ins answer the requests of the plugin"""
+
+    def setUp(self):
+        self.server = StandInServer().start()
+        self.replaced = self.server.redirect()
+        self.addCleanup(self.server.stop)
+        self.addCleanup(restore, self.replaced)
+
+    def test_polygon_rows(self):
+        """Polygon queries return grid cells with the requested columns"""
+        rows = sda_rows(ssurgo.sda_polygon_query(
+            ssurgo.bbox_wkt((-98.005, 38.005, -97.985, 38.015)), True))
+        self.assertEqual(len(rows), 6)
+        self.assertEqual(len(rows[0]), len(ssurgo.polygon_columns(True)) + 1)
+        self.assertTrue(rows[0][-1].startswith('POLYGON (('))
+
+    def test_muaggatt_rows(self):
+        """Map unit queries return one row per map unit key"""
+        rows = sda_rows(ssurgo.sda_muaggatt_query(['1000', '1001'], True))
+        self.assertEqual([row[-1] for row in rows], ['1000', '1001'])
+        self.assertEqual(rows[0][:3], ['W', 'Water', None])
+
+    def test_iter_soil(self):
+        """Soil streamed from the stand-in joins polygons and map units"""
+        rows = list(ssurgo.iter_soil((-97.99, 38.01, -97.91, 38.09), lean=True))
+        names = [attr['name'] for attr in ssurgo.soil_attributes(True)]
+        keys = {row[names.index('mupolygonkey')] for row in rows}
+        self.assertGreater(len(rows), 0)
+        self.assertEqual(len(keys), len(rows))
+        self.assertIn(rows[0][names.index('hydgrpdcd')], HSG_VALUES)
+        # one soil tile and one map unit chunk
+        self.assertEqual(self.server.requests['sda'], 2)
+
+    def test_land_cover_tiles(self):
+        """NLCD tiles are palette GeoTIFFs that line up across tiles"""
+        tiles = nlcd.nlcd_tiles(-150000, 1750000, -130000, 1760000)
+        paths = nlcd.download_nlcd(tiles, tempfile.mkdtemp())
+        self.assertEqual(len(paths), len(tiles))
+        band = gdal.Open(paths[0]).GetRasterBand(1)
+        self.assertEqual(band.XSize, nlcd.NLCD_TILE_SIZE)
+        self.assertGreaterEqual(band.ReadAsArray().min(), 1)
+        self.assertEqual(self.server.requests['wms'], len(tiles))
+
+
+if __name__ == '__main__':
+    unittest.main()
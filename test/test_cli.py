@@ -0,0 +1,68 @@
+# coding=utf-8
+"""Tests for the headless command line runner."""
+
+__author__ = 'Abdul Raheem Siddiqui'
+__date__ = '2020-12-25'
+__copyright__ = '(C) 2020 by Abdul Raheem Siddiqui'
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import cli
+from cli import EXIT_NO_QGIS, EXIT_USAGE, find_aoi_files, main
+
+
+class CliTest(unittest.TestCase):
+    """Test command line argument handling"""
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_find_aoi_files(self):
+        """Directories expand to the vector files they contain"""
+        for name in ('b.gpkg', 'a.shp', 'a.dbf', 'notes.txt'):
+            open(os.path.join(self.folder, name), 'w').close()
+        self.assertEqual(
+            find_aoi_files([self.folder, 'other.geojson']),
+            [os.path.join(self.folder, 'a.shp'),
+             os.path.join(self.folder, 'b.gpkg'),
+             'other.geojson'])
+
+    def test_no_inputs_is_usage_error(self):
+        """Empty input directory exits with usage error before starting QGIS"""
+        self.assertEqual(main([self.folder, '-o', self.folder]), EXIT_USAGE)
+
+    def test_run_starts_qgis_before_importing_processing(self):
+        """Processing is imported after QGIS added the plugins folder"""
+        processing = mock.Mock()
+        processing.run.return_value = {'CN_Raster': 'CN_Raster.tif'}
+
+        def start_qgis():
+            sys.modules['processing'] = processing
+
+        with mock.patch.object(cli, 'start_qgis', side_effect=start_qgis), \
+                mock.patch.dict(sys.modules, {'processing': None}):
+            results = cli.run_curve_number('aoi.gpkg', self.folder)
+        self.assertEqual(results, {'CN_Raster': 'CN_Raster.tif'})
+        parameters = processing.run.call_args[0][1]
+        self.assertEqual(parameters['areaboundary'], 'aoi.gpkg')
+        self.assertTrue(parameters['OutputCurveNumberRaster'])
+
+    def test_missing_qgis_exit_code(self):
+        """Missing QGIS bindings exit with their own code"""
+        aoi_path = os.path.join(self.folder, 'aoi.gpkg')
+        open(aoi_path, 'w').close()
+        with mock.patch.object(cli, '_app', None), \
+                mock.patch.dict(sys.modules, {'qgis': None, 'qgis.core': None}):
+            self.assertEqual(main([aoi_path, '-o', self.folder]), EXIT_NO_QGIS)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+# coding=utf-8
+"""Tests for the compiled CN lookup table."""
+
+__author__ = 'Abdul Raheem Siddiqui'
+__date__ = '2020-12-25'
+__copyright__ = '(C) 2020 by Abdul Raheem Siddiqui'
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from cn_lookup import (
+    CN_NODATA,
+    build_cn_lut,
+    clear_cn_lut_cache,
+    compile_cn_lut,
+    load_cn_lut,
+    missing_gdcodes,
+    read_lookup_csv,
+)
+from cust_functions import HSG_CLASSES, HSG_WATER_INDEX
+
+DEFAULT_LOOKUP = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'CN_Lookup.csv'
+)
+NLCD_CODES = (11, 12, 21, 22, 23, 24, 31, 32, 41, 42, 43, 51, 52, 71, 72, 73, 74,
+              81, 82, 90, 95)
+
+
+class CNLookupTest(unittest.TestCase):
+    """Test compiling, validating and caching the CN lookup table"""
+
+    def setUp(self):
+        clear_cn_lut_cache()
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def write_csv(self, text):
+        path = os.path.join(self.temp_dir, 'lookup.csv')
+        with open(path, 'w', encoding='utf-8-sig', newline='') as csv_file:
+            csv_file.write(text)
+        return path
+
+    def test_default_lookup_is_complete(self):
+        """Default lookup has a CN for every NLCD class and HSG"""
+        _, lut = load_cn_lut(DEFAULT_LOOKUP)
+        self.assertEqual(missing_gdcodes(lut, NLCD_CODES), [])
+        self.assertEqual(lut[11, HSG_WATER_INDEX], lut[11, 0])
+
+    def test_read_lookup_csv(self):
+        """Byte order mark and CRLF line endings are handled"""
+        rows = read_lookup_csv(self.write_csv('GDCode,CN_Join\r\n41B,55\r\n41,\r\n'))
+        self.assertEqual(rows, [('41B', '55'), ('41', '')])
+
+    def test_missing_gdcodes(self):
+        """Combinations without CN are reported"""
+        lut = build_cn_lut([('41A', '30'), ('41B', '55')])
+        self.assertEqual(missing_gdcodes(lut, [41]), ['41', '41C', '41D'])
+        self.assertEqual(lut[41, HSG_CLASSES.index('C')], CN_NODATA)
+
+    def test_invalid_gdcode(self):
+        """Malformed GDCodes and NLCD codes outside the table are named"""
+        for gdcode in ('41b', '41AB', 'B41', '256A'):
+            with self.assertRaisesRegex(ValueError, gdcode):
+                build_cn_lut([('41A', '30'), (gdcode, '55')])
+
+    def test_invalid_cn(self):
+        """CNs that are not numbers or do not fit the table are named"""
+        for cn in ('high', '255', '-1'):
+            with self.assertRaisesRegex(ValueError, '41B.*' + cn):
+                build_cn_lut([('41B', cn)])
+
+    def test_load_cached_by_file_hash(self):
+        """Same file content is compiled once, changed content is compiled again"""
+        path = self.write_csv('GDCode,CN_Join\n41B,55\n')
+        key, lut = load_cn_lut(path)
+        self.assertIs(load_cn_lut(path)[1], lut)
+        self.assertFalse(lut.flags.writeable)
+        self.assertEqual(lut[41, HSG_CLASSES.index('B')], 55)
+
+        self.write_csv('GDCode,CN_Join\n41B,61\n')
+        changed_key, changed_lut = load_cn_lut(path)
+        self.assertNotEqual(changed_key, key)
+        self.assertEqual(changed_lut[41, HSG_CLASSES.index('B')], 61)
+
+    def test_compile_cached_by_rows(self):
+        """Rows of a lookup layer are compiled once for every content"""
+        key, lut = compile_cn_lut([('41B', 55.0)])
+        self.assertIs(compile_cn_lut(iter([('41B', 55.0)]))[1], lut)
+        self.assertNotEqual(compile_cn_lut([('41B', 61)])[0], key)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+# coding=utf-8
+"""Regression tests of the Curve Number layer and composite CN on a tiny area."""
+
+__author__ = 'Abdul Raheem Siddiqui'
+__date__ = '2020-12-25'
+__copyright__ = '(C) 2020 by Abdul Raheem Siddiqui'
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from osgeo import gdal, osr
+
+import numpy as np
+
+from qgis.core import (
+    QgsCoordinateTransformContext,
+    QgsFeature,
+    QgsGeometry,
+    QgsVectorLayer,
+)
+
+from cn_lookup import CN_NODATA, clear_cn_lut_cache, load_cn_lut
+from overlay import cn_features, cn_fields, overlay_soil_land_cover
+from raster_cn import burn_zones, compute_cn_grid, layer_hsg_features
+from zonal import composite_cn
+
+from .utilities import get_qgis_app
+QGIS_APP = get_qgis_app()
+
+DEFAULT_LOOKUP = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'CN_Lookup.csv'
+)
+
+
+def memory_layer(fields, rows):
+    """Polygon memory layer in EPSG:5070 of (WKT, attributes) rows"""
+    layer = QgsVectorLayer(
+        'Polygon?crs=EPSG:5070&' + '&'.join('field=' + f for f in fields),
+        'layer', 'memory')
+    features = []
+    for wkt, attributes in rows:
+        feat = QgsFeature(layer.fields())
+        feat.setGeometry(QgsGeometry.fromWkt(wkt))
+        feat.setAttributes(attributes)
+        features.append(feat)
+    layer.dataProvider().addFeatures(features)
+    return layer
+
+
+class CNRegressionTest(unittest.TestCase):
+    """Test Curve Number outputs of a 3 by 2 pixel area against known CN values"""
+
+    def setUp(self):
+        clear_cn_lut_cache()
+        self.temp_dir = tempfile.mkdtemp()
+        _, self.cn_lut = load_cn_lut(DEFAULT_LOOKUP)
+        self.soil = memory_layer(
+            ['MUSYM:string', 'HYDGRPDCD:string', 'MUNAME:string'],
+            [('POLYGON ((0 0, 30 0, 30 60, 0 60, 0 0))', ['AbB', 'B', 'Abbott']),
+             ('POLYGON ((30 0, 60 0, 60 60, 30 60, 30 0))', ['ChD', 'C/D', 'Chester']),
+             ('POLYGON ((60 0, 90 0, 90 60, 60 60, 60 0))', ['W', None, 'Water'])])
+        self.land_cover = memory_layer(
+            ['VALUE:integer'],
+            [('POLYGON ((0 0, 30 0, 30 60, 0 60, 0 0))', [41]),
+             ('POLYGON ((30 0, 90 0, 90 60, 30 60, 30 0))', [82])])
+        # two area boundary features, the second covers only the water soil
+        self.area = memory_layer(
+            ['name:string'],
+            [('POLYGON ((0 0, 60 0, 60 60, 0 60, 0 0))', ['land']),
+             ('POLYGON ((60 0, 90 0, 90 60, 60 60, 60 0))', ['water'])])
+        self.nlcd_path = os.path.join(self.temp_dir, 'nlcd.tif')
+        nlcd_ds = gdal.GetDriverByName('GTiff').Create(
+            self.nlcd_path, 3, 2, 1, gdal.GDT_Byte)
+        nlcd_ds.SetGeoTransform((0, 30, 0, 60, 0, -30))
+        srs = osr.SpatialReference()
+        srs.ImportFromEPSG(5070)
+        nlcd_ds.SetProjection(srs.ExportToWkt())
+        nlcd_ds.GetRasterBand(1).WriteArray(
+            np.array([[41, 82, 82], [41, 82, 82]], dtype=np.uint8))
+        nlcd_ds = None
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def cn_rows(self, drained):
+        overlay = overlay_soil_land_cover(
+            self.soil, self.land_cover,
+            QgsGeometry.unaryUnion(
+                [feat.geometry() for feat in self.area.getFeatures()]),
+            QgsCoordinateTransformContext())
+        fields = cn_fields(overlay)
+        self.assertEqual(
+            fields.names(),
+            ['MUSYM', 'HYDGRPDCD', 'MUNAME', 'GDCode', 'NLCD_LU', 'CN'])
+        return sorted(
+            tuple(feat.attributes()) + (round(feat.geometry().area()),)
+            for feat in cn_features(overlay, fields, self.cn_lut, drained))
+
+    def test_cn_layer(self):
+        """Dual HSG takes D undrained and water soils take the CN of GDCode 11"""
+        self.assertEqual(self.cn_rows(False), [
+            ('AbB', 'B', 'Abbott', '41B', 41, 30, 1800),
+            ('ChD', 'C/D', 'Chester', '82D', 82, 86, 1800),
+            ('W', None, 'Water', '11', 82, 100, 1800),
+        ])
+
+    def test_cn_layer_drained(self):
+        """Dual HSG takes the drained class"""
+        self.assertIn(
+            ('ChD', 'C/D', 'Chester', '82C', 82, 82, 1800), self.cn_rows(True))
+
+    def test_composite_cn(self):
+        """Composite CN is the mean pixel CN of every area boundary feature"""
+        _, _, _, cn = compute_cn_grid(
+            self.nlcd_path, layer_hsg_features(self.soil, False), self.cn_lut)
+        np.testing.assert_array_equal(cn, [[30, 86, 100], [30, 86, 100]])
+        zone_features = list(self.area.getFeatures())
+        composite, pixels = composite_cn(
+            burn_zones(zone_features, gdal.Open(self.nlcd_path)), cn, CN_NODATA,
+            len(zone_features))
+        self.assertEqual(list(pixels), [0, 4, 2])
+        self.assertAlmostEqual(composite[1], 58)
+        self.assertAlmostEqual(composite[2], 100)
+
+
+if __name__ == '__main__':
+    unittest.main()
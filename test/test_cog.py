@@ -0,0 +1,61 @@
+# coding=utf-8
+"""Tests for Cloud Optimized GeoTIFF rasters."""
+
+__author__ = 'Abdul Raheem Siddiqui'
+__date__ = '2020-12-25'
+__copyright__ = '(C) 2020 by Abdul Raheem Siddiqui'
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from osgeo import gdal
+
+import numpy as np
+
+from cog import overview_levels, write_cog
+
+
+class COGTest(unittest.TestCase):
+    """Test tiled, compressed rasters with overviews"""
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_overview_levels(self):
+        """Overviews are added until the smallest one fits in a block"""
+        self.assertEqual(overview_levels(512, 512), [])
+        self.assertEqual(overview_levels(513, 10), [2])
+        self.assertEqual(overview_levels(5000, 3000), [2, 4, 8, 16])
+
+    def test_write_cog(self):
+        """Float raster is written as UInt8 with nodata, tiles and overviews"""
+        source = gdal.GetDriverByName('MEM').Create(
+            '', 1200, 700, 1, gdal.GDT_Float32)
+        source.SetGeoTransform((0, 30, 0, 21000, 0, -30))
+        band = source.GetRasterBand(1)
+        band.SetNoDataValue(-9999)
+        values = np.full((700, 1200), 41, dtype=np.float32)
+        values[0, 0] = -9999
+        band.WriteArray(values)
+
+        path = write_cog(
+            source, os.path.join(self.folder, 'nlcd.tif'), gdal.GDT_Byte, 0)
+        band = gdal.Open(path).GetRasterBand(1)
+        self.assertEqual(band.DataType, gdal.GDT_Byte)
+        self.assertEqual(band.GetNoDataValue(), 0)
+        self.assertEqual(band.GetBlockSize(), [512, 512])
+        self.assertEqual(band.GetOverviewCount(), 2)
+        self.assertEqual(band.ReadAsArray()[0, 0], 0)
+        self.assertEqual(band.GetOverview(0).ReadAsArray()[1, 1], 41)
+        self.assertEqual(
+            gdal.Info(path, format='json')['metadata']['IMAGE_STRUCTURE']['COMPRESSION'],
+            'DEFLATE')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+# coding=utf-8
+"""Tests for helper functions used by the Curve Number Generator algorithm."""
+
+__author__ = 'Abdul Raheem Siddiqui'
+__date__ = '2020-12-25'
+__copyright__ = '(C) 2020 by Abdul Raheem Siddiqui'
+
+import unittest
+
+from cust_functions import (
+    HSG_CLASSES,
+    HSG_WATER_INDEX,
+    hsg_index,
+    is_water_soil,
+    parse_gdcode,
+    resolve_hsg,
+)
+
+
+class CustFunctionsTest(unittest.TestCase):
+    """Test HSG resolution and GDCode parsing"""
+
+    def test_resolve_hsg(self):
+        """Dual category soils resolve based on drained condition"""
+        self.assertEqual(resolve_hsg('B/D', False), 'D')
+        self.assertEqual(resolve_hsg('B/D', True), 'B')
+        self.assertEqual(resolve_hsg('C', False), 'C')
+        self.assertEqual(resolve_hsg(None, True), '')
+
+    def test_is_water_soil(self):
+        """Water is recognized from MUSYM or MUNAME"""
+        self.assertTrue(is_water_soil('W', None))
+        self.assertTrue(is_water_soil(None, 'Water'))
+        self.assertFalse(is_water_soil('AbB', 'Abbott loam'))
+
+    def test_hsg_index(self):
+        """HSG index is water only when HSG is missing"""
+        self.assertEqual(hsg_index('A/D', 'W', 'Water', False), HSG_CLASSES.index('D'))
+        self.assertEqual(hsg_index(None, 'W', 'Water', False), HSG_WATER_INDEX)
+        self.assertEqual(hsg_index(None, 'AbB', 'Abbott loam', False), 0)
+
+    def test_parse_gdcode(self):
+        """GDCode splits into NLCD code and HSG"""
+        self.assertEqual(parse_gdcode('41B'), (41, 'B'))
+        self.assertEqual(parse_gdcode('11'), (11, ''))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+# coding=utf-8
+"""Tests for the chunked GeoPackage feature sink."""
+
+__author__ = 'Abdul Raheem Siddiqui'
+__date__ = '2020-12-25'
+__copyright__ = '(C) 2020 by Abdul Raheem Siddiqui'
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from osgeo import ogr
+from qgis.PyQt.QtCore import QVariant
+from qgis.core import (
+    NULL,
+    QgsCoordinateReferenceSystem,
+    QgsFeature,
+    QgsField,
+    QgsFields,
+    QgsGeometry,
+    QgsWkbTypes,
+)
+
+from geopackage import GeoPackageSink, write_geopackage
+
+from .utilities import get_qgis_app
+QGIS_APP = get_qgis_app()
+
+
+class GeoPackageSinkTest(unittest.TestCase):
+    """Test streaming features to a GeoPackage"""
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.fields = QgsFields()
+        self.fields.append(QgsField('GDCode', QVariant.String, len=5))
+        self.fields.append(QgsField('CN', QVariant.Int))
+        self.crs = QgsCoordinateReferenceSystem('EPSG:5070')
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def features(self, count):
+        for index in range(count):
+            feat = QgsFeature(self.fields)
+            feat.setGeometry(QgsGeometry.fromWkt(
+                'MultiPolygon ((({0} 0, {1} 0, {1} 1, {0} 0)))'.format(index, index + 1)))
+            feat.setAttributes(['41B', 55 if index else NULL])
+            yield feat
+
+    def test_chunked_writes_and_spatial_index(self):
+        """All chunks are committed and the spatial index is built"""
+        path = os.path.join(self.folder, 'CN_Layer.gpkg')
+        sink = GeoPackageSink(
+            path, 'CN_Layer', self.fields, QgsWkbTypes.MultiPolygon, self.crs,
+            chunk_size=3)
+        sink.addFeatures(self.features(10))
+        self.assertEqual(sink.close(), path)
+
+        dataset = ogr.Open(path)
+        layer = dataset.GetLayerByName('CN_Layer')
+        self.assertEqual(layer.GetFeatureCount(), 10)
+        self.assertEqual(layer.GetSpatialRef().GetAuthorityCode(None), '5070')
+        values = [feat.GetField('CN') for feat in layer]
+        self.assertIsNone(values[0])
+        self.assertEqual(values[1], 55)
+        result = dataset.ExecuteSQL("SELECT HasSpatialIndex('CN_Layer', 'geom')")
+        self.assertEqual(result.GetNextFeature().GetField(0), 1)
+        dataset.ReleaseResultSet(result)
+
+    def test_add_values(self):
+        """Attribute values and OGR geometries are written without QGIS features"""
+        path = os.path.join(self.folder, 'soil.gpkg')
+        with GeoPackageSink(
+                path, 'soil', self.fields, QgsWkbTypes.MultiPolygon,
+                self.crs) as sink:
+            sink.addValues(['41B', None], ogr.CreateGeometryFromWkt(
+                'MULTIPOLYGON (((0 0, 1 0, 1 1, 0 0)))'))
+        feat = ogr.Open(path).GetLayerByName('soil').GetNextFeature()
+        self.assertEqual(feat.GetField('GDCode'), '41B')
+        self.assertFalse(feat.IsFieldSet('CN'))
+        self.assertAlmostEqual(feat.GetGeometryRef().GetArea(), 0.5)
+
+    def test_table_without_geometry(self):
+        """Tables without geometry get no spatial index"""
+        path = write_geopackage(
+            self.features(2), self.fields, QgsWkbTypes.NoGeometry, self.crs,
+            os.path.join(self.folder, 'table.gpkg'), 'table')
+        layer = ogr.Open(path).GetLayerByName('table')
+        self.assertEqual(layer.GetFeatureCount(), 2)
+        self.assertEqual(layer.GetGeomType(), ogr.wkbNone)
+
+
+if __name__ == '__main__':
+    unittest.main()
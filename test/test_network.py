@@ -0,0 +1,86 @@
+# coding=utf-8
+"""Tests for the shared HTTP session."""
+
+__author__ = 'Abdul Raheem Siddiqui'
+__date__ = '2020-12-25'
+__copyright__ = '(C) 2020 by Abdul Raheem Siddiqui'
+
+import io
+import unittest
+from unittest import mock
+
+import requests
+
+import network
+
+
+def fake_response(status_code, headers=None):
+    """Response with given status code"""
+    response = requests.Response()
+    response.status_code = status_code
+    response.headers.update(headers or {})
+    response.url = 'https://example.com'
+    response.raw = io.BytesIO(b'')
+    return response
+
+
+class NetworkTest(unittest.TestCase):
+    """Test retries of the shared HTTP session"""
+
+    def setUp(self):
+        self.session = mock.Mock()
+        patchers = [
+            mock.patch.object(network, 'get_session', return_value=self.session),
+            mock.patch.object(network.time, 'sleep'),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_retry_on_throttling(self):
+        """429 and 5xx responses are retried until success"""
+        self.session.request.side_effect = [
+            fake_response(429, {'Retry-After': '2'}),
+            fake_response(503),
+            fake_response(200),
+        ]
+        response = network.request('GET', 'https://example.com')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.session.request.call_count, 3)
+        network.time.sleep.assert_any_call(2.0)
+
+    def test_cancel_stops_retrying(self):
+        """Waiting for a retry ends as soon as the feedback is canceled"""
+        self.session.request.return_value = fake_response(503, {'Retry-After': '30'})
+        feedback = mock.Mock()
+        feedback.isCanceled.side_effect = [False, True]
+        with self.assertRaises(requests.ConnectionError):
+            network.request('GET', 'https://example.com', feedback=feedback)
+        self.assertEqual(self.session.request.call_count, 1)
+        network.time.sleep.assert_called_once_with(network.CANCEL_POLL_INTERVAL)
+
+    def test_no_retry_outside_retry_statuses(self):
+        """Statuses not listed are raised immediately"""
+        self.session.request.return_value = fake_response(500)
+        with self.assertRaises(requests.HTTPError):
+            network.request('POST', 'https://example.com', retry_statuses=(503,))
+        self.assertEqual(self.session.request.call_count, 1)
+
+    def test_default_timeout(self):
+        """Requests always have connect and read timeouts"""
+        self.session.request.return_value = fake_response(200)
+        network.request('GET', 'https://example.com')
+        self.assertEqual(
+            self.session.request.call_args[1]['timeout'], network.DEFAULT_TIMEOUT)
+
+    def test_iter_chunks_counts_bytes(self):
+        """Bytes read through iter_chunks are added to the received total"""
+        response = fake_response(200)
+        response.raw = io.BytesIO(b'x' * 100)
+        start = network.bytes_received()
+        self.assertEqual(b''.join(network.iter_chunks(response, 30)), b'x' * 100)
+        self.assertEqual(network.bytes_received() - start, 100)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,155 @@
+# coding=utf-8
+"""Tests for NLCD tiling and tile cache."""
+
+__author__ = 'Abdul Raheem Siddiqui'
+__date__ = '2020-12-25'
+__copyright__ = '(C) 2020 by Abdul Raheem Siddiqui'
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from osgeo import gdal
+
+import numpy as np
+
+from nlcd import (
+    NLCDTileCache,
+    count_regions,
+    nlcd_tiles,
+    palette_to_nlcd,
+    reclassify_nlcd,
+    sieve_nlcd,
+    snap_extent,
+)
+
+
+def write_tile(path):
+    """Write a small GeoTIFF tile to path"""
+    tile = gdal.GetDriverByName('GTiff').Create(path, 4, 4, 1, gdal.GDT_Byte)
+    tile.FlushCache()
+    tile = None
+    return path
+
+
+class NLCDTilesTest(unittest.TestCase):
+    """Test splitting of extent into grid aligned NLCD tiles"""
+
+    def test_palette_to_nlcd(self):
+        """Palette indices map to NLCD codes, unknown indices to 0"""
+        palette = np.array([[0, 1, 9], [21, 22, 255]], dtype=np.uint8)
+        np.testing.assert_array_equal(
+            palette_to_nlcd(palette), [[0, 11, 41], [95, 0, 0]])
+
+    def test_reclassify_nlcd(self):
+        """Palette raster is converted block by block to UInt8 NLCD codes"""
+        folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, folder)
+        palette = np.tile(np.arange(22, dtype=np.uint8), (5, 1))
+        path = os.path.join(folder, 'palette.tif')
+        palette_ds = gdal.GetDriverByName('GTiff').Create(
+            path, 22, 5, 1, gdal.GDT_Byte)
+        palette_ds.SetGeoTransform((0, 30, 0, 150, 0, -30))
+        palette_ds.GetRasterBand(1).WriteArray(palette)
+        palette_ds = None
+
+        nlcd_path = reclassify_nlcd(
+            path, os.path.join(folder, 'nlcd.tif'), block_rows=2)
+        nlcd_ds = gdal.Open(nlcd_path)
+        band = nlcd_ds.GetRasterBand(1)
+        self.assertEqual(band.DataType, gdal.GDT_Byte)
+        self.assertEqual(band.GetNoDataValue(), 0)
+        self.assertEqual(nlcd_ds.GetGeoTransform(), (0, 30, 0, 150, 0, -30))
+        np.testing.assert_array_equal(band.ReadAsArray(), palette_to_nlcd(palette))
+
+    def test_snap_extent(self):
+        """Extent is grown to the native NLCD pixel edges"""
+        self.assertEqual(
+            snap_extent(1000, 2000, 1900, 3000), (975, 1995, 1905, 3015))
+
+    def test_tiles_are_grid_aligned(self):
+        """Tiles are fixed on the global grid so overlapping extents share them"""
+        tiles = nlcd_tiles(0, 0, 100, 100, tile_size=10, origin=(0, 300))
+        self.assertEqual(tiles, [(0, 0, (0, 0, 300, 300), 10, 10)])
+        tiles = nlcd_tiles(250, 250, 350, 280, tile_size=10, origin=(0, 300))
+        self.assertEqual([tile[:2] for tile in tiles], [(0, 0), (1, 0)])
+
+
+class NLCDTileCacheTest(unittest.TestCase):
+    """Test NLCD tile cache"""
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_put_and_get(self):
+        """Cached tile is returned and corrupt tile is discarded"""
+        cache = NLCDTileCache(self.folder, 1 << 30)
+        self.assertIsNone(cache.get(1, 2))
+        path = cache.put(1, 2, write_tile(os.path.join(self.folder, 'a.tif')))
+        self.assertEqual(cache.get(1, 2), path)
+        with open(path, 'ab') as tile_file:
+            tile_file.write(b'corrupt')
+        self.assertIsNone(cache.get(1, 2))
+        self.assertFalse(os.path.exists(path))
+
+    def test_evict_least_recently_used(self):
+        """Oldest tiles are removed when cache is over the size cap"""
+        cache = NLCDTileCache(self.folder, 1)
+        old = cache.put(0, 0, write_tile(os.path.join(self.folder, 'a.tif')))
+        os.utime(old, (0, 0))
+        # a new run does not protect tiles used by earlier runs
+        cache.in_use.clear()
+        new = cache.put(0, 1, write_tile(os.path.join(self.folder, 'b.tif')))
+        self.assertFalse(os.path.exists(old))
+        self.assertTrue(os.path.exists(new))
+
+    def test_shared_cache_is_evicted_by_parent(self):
+        """Caches shared by worker processes only evict when asked to"""
+        cache = NLCDTileCache(self.folder, 1, evict_on_put=False)
+        old = cache.put(0, 0, write_tile(os.path.join(self.folder, 'a.tif')))
+        new = cache.put(0, 1, write_tile(os.path.join(self.folder, 'b.tif')))
+        self.assertTrue(os.path.exists(old))
+        os.utime(old, (0, 0))
+        NLCDTileCache(self.folder, os.path.getsize(new)).evict()
+        self.assertFalse(os.path.exists(old))
+        self.assertTrue(os.path.exists(new))
+
+
+class NLCDSieveTest(unittest.TestCase):
+    """Test minimum mapping unit of polygonized NLCD"""
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_sieve_merges_small_regions(self):
+        """Single pixels are merged into their neighbour, nodata is kept"""
+        nlcd = np.full((6, 6), 41, dtype=np.uint8)
+        nlcd[:, 3:] = 82
+        nlcd[1, 1] = 11
+        nlcd[4, 4] = 21
+        nlcd[5, 5] = 0
+        path = os.path.join(self.folder, 'nlcd.tif')
+        nlcd_ds = gdal.GetDriverByName('GTiff').Create(path, 6, 6, 1, gdal.GDT_Byte)
+        nlcd_ds.SetGeoTransform((0, 30, 0, 180, 0, -30))
+        nlcd_ds.GetRasterBand(1).SetNoDataValue(0)
+        nlcd_ds.GetRasterBand(1).WriteArray(nlcd)
+        nlcd_ds = None
+
+        self.assertEqual(count_regions(path), 4)
+        sieved_path = sieve_nlcd(path, 2, os.path.join(self.folder, 'sieved.tif'))
+        sieved = gdal.Open(sieved_path).GetRasterBand(1).ReadAsArray()
+        self.assertEqual(sieved[1, 1], 41)
+        self.assertEqual(sieved[4, 4], 82)
+        self.assertEqual(sieved[5, 5], 0)
+        self.assertEqual(count_regions(sieved_path), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+# coding=utf-8
+"""Tests for the soil land cover overlay."""
+
+__author__ = 'Abdul Raheem Siddiqui'
+__date__ = '2020-12-25'
+__copyright__ = '(C) 2020 by Abdul Raheem Siddiqui'
+
+import unittest
+from unittest import mock
+
+from qgis.core import (
+    QgsCoordinateTransformContext,
+    QgsFeature,
+    QgsGeometry,
+    QgsVectorLayer,
+)
+
+from overlay import overlay_soil_land_cover, polygon_part
+
+from .utilities import get_qgis_app
+QGIS_APP = get_qgis_app()
+
+
+def memory_layer(fields, rows):
+    """Polygon memory layer in EPSG:5070 of (WKT, attributes) rows"""
+    layer = QgsVectorLayer(
+        'Polygon?crs=EPSG:5070&' + '&'.join('field=' + f for f in fields),
+        'layer', 'memory')
+    features = []
+    for wkt, attributes in rows:
+        feat = QgsFeature(layer.fields())
+        feat.setGeometry(QgsGeometry.fromWkt(wkt))
+        feat.setAttributes(attributes)
+        features.append(feat)
+    layer.dataProvider().addFeatures(features)
+    return layer
+
+
+class OverlayTest(unittest.TestCase):
+    """Test clipping and intersecting soil with land cover in one pass"""
+
+    def setUp(self):
+        self.soil = memory_layer(
+            ['MUSYM:string', 'HYDGRPDCD:string', 'MUNAME:string', 'MUKEY:string'],
+            [('POLYGON ((0 0, 60 0, 60 60, 0 60, 0 0))', ['AbB', 'B', 'Abbott', '1']),
+             ('POLYGON ((60 0, 120 0, 120 60, 60 60, 60 0))', ['W', None, 'Water', '2']),
+             ('POLYGON ((500 0, 560 0, 560 60, 500 60, 500 0))', ['Cc', 'C', 'Far', '3'])])
+        self.land_cover = memory_layer(
+            ['VALUE:integer'],
+            [('POLYGON ((0 0, 30 0, 30 60, 0 60, 0 0))', [41]),
+             ('POLYGON ((30 0, 120 0, 120 60, 30 60, 30 0))', [82]),
+             ('POLYGON ((500 0, 560 0, 560 60, 500 60, 500 0))', [11])])
+        # area boundary cuts the second soil polygon in half
+        self.area = QgsGeometry.fromWkt('POLYGON ((0 0, 90 0, 90 60, 0 60, 0 0))')
+
+    def test_overlay(self):
+        """Soil inside the area is split by land cover with only needed fields"""
+        result = overlay_soil_land_cover(
+            self.soil, self.land_cover, self.area, QgsCoordinateTransformContext())
+        self.assertEqual(
+            result.fields().names(), ['MUSYM', 'HYDGRPDCD', 'MUNAME', 'VALUE'])
+        pieces = sorted(
+            (feat['MUSYM'], feat['VALUE'], round(feat.geometry().area()))
+            for feat in result.getFeatures())
+        self.assertEqual(
+            pieces, [('AbB', 41, 1800), ('AbB', 82, 1800), ('W', 82, 1800)])
+
+    def test_overlay_into_sink(self):
+        """Features are written to a given sink in batches"""
+        sink = QgsVectorLayer(
+            'MultiPolygon?crs=EPSG:5070&field=MUSYM:string&field=HYDGRPDCD:string'
+            '&field=MUNAME:string&field=VALUE:integer', 'sink', 'memory')
+        with mock.patch('overlay.OVERLAY_BATCH_SIZE', 2):
+            result = overlay_soil_land_cover(
+                self.soil, self.land_cover, self.area,
+                QgsCoordinateTransformContext(), sink=sink.dataProvider())
+        self.assertIs(result, sink.dataProvider())
+        self.assertEqual(sink.featureCount(), 3)
+
+    def test_polygon_part(self):
+        """Lines and points of touching polygons are dropped"""
+        self.assertIsNone(polygon_part(QgsGeometry.fromWkt('LINESTRING (0 0, 1 0)')))
+        part = polygon_part(QgsGeometry.fromWkt(
+            'GEOMETRYCOLLECTION (POINT (0 0), POLYGON ((0 0, 1 0, 1 1, 0 0)))'))
+        self.assertEqual(part.asWkt(), 'MultiPolygon (((0 0, 1 0, 1 1, 0 0)))')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,136 @@
+# coding=utf-8
+"""Tests for the stage dependency graph executor."""
+
+__author__ = 'Abdul Raheem Siddiqui'
+__date__ = '2020-12-25'
+__copyright__ = '(C) 2020 by Abdul Raheem Siddiqui'
+
+import threading
+import unittest
+
+from pipeline import Pipeline, Stage, StageMemo, update_costs
+
+
+class Feedback:
+    """Minimal feedback recording progress and messages"""
+
+    def __init__(self):
+        self.progress = []
+        self.info = []
+        self.canceled = False
+
+    def setProgress(self, progress):
+        self.progress.append(progress)
+
+    def pushInfo(self, info):
+        self.info.append(info)
+
+    def isCanceled(self):
+        return self.canceled
+
+
+class PipelineTest(unittest.TestCase):
+    """Test planning and running of pipeline stages"""
+
+    def setUp(self):
+        self.calls = []
+        self.pipeline = Pipeline([
+            Stage('a', self.stage('a', 1), threadsafe=True),
+            Stage('b', self.stage('b', 10), threadsafe=True),
+            Stage('c', self.stage('c', 100), requires=('a',)),
+            Stage('d', self.stage('d', 1000), requires=('a', 'b')),
+            Stage('style', self.stage('style', 0), requires=('c',)),
+        ])
+
+    def stage(self, name, value):
+        """Stage function adding its value to the values of required stages"""
+        def function(inputs, feedback):
+            self.calls.append(name)
+            return value + sum(inputs.values())
+        return function
+
+    def test_plan_runs_only_required_stages(self):
+        """Plan contains the targets and their dependencies in order"""
+        self.assertEqual(self.pipeline.plan(['c']), ['a', 'c'])
+        self.assertEqual(self.pipeline.plan(['d', 'c']), ['a', 'b', 'd', 'c'])
+        with self.assertRaises(ValueError):
+            self.pipeline.plan(['unknown'])
+
+    def test_run(self):
+        """Values flow along dependencies and unrequested stages are skipped"""
+        feedback = Feedback()
+        values = self.pipeline.run(['d'], feedback)
+        self.assertEqual(values, {'a': 1, 'b': 10, 'd': 1011})
+        self.assertNotIn('style', self.calls)
+        self.assertAlmostEqual(feedback.progress[-1], 100)
+
+    def test_threadsafe_stages_overlap(self):
+        """Independent threadsafe stages run concurrently"""
+        barrier = threading.Barrier(2, timeout=5)
+
+        def wait(inputs, feedback):
+            barrier.wait()
+            return 0
+
+        pipeline = Pipeline([
+            Stage('nlcd', wait, threadsafe=True),
+            Stage('soil', wait, threadsafe=True),
+        ])
+        self.assertEqual(
+            pipeline.run(['nlcd', 'soil']), {'nlcd': 0, 'soil': 0})
+
+    def test_error_is_raised(self):
+        """Stage errors are raised from run"""
+        def fail(inputs, feedback):
+            raise RuntimeError('download failed')
+
+        pipeline = Pipeline([Stage('a', fail, threadsafe=True)])
+        with self.assertRaises(RuntimeError):
+            pipeline.run(['a'])
+
+    def test_memoized_stages_are_reused(self):
+        """Unchanged memoized stages and their requirements are not run again"""
+        memo = StageMemo()
+
+        def pipeline(lookup):
+            return Pipeline([
+                Stage('download', self.stage('download', 1), key='aoi',
+                      memoize=True),
+                Stage('intersect', self.stage('intersect', 10), ['download'],
+                      memoize=True),
+                Stage('attribute', self.stage('attribute', 100), ['intersect'],
+                      key=lookup, memoize=True),
+            ])
+
+        self.assertEqual(pipeline('a').run(['attribute'], memo=memo)['attribute'], 111)
+        self.assertEqual(self.calls, ['download', 'intersect', 'attribute'])
+        self.calls.clear()
+        changed = pipeline('b')
+        feedback = Feedback()
+        values = changed.run(['attribute'], feedback, memo=memo)
+        self.assertEqual(values, {'intersect': 11, 'attribute': 111})
+        self.assertEqual(self.calls, ['attribute'])
+        self.assertEqual(changed.reused, ['intersect'])
+        self.assertIn('intersect', feedback.info[0])
+        self.calls.clear()
+        pipeline('a').run(['attribute'], memo=memo)
+        self.assertEqual(self.calls, [])
+
+    def test_memo_size(self):
+        """Least recently used values are dropped"""
+        memo = StageMemo(2)
+        memo.put('a', 1)
+        memo.put('b', 2)
+        memo.get('a')
+        memo.put('c', 3)
+        self.assertIn('a', memo)
+        self.assertNotIn('b', memo)
+
+    def test_update_costs(self):
+        """Measured durations are blended into previous costs"""
+        self.assertEqual(
+            update_costs({'a': 10.0}, {'a': 20.0, 'b': 1.0}), {'a': 15.0, 'b': 1.0})
+
+
+if __name__ == '__main__':
+    unittest.main()
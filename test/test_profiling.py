@@ -0,0 +1,65 @@
+# coding=utf-8
+"""Tests for the pipeline stage profiler."""
+
+__author__ = 'Abdul Raheem Siddiqui'
+__date__ = '2020-12-25'
+__copyright__ = '(C) 2020 by Abdul Raheem Siddiqui'
+
+import json
+import os
+import pstats
+import tempfile
+import unittest
+
+from pipeline import Pipeline, Stage
+from profiling import Profiler
+
+
+class ProfilerTest(unittest.TestCase):
+    """Test recording of stage profiles"""
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.pipeline = Pipeline([
+            Stage('rows', lambda inputs, feedback: list(range(10))),
+            Stage(
+                'squares',
+                lambda inputs, feedback: [row * row for row in inputs['rows']],
+                ['rows'],
+                threadsafe=True,
+            ),
+        ])
+
+    def test_stage_records(self):
+        """Every stage gets timings and counts chained from required stages"""
+        profiler = Profiler(len)
+        self.pipeline.run(['squares'], profiler=profiler)
+        self.assertEqual(set(profiler.stages), {'rows', 'squares'})
+        squares = profiler.stages['squares']
+        self.assertEqual(squares['input_count'], 10)
+        self.assertEqual(squares['output_count'], 10)
+        self.assertGreaterEqual(squares['wall_seconds'], 0)
+        self.assertEqual(squares['downloaded_mb'], 0)
+        self.assertIsNone(profiler.stages['rows']['input_count'])
+        self.assertEqual(len(profiler.summary()), 2)
+
+    def test_write(self):
+        """Profile is written as JSON"""
+        profiler = Profiler()
+        self.pipeline.run(['rows'], profiler=profiler)
+        path = profiler.write(os.path.join(self.folder, 'Profile.json'))
+        with open(path) as profile_file:
+            report = json.load(profile_file)
+        self.assertEqual(list(report['stages']), ['rows'])
+        self.assertIsNone(report['stages']['rows']['output_count'])
+
+    def test_cprofile_stage(self):
+        """Only the selected stage is captured with cProfile"""
+        path = os.path.join(self.folder, 'squares.prof')
+        profiler = Profiler(cprofile_stage='squares', cprofile_path=path)
+        self.pipeline.run(['squares'], profiler=profiler)
+        self.assertGreater(pstats.Stats(path).total_calls, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
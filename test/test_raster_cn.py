@@ -0,0 +1,57 @@
+# coding=utf-8
+"""Tests for the per pixel Curve Number grid."""
+
+__author__ = 'Abdul Raheem Siddiqui'
+__date__ = '2020-12-25'
+__copyright__ = '(C) 2020 by Abdul Raheem Siddiqui'
+
+import unittest
+
+from osgeo import gdal, ogr, osr
+
+import numpy as np
+
+from cn_lookup import CN_NODATA, build_cn_lut
+from cust_functions import HSG_CLASSES, HSG_NO_SOIL
+from raster_cn import lookup_cn, rasterize_hsg
+
+
+class RasterCNTest(unittest.TestCase):
+    """Test HSG burning and CN lookup on the NLCD grid"""
+
+    def setUp(self):
+        self.lut = build_cn_lut([('41', '36'), ('41B', '55'), ('82', '70')])
+
+    def test_lookup_cn(self):
+        """Soil without HSG gets the CN of the bare NLCD code, no soil gets none"""
+        nlcd = np.array([[41, 41, 41, 0]], dtype=np.uint8)
+        hsg = np.array(
+            [[HSG_CLASSES.index('B'), 0, HSG_NO_SOIL, 0]], dtype=np.uint8)
+        np.testing.assert_array_equal(
+            lookup_cn(nlcd, 0, hsg, self.lut), [[55, 36, CN_NODATA, CN_NODATA]])
+
+    def test_soil_gap_inside_nlcd_extent(self):
+        """Pixels in a gap between soil polygons get no CN"""
+        nlcd_ds = gdal.GetDriverByName('MEM').Create('', 4, 2, 1, gdal.GDT_Byte)
+        nlcd_ds.SetGeoTransform((0, 30, 0, 60, 0, -30))
+        srs = osr.SpatialReference()
+        srs.ImportFromEPSG(5070)
+        nlcd_ds.SetProjection(srs.ExportToWkt())
+        nlcd = np.full((2, 4), 41, dtype=np.uint8)
+
+        # soil without HSG on the left column, HSG B on the right, gap in between
+        soil = [
+            (0, ogr.CreateGeometryFromWkt(
+                'POLYGON ((0 0, 30 0, 30 60, 0 60, 0 0))').ExportToWkb()),
+            (HSG_CLASSES.index('B'), ogr.CreateGeometryFromWkt(
+                'POLYGON ((90 0, 120 0, 120 60, 90 60, 90 0))').ExportToWkb()),
+        ]
+        hsg = rasterize_hsg(soil, srs, nlcd_ds)
+        self.assertTrue((hsg[:, 1:3] == HSG_NO_SOIL).all())
+        np.testing.assert_array_equal(
+            lookup_cn(nlcd, 0, hsg, self.lut),
+            [[36, CN_NODATA, CN_NODATA, 55]] * 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
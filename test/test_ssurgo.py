@@ -0,0 +1,226 @@
+# coding=utf-8
+"""Tests for SSURGO Soil Data Access queries and soil cache."""
+
+__author__ = 'Abdul Raheem Siddiqui'
+__date__ = '2020-12-25'
+__copyright__ = '(C) 2020 by Abdul Raheem Siddiqui'
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import requests
+
+import ssurgo
+from ssurgo import (
+    CN_SOIL_ATTRIBUTES,
+    SOIL_ATTRIBUTES,
+    SoilCache,
+    iter_soil,
+    iter_table_rows,
+    muaggatt_columns,
+    polygon_columns,
+    sda_muaggatt_query,
+    sda_polygon_query,
+    soil_tiles,
+    wkt_bounds,
+)
+
+SOIL_NAMES = [attr['name'] for attr in SOIL_ATTRIBUTES]
+MUPOLYGONKEY_INDEX = SOIL_NAMES.index('mupolygonkey')
+MUKEY_INDEX = SOIL_NAMES.index('mukey')
+AREASYMBOL_INDEX = SOIL_NAMES.index('areasymbol')
+
+
+def soil_row(mupolygonkey, areasymbol='TX001', x=0.01, mukey=None):
+    """Fake joined soil row with given mupolygonkey"""
+    row = [None] * (len(SOIL_ATTRIBUTES) + 1)
+    row[MUKEY_INDEX] = mukey or 'mu' + mupolygonkey
+    row[0] = 'sym' + row[MUKEY_INDEX]
+    row[MUPOLYGONKEY_INDEX] = mupolygonkey
+    row[AREASYMBOL_INDEX] = areasymbol
+    row[-1] = 'POLYGON (({0} 0.01, {1} 0.01, {1} 0.02, {0} 0.01))'.format(
+        x, x + 0.01)
+    return row
+
+
+def project(row, columns):
+    """Project full fake soil row on columns"""
+    names = [attr['name'] for attr in SOIL_ATTRIBUTES]
+    return [row[names.index(column)] for column in columns]
+
+
+def lean_row(row):
+    """Project full fake soil row on the CN only columns"""
+    return project(row, [attr['name'] for attr in CN_SOIL_ATTRIBUTES]) + [row[-1]]
+
+
+def fake_sda(query, rows):
+    """Answer SDA polygon and muaggatt queries from full fake soil rows"""
+    if ' from muaggatt ' in query:
+        lean = 'aws025wta' not in query
+        map_units = {
+            row[MUKEY_INDEX]: project(row, muaggatt_columns(lean))
+            for row in rows if "'" + row[MUKEY_INDEX] + "'" in query}
+        return iter(map_units.values())
+    lean = 'nationalmusym' not in query
+    return iter([project(row, polygon_columns(lean)) + [row[-1]] for row in rows])
+
+
+class SSURGOTest(unittest.TestCase):
+    """Test tiled SDA soil download"""
+
+    def test_soil_tiles(self):
+        """Tiles are aligned to the global grid and cover the bbox"""
+        tiles = soil_tiles((0.05, 0, 0.25, 0.1), tile_size=0.1)
+        self.assertEqual([tile[:2] for tile in tiles], [(0, 0), (1, 0), (2, 0)])
+        self.assertAlmostEqual(tiles[-1][2][2], 0.3)
+
+    def test_lean_query_projects_columns(self):
+        """Lean queries select only CN columns, keys and geometry"""
+        query = sda_polygon_query('polygon((0 0, 1 0, 1 1, 0 0))', lean=True)
+        self.assertTrue(query.startswith(
+            'select M.mukey, M.mupolygonkey, M.areasymbol, M.mupolygongeo from'))
+        self.assertEqual(
+            sda_muaggatt_query(['1', "2'"], lean=True),
+            "select musym, muname, hydgrpdcd, mukey from muaggatt "
+            "where mukey in ('1', '2''')")
+        self.assertIn('aws025wta', sda_muaggatt_query(['1']))
+
+    def test_iter_table_rows(self):
+        """Rows are parsed from arbitrarily split chunks"""
+        body = '{"Table": [["a", "1"], ["b", "x]y"], ["\u00e9", null]]}'.encode()
+        chunks = [body[i:i + 3] for i in range(0, len(body), 3)]
+        self.assertEqual(
+            list(iter_table_rows(chunks)),
+            [['a', '1'], ['b', 'x]y'], ['\u00e9', None]])
+        self.assertEqual(list(iter_table_rows([b''])), [])
+        with self.assertRaises(ValueError):
+            list(iter_table_rows([body[:20]]))
+
+    def test_iter_soil_deduplicates_and_splits(self):
+        """Failing tiles are split and rows are unique on mupolygonkey"""
+        calls = []
+
+        def fake_post(query):
+            if ' from muaggatt ' in query:
+                return fake_sda(query, [soil_row(str(key)) for key in range(1, 6)])
+            calls.append(query)
+            if len(calls) == 1:
+                raise requests.HTTPError('result size limit')
+            return fake_sda(query, [soil_row('1'), soil_row(str(len(calls)))])
+
+        with mock.patch.object(ssurgo, 'post_sda_rows', side_effect=fake_post):
+            rows = list(iter_soil((0, 0, 0.05, 0.05), max_workers=1))
+
+        self.assertEqual(len(calls), 5)
+        keys = sorted(row[MUPOLYGONKEY_INDEX] for row in rows)
+        self.assertEqual(keys, ['1', '2', '3', '4', '5'])
+
+    def test_iter_soil_queries_clipped_area(self):
+        """Only tiles intersecting the area of interest are queried with its WKT"""
+        queries = []
+
+        def fake_post(query):
+            queries.append(query)
+            return fake_sda(query, [])
+
+        def clip(bbox):
+            return None if bbox[0] > 0 else 'polygon((0 0, 0.01 0, 0 0.01, 0 0))'
+
+        with mock.patch.object(ssurgo, 'post_sda_rows', side_effect=fake_post):
+            list(iter_soil((0.05, 0.05, 0.15, 0.05), max_workers=1, clip=clip))
+
+        self.assertEqual(
+            queries, [sda_polygon_query('polygon((0 0, 0.01 0, 0 0.01, 0 0))')])
+
+    def test_iter_soil_fetches_map_unit_once(self):
+        """Attributes are fetched once for polygons sharing a map unit"""
+        rows = [soil_row('1', mukey='mu1'), soil_row('2', mukey='mu1')]
+        queries = []
+
+        def fake_post(query):
+            queries.append(query)
+            return fake_sda(query, rows)
+
+        with mock.patch.object(ssurgo, 'post_sda_rows', side_effect=fake_post):
+            result = list(iter_soil((0, 0, 0.05, 0.05), max_workers=1))
+
+        self.assertEqual(result, rows)
+        self.assertEqual(
+            [query for query in queries if ' from muaggatt ' in query],
+            [sda_muaggatt_query(['mu1'])])
+
+
+class SoilCacheTest(unittest.TestCase):
+    """Test SSURGO soil cache"""
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.cache = SoilCache(os.path.join(self.folder, 'ssurgo.sqlite'))
+        self.versions = {'TX001': '2020-09-01'}
+        self.soil_queries = []
+
+    def tearDown(self):
+        self.cache.close()
+        shutil.rmtree(self.folder)
+
+    def fake_post(self, query):
+        if 'sacatalog' in query:
+            return iter(self.versions.items())
+        if ' from muaggatt ' not in query:
+            self.soil_queries.append(query)
+        return fake_sda(query, [soil_row('1'), soil_row('2', x=0.05)])
+
+    def download(self, bbox, lean=False, intersects=None):
+        with mock.patch.object(ssurgo, 'post_sda_rows', side_effect=self.fake_post):
+            return list(iter_soil(
+                bbox, max_workers=1, cache=self.cache, lean=lean,
+                intersects=intersects))
+
+    def test_cached_area_is_not_queried(self):
+        """Second request for the same area is answered from cache"""
+        first = self.download((0.001, 0.001, 0.09, 0.09))
+        second = self.download((0.001, 0.001, 0.03, 0.03))
+        self.assertEqual(len(self.soil_queries), 1)
+        self.assertEqual(len(first), 2)
+        self.assertEqual([row[MUPOLYGONKEY_INDEX] for row in second], ['1'])
+        self.assertEqual(second[0], soil_row('1'))
+
+    def test_cached_rows_are_clipped(self):
+        """Cached rows outside the area of interest of the tile are dropped"""
+        def intersects(bounds, wkt):
+            # the R*Tree keeps bounds as 32 bit floats
+            for bound, expected in zip(bounds, wkt_bounds(wkt)):
+                self.assertAlmostEqual(bound, expected, places=6)
+            return bounds[0] < 0.04
+
+        rows = self.download((0.001, 0.001, 0.09, 0.09), intersects=intersects)
+        self.assertEqual([row[MUPOLYGONKEY_INDEX] for row in rows], ['1'])
+        rows = self.download((0.001, 0.001, 0.09, 0.09), intersects=intersects)
+        self.assertEqual([row[MUPOLYGONKEY_INDEX] for row in rows], ['1'])
+        self.assertEqual(len(self.soil_queries), 1)
+
+    def test_new_survey_version_is_refetched(self):
+        """Cached survey area is refetched when a new version is published"""
+        self.download((0.001, 0.001, 0.09, 0.09))
+        self.versions['TX001'] = '2021-09-01'
+        self.download((0.001, 0.001, 0.09, 0.09))
+        self.assertEqual(len(self.soil_queries), 2)
+
+    def test_lean_cache_is_completed_for_full_request(self):
+        """Tiles cached lean are refetched when all attributes are needed"""
+        lean = self.download((0.001, 0.001, 0.03, 0.03), lean=True)
+        self.assertEqual(lean, [lean_row(soil_row('1'))])
+        full = self.download((0.001, 0.001, 0.03, 0.03))
+        self.assertEqual(full, [soil_row('1')])
+        # full attributes answer later lean requests from cache
+        lean = self.download((0.001, 0.001, 0.03, 0.03), lean=True)
+        self.assertEqual(lean, [lean_row(soil_row('1'))])
+        self.assertEqual(len(self.soil_queries), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+# coding=utf-8
+"""Tests for zonal statistics of the Curve Number grid."""
+
+__author__ = 'Abdul Raheem Siddiqui'
+__date__ = '2020-12-25'
+__copyright__ = '(C) 2020 by Abdul Raheem Siddiqui'
+
+import unittest
+
+import numpy as np
+
+from cust_functions import HSG_NO_SOIL, HSG_WATER_INDEX
+from zonal import breakdown_gdcode, composite_cn, cover_breakdown
+
+
+class ZonalTest(unittest.TestCase):
+    """Test composite CN and land cover soil breakdown per zone"""
+
+    def setUp(self):
+        self.zones = np.array([[1, 1, 2], [1, 0, 2]], dtype=np.uint32)
+        self.nlcd = np.array([[41, 41, 82], [21, 41, -9999]], dtype=np.float32)
+        self.hsg = np.array([[2, 2, 4], [2, 1, 0]], dtype=np.uint8)
+        self.cn = np.array([[60, 60, 89], [255, 40, 255]], dtype=np.uint8)
+
+    def test_composite_cn(self):
+        """Composite CN is the mean over zone pixels with CN"""
+        composite, pixels = composite_cn(self.zones, self.cn, 255, 3)
+        self.assertEqual(list(pixels), [0, 2, 1, 0])
+        self.assertAlmostEqual(composite[1], 60)
+        self.assertAlmostEqual(composite[2], 89)
+        self.assertTrue(np.isnan(composite[3]))
+
+    def test_cover_breakdown(self):
+        """Every NLCD and HSG combination is counted once per zone"""
+        rows = cover_breakdown(self.zones, self.nlcd, -9999, self.hsg, 2)
+        self.assertEqual(rows, [(1, 21, 2, 1), (1, 41, 2, 2), (2, 82, 4, 1)])
+
+    def test_breakdown_skips_pixels_without_soil(self):
+        """Pixels no soil polygon covers are not counted"""
+        hsg = self.hsg.copy()
+        hsg[0, 0] = HSG_NO_SOIL
+        rows = cover_breakdown(self.zones, self.nlcd, -9999, hsg, 2)
+        self.assertEqual(rows, [(1, 21, 2, 1), (1, 41, 2, 1), (2, 82, 4, 1)])
+
+    def test_many_zones(self):
+        """Thousands of zones are aggregated in one pass"""
+        zones = np.arange(1, 10001, dtype=np.uint32).repeat(4).reshape(200, 200)
+        cn = (zones % 50 + 40).astype(np.uint8)
+        composite, pixels = composite_cn(zones, cn, 255, 10000)
+        self.assertTrue((pixels[1:] == 4).all())
+        self.assertEqual(composite[7], 47)
+        rows = cover_breakdown(zones, cn, None, cn % 5, 10000)
+        self.assertEqual(len(rows), 10000)
+
+    def test_breakdown_gdcode(self):
+        """GDCode of water soils is 11"""
+        self.assertEqual(breakdown_gdcode(41, 2), '41B')
+        self.assertEqual(breakdown_gdcode(82, 0), '82')
+        self.assertEqual(breakdown_gdcode(82, HSG_WATER_INDEX), '11')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+
+"""
+/***************************************************************************
+ CurveNumberGenerator
+                                 A QGIS plugin
+ This plugin generates a Curve Number layer for the given Area of Interest within the contiguous United States. It can also download Soil and Land Cover datasets for the same area.
+ Generated by Plugin Builder: http://g-sherman.github.io/Qgis-Plugin-Builder/
+                              -------------------
+        begin                : 2020-06-06
+        copyright            : (C) 2020 by Abdul Raheem Siddiqui
+        email                : mailto:ars.work.ce@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+import numpy as np
+
+from cust_functions import HSG_CLASSES, HSG_NO_SOIL, HSG_WATER_INDEX
+
+__author__ = "Abdul Raheem Siddiqui"
+__date__ = "2020-12-25"
+__copyright__ = "(C) 2020 by Abdul Raheem Siddiqui"
+
+# This will get replaced with a git SHA1 when you do a git archive
+
+__revision__ = "$Format:%H$"
+
+
+def composite_cn(
+    zones: np.ndarray, cn: np.ndarray, cn_nodata, zone_count: int
+) -> tuple:
+    """Area weighted mean CN of zone ids 1 to zone_count on an equal area pixel grid
+
+    Returns (composite CN, pixels with CN) arrays indexed by zone id, composite CN
+    is NaN for zones without CN pixels.
+    """
+    valid = (zones > 0) & (cn != cn_nodata)
+    zone_ids = zones[valid]
+    pixels = np.bincount(zone_ids, minlength=zone_count + 1)
+    sums = np.bincount(zone_ids, weights=cn[valid], minlength=zone_count + 1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return sums / pixels, pixels
+
+
+def cover_breakdown(
+    zones: np.ndarray, nlcd: np.ndarray, nodata, hsg: np.ndarray, zone_count: int
+) -> list:
+    """Pixel counts of NLCD code and HSG index combinations in zones 1 to zone_count,
+    pixels without soil are left out
+
+    Returns (zone id, NLCD code, HSG index, pixels) rows sorted by zone.
+    """
+    inside = (zones > 0) & (nlcd >= 0) & (nlcd < 256) & (hsg != HSG_NO_SOIL)
+    if nodata is not None:
+        inside &= nlcd != nodata
+    codes = nlcd[inside].astype(np.int64)
+    # number the NLCD codes present so bins stay few for thousands of zones
+    present = np.flatnonzero(np.bincount(codes, minlength=256))
+    code_index = np.zeros(256, dtype=np.int64)
+    code_index[present] = np.arange(len(present))
+    hsg_count = HSG_WATER_INDEX + 1
+    keys = (
+        zones[inside].astype(np.int64) * len(present) + code_index[codes]
+    ) * hsg_count + hsg[inside]
+    counts = np.bincount(keys, minlength=(zone_count + 1) * len(present) * hsg_count)
+    rows = []
+    for key in np.flatnonzero(counts):
+        zone, rest = divmod(int(key), len(present) * hsg_count)
+        code, hsg_index = divmod(rest, hsg_count)
+        rows.append((zone, int(present[code]), hsg_index, int(counts[key])))
+    return rows
+
+
+def breakdown_gdcode(nlcd_code: int, hsg_index: int) -> str:
+    """GDCode of an NLCD code and HSG index, '11' for water soils without HSG"""
+    if hsg_index == HSG_WATER_INDEX:
+        return "11"
+    return str(nlcd_code) + HSG_CLASSES[hsg_index]